@@ -0,0 +1,201 @@
+"""Adapter for serving the application with an ASGI server.
+
+The application is a WSGI application that handles every request
+synchronously in one thread. When it is served via ASGI, the requests
+are handled in a bounded pool of worker threads instead, while the event
+loop of the ASGI server passes the request body and the response output
+between the worker threads and the server. The helpers in this module
+are used by the asgi() method of the Application.
+"""
+
+import sys
+
+from asyncio import run_coroutine_threadsafe
+
+
+class ASGIInput:
+    """File-like object for reading the body of an ASGI request.
+
+    This is used as wsgi.input in a worker thread. The body is received
+    from the event loop in chunks when it is read, so that the body does
+    not need to be buffered before the request is handled.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._moreBody = True
+
+    def _fill(self):
+        """Receive the next chunk of the body into the buffer.
+
+        Returns False if the whole body has already been received.
+        """
+        if not self._moreBody:
+            return False
+        message = run_coroutine_threadsafe(
+            self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._moreBody = False
+            raise ConnectionAbortedError('The client has disconnected.')
+        self._buffer += message.get('body', b'')
+        self._moreBody = message.get('more_body', False)
+        return True
+
+    def _take(self, size):
+        """Take the given number of bytes from the buffer."""
+        buffer = self._buffer
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        """Read at most size bytes or the rest of the body."""
+        if size is None or size < 0:
+            while self._fill():
+                pass
+            return self._take(len(self._buffer))
+        while len(self._buffer) < size and self._fill():
+            pass
+        return self._take(size)
+
+    def readline(self, size=-1):
+        """Read one line of the body, with at most size bytes."""
+        if size is None:
+            size = -1
+        start = 0
+        while True:
+            buffer = self._buffer
+            end = buffer.find(b'\n', start)
+            if end >= 0:
+                end += 1
+                break
+            if 0 <= size <= len(buffer):
+                break
+            start = len(buffer)
+            if not self._fill():
+                end = len(self._buffer)
+                break
+        if 0 <= size and not 0 <= end <= size:
+            end = size
+        return self._take(end)
+
+    def readlines(self, hint=-1):
+        """Read the remaining lines of the body."""
+        lines = []
+        total = 0
+        while line := self.readline():
+            lines.append(line)
+            total += len(line)
+            if 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self):
+        while line := self.readline():
+            yield line
+
+
+def environFromScope(scope, input_):
+    """Create a WSGI environment for the given ASGI HTTP scope.
+
+    The ASGI scope itself is passed on in the environment as asgi.scope.
+    """
+    rootPath = scope.get('root_path', '')
+    path = scope['path']
+    if rootPath and path.startswith(rootPath):
+        path = path[len(rootPath):]
+    server = scope.get('server') or ('localhost', None)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': rootPath.encode().decode('latin-1'),
+        'PATH_INFO': path.encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': input_,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.scope': scope}
+    if client := scope.get('client'):
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').lower()
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if name == 'cookie' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ASGIResponder:
+    """Deliver the response of the WSGI application as ASGI events.
+
+    The start_response() and write() callables are used in the worker
+    thread, which waits until every event has been sent by the event loop.
+    The response starts when the first output is written, so that the
+    output is streamed to the client as it is flushed by the application.
+    """
+
+    def __init__(self, send, loop):
+        self._send = send
+        self._loop = loop
+        self._status = None
+        self._headers = None
+        self._started = False
+
+    def startResponse(self, status, headers, exc_info=None):
+        """The start_response() callable passed to the WSGI application."""
+        if exc_info and self._started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self._status = int(status.split(None, 1)[0])
+        self._headers = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers]
+        return self.write
+
+    def send(self, event):
+        """Send an event via the event loop and wait until it has been sent."""
+        run_coroutine_threadsafe(self._send(event), self._loop).result()
+
+    def start(self):
+        """Send the status and headers if this has not already been done."""
+        if not self._started:
+            if self._status is None:
+                raise RuntimeError('The response has not been started.')
+            self._started = True
+            self.send({
+                'type': 'http.response.start',
+                'status': self._status, 'headers': self._headers})
+
+    def write(self, data):
+        """The write() callable returned by start_response()."""
+        if data:
+            self.start()
+            self.send({
+                'type': 'http.response.body', 'body': bytes(data),
+                'more_body': True})
+
+    def finish(self, iterable):
+        """Send the output in the iterable and end the response."""
+        try:
+            for data in iterable:
+                self.write(data)
+        finally:
+            if close := getattr(iterable, 'close', None):
+                close()
+        self.start()
+        self.send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,299 @@
+"""ActivityLog
+
+Writes the activity log of the application.
+
+The values of the configured columns are taken from the transaction in
+the request thread, but formatting and writing them to the log file is
+done by a background thread which is fed by a bounded queue. The log
+entries are written in batches and the log file can be rotated when it
+exceeds a given size or age.
+"""
+
+import os
+
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+from time import time
+
+from MiscUtils.NamedValueAccess import valueForKey
+
+debug = False
+
+
+def getterForKey(key):
+    """Get a function returning the value of an object for the given key.
+
+    The result is the same as with valueForKey(), but the way the value
+    is accessed is determined only once for each class of the objects.
+    """
+    getters = {}
+
+    def getter(obj):
+        cls = obj.__class__
+        try:
+            get = getters[cls]
+        except KeyError:
+            get = getters[cls] = _resolveKey(cls, key)
+        return get(obj)
+
+    return getter
+
+
+def _resolveKey(cls, key):
+    """Determine how to access the given key for objects of a class."""
+    if issubclass(cls, dict):
+        return lambda obj: obj[key]
+    for name in (key, '_' + key):
+        if method := getattr(cls, name, None):
+            if callable(method):
+                return method
+            break
+    return lambda obj: valueForKey(obj, key)
+
+
+def getterForColumn(column):
+    """Get a function returning the value of an activity log column.
+
+    The column refers to an object from the set [application, transaction,
+    request, response, servlet, session] and then to its attributes using
+    dot notation. The function must be passed a dictionary of these objects.
+    """
+    name, *keys = column.split('.')
+    getters = [getterForKey(key) for key in keys]
+
+    def getter(objects):
+        obj = objects[name]
+        for get in getters:
+            if obj is None:
+                raise TypeError('We do not accept None as object')
+            obj = get(obj)
+        return obj
+
+    return getter
+
+
+def formatValue(value):
+    """Format a value for the activity log."""
+    if isinstance(value, float):
+        # probably need more flexibility in the future
+        return f'{value:02f}'
+    return str(value)
+
+
+class ActivityLog:
+    """The activity log of the application.
+
+    The log is configured by the application settings ``ActivityLogFilename``
+    and ``ActivityLogColumns``, and the following settings:
+
+    ``ActivityLogQueueSize``:
+        Maximum number of pending entries. If this is zero, the entries
+        are written synchronously by the request threads.
+    ``ActivityLogFlushInterval``:
+        Maximum number of seconds entries are collected before they are
+        written to the log file in one batch.
+    ``ActivityLogDropPolicy``:
+        What happens when the queue is full: ``'dropNew'`` discards the new
+        entry, ``'dropOld'`` discards the oldest pending entry, and
+        ``'block'`` lets the request thread wait until there is room.
+    ``ActivityLogMaxSize``:
+        Rotate the log file when it exceeds this number of bytes.
+    ``ActivityLogRotateInterval``:
+        Rotate the log file when it is older than this number of seconds.
+    ``ActivityLogBackupCount``:
+        Number of rotated log files to keep.
+    """
+
+    dropPolicies = ('dropNew', 'dropOld', 'block')
+
+    def __init__(self, application):
+        """Create the activity log for the given application."""
+        setting = application.setting
+        filename = setting('ActivityLogFilename')
+        if '/' not in filename:
+            filename = os.path.join(application._logDir, filename)
+        self._filename = application.serverSidePath(filename)
+        self._columns = list(setting('ActivityLogColumns'))
+        self._getters = [getterForColumn(column) for column in self._columns]
+        self._flushInterval = setting('ActivityLogFlushInterval', 1)
+        self._dropPolicy = setting('ActivityLogDropPolicy', 'dropNew')
+        if self._dropPolicy not in self.dropPolicies:
+            raise ValueError(
+                f'Invalid ActivityLogDropPolicy: {self._dropPolicy!r}')
+        self._maxSize = setting('ActivityLogMaxSize', None)
+        self._rotateInterval = setting('ActivityLogRotateInterval', None)
+        self._backupCount = setting('ActivityLogBackupCount', 5)
+        self._fileCreated = None
+        self._numDropped = 0
+        self._lock = Lock()  # protects the log file
+        queueSize = setting('ActivityLogQueueSize', 1000)
+        if queueSize:
+            self._queue = Queue(queueSize)
+            self._thread = Thread(
+                target=self._run, name='ActivityLog', daemon=True)
+            self._thread.start()
+        else:
+            self._queue = self._thread = None
+
+    def filename(self):
+        """Return the path of the log file."""
+        return self._filename
+
+    def columns(self):
+        """Return the names of the logged columns."""
+        return self._columns
+
+    def numDropped(self):
+        """Return the number of entries dropped because of a full queue."""
+        return self._numDropped
+
+    def values(self, trans):
+        """Get the values of all columns for the given transaction."""
+        objects = {
+            'application': trans.application(), 'transaction': trans,
+            'request': trans.request(),
+            'response': trans.response(),
+            'servlet': trans.servlet(),
+            # don't cause creation of session here:
+            'session': trans._session
+        }
+        values = []
+        for getter in self._getters:
+            try:
+                value = getter(objects)
+            except Exception:
+                value = '(unknown)'
+            values.append(value)
+        return values
+
+    def write(self, trans):
+        """Write an entry for the given transaction to the log."""
+        values = self.values(trans)
+        queue = self._queue
+        if queue is None:
+            self.writeEntries([values])
+            return
+        if self._dropPolicy == 'block':
+            queue.put(values)
+            return
+        try:
+            queue.put_nowait(values)
+        except Full:
+            if self._dropPolicy == 'dropOld':
+                try:
+                    oldValues = queue.get_nowait()
+                except Empty:
+                    pass
+                else:
+                    queue.task_done()
+                    if oldValues is None:
+                        # never drop the stop marker put there by close()
+                        queue.put_nowait(None)
+                        self._numDropped += 1
+                        return
+                try:
+                    queue.put_nowait(values)
+                except Full:
+                    pass
+                else:
+                    self._numDropped += 1
+                    return
+            self._numDropped += 1
+
+    def writeEntries(self, entries):
+        """Write the given entries to the log file in one go."""
+        lines = [','.join(map(formatValue, values)) + '\n'
+                 for values in entries]
+        with self._lock:
+            filename = self._filename
+            if os.path.exists(filename):
+                self.rotate()
+            if os.path.exists(filename):
+                mode = 'a'
+            else:
+                mode = 'w'
+                lines.insert(0, ','.join(self._columns) + '\n')
+            with open(filename, mode, encoding='utf-8') as f:
+                f.write(''.join(lines))
+            if self._fileCreated is None:
+                self._fileCreated = time()
+
+    def rotate(self, force=False):
+        """Rotate the log file if it has become too large or too old.
+
+        The caller must hold the lock of the log file.
+        """
+        filename = self._filename
+        if not force:
+            maxSize, interval = self._maxSize, self._rotateInterval
+            if not (maxSize and os.path.getsize(filename) >= maxSize or (
+                    interval and self._fileCreated is not None
+                    and time() - self._fileCreated >= interval)):
+                return
+        if debug:
+            print(f'>> rotating {filename}')
+        try:
+            if self._backupCount:
+                for n in range(self._backupCount - 1, 0, -1):
+                    backup = f'{filename}.{n}'
+                    if os.path.exists(backup):
+                        os.replace(backup, f'{filename}.{n + 1}')
+                os.replace(filename, filename + '.1')
+            else:
+                os.remove(filename)
+        except OSError as e:
+            print(f'WARNING: Cannot rotate the activity log: {e}')
+        self._fileCreated = None
+
+    def flush(self):
+        """Wait until all pending entries have been written."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write all pending entries and stop the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    def _run(self):
+        """Write the entries from the queue in batches."""
+        queue = self._queue
+        flushInterval = self._flushInterval or 0
+        running = True
+        while running:
+            entry = queue.get()
+            if entry is None:
+                queue.task_done()
+                break
+            entries = [entry]
+            deadline = time() + flushInterval
+            while (timeout := deadline - time()) > 0:
+                try:
+                    entry = queue.get(timeout=timeout)
+                except Empty:
+                    break
+                if entry is None:
+                    running = False
+                    queue.task_done()
+                    break
+                entries.append(entry)
+            # also write all entries that have been added in the meantime
+            while running:
+                try:
+                    entry = queue.get_nowait()
+                except Empty:
+                    break
+                if entry is None:
+                    running = False
+                    queue.task_done()
+                    break
+                entries.append(entry)
+            try:
+                self.writeEntries(entries)
+            except Exception as e:
+                print(f'WARNING: Cannot write the activity log: {e}')
+            for _entry in entries:
+                queue.task_done()
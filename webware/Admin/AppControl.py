@@ -34,12 +34,17 @@ class AppControl(AdminSecurity):
 
             case "Clear cache":
                 from URLParser import ServletFactoryManager
+                from UnknownFileTypeServlet import fileCache
                 factories = [f for f in ServletFactoryManager._factories
                              if f._classCache]
                 wr('<p>')
                 for factory in factories:
                     wr(f'Flushing cache of {factory.name()}...<br>')
                     factory.flushCache()
+                wr('Clearing cache of resolved URLs...<br>')
+                self.application().rootURLParser().clearResolutionCache()
+                wr('Clearing cache of static files...<br>')
+                fileCache.clear()
                 wr('</p>')
                 wr('<p style="color:green">The caches of all factories'
                    ' have been flushed.</p>')
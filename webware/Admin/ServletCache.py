@@ -2,9 +2,15 @@ import os
 import time
 
 from URLParser import ServletFactoryManager
+from UnknownFileTypeServlet import fileCache
 from WebUtils.Funcs import htmlEncode
 from .AdminSecurity import AdminSecurity
 
+try:
+    from PSP.FragmentCache import fragmentCache
+except ImportError:  # PSP plug-in not available
+    fragmentCache = None
+
 
 class ServletCache(AdminSecurity):
     """Display servlet cache.
@@ -48,6 +54,23 @@ class ServletCache(AdminSecurity):
                    '<input type="submit" name="reload" value="Reload"></p>')
                 continue
             wr(htCache(factory))
+        wr('<a id="FileCache"></a><h4>Static File Cache</h4>')
+        if hasField('flush_FileCache'):
+            fileCache.clear()
+            wr('<p style="color:green">'
+               'The static file cache has been flushed. &nbsp; '
+               '<input type="submit" name="reload" value="Reload"></p>')
+        else:
+            wr(htFileCache())
+        if fragmentCache is not None:
+            wr('<a id="FragmentCache"></a><h4>PSP Insert Cache</h4>')
+            if hasField('flush_FragmentCache'):
+                fragmentCache.clear()
+                wr('<p style="color:green">'
+                   'The PSP insert cache has been flushed. &nbsp; '
+                   '<input type="submit" name="reload" value="Reload"></p>')
+            else:
+                wr(htFragmentCache())
         wr('</form>')
 
 
@@ -63,6 +86,12 @@ def htCache(factory):
     name = factory.name()
     wr(f'<p>Unique paths in the servlet cache: <strong>{len(keys)}</strong>'
        f' &nbsp; <input type="submit" name="flush_{name}" value="Flush"></p>')
+    stats = factory.poolStats()
+    hitRate = stats['hitRate']
+    hitRate = 'n/a' if hitRate is None else f'{hitRate:.1%}'
+    wr(f'<p>Free servlets in the pools: <strong>{stats["free"]}</strong>,'
+       f' pool hits: {stats["hits"]}, misses: {stats["misses"]},'
+       f' evictions: {stats["evictions"]}, hit rate: {hitRate}</p>')
     wr('<p>Click any link to jump to the details for that path.</p>')
     wr('<h5>Filenames:</h5>')
     wr('<table class="NiceTable">')
@@ -93,12 +122,46 @@ def htCache(factory):
         record['instances'] = (
             'one servlet instance (threadsafe)'
             if path['full'] in factory._threadsafeServletCache else
-            f'free reusable servlets: {len(factory._servletPool)}')
+            'free reusable servlets:'
+            f' {len(factory._servletPool.get(path["full"], []))}')
         wr(htRecord(record))
     wr('</table>')
     return '\n'.join(html)
 
 
+def htFileCache():
+    """Output the statistics of the static file cache."""
+    stats = fileCache.stats()
+    maxSize = stats['maxSize']
+    maxSize = 'unlimited' if maxSize is None else f'{maxSize} bytes'
+    ttl = stats['ttl']
+    ttl = 'none' if not ttl else f'{ttl} seconds'
+    lookups = stats['hits'] + stats['misses']
+    hitRate = f'{stats["hits"] / lookups:.1%}' if lookups else 'n/a'
+    return (
+        f'<p>Cached files: <strong>{stats["files"]}</strong>,'
+        f' size: {stats["size"]} bytes, limit: {maxSize},'
+        f' time to live: {ttl} &nbsp; '
+        '<input type="submit" name="flush_FileCache" value="Flush"></p>\n'
+        f'<p>Cache hits: {stats["hits"]}, misses: {stats["misses"]},'
+        f' evictions: {stats["evictions"]}, hit rate: {hitRate}</p>')
+
+
+def htFragmentCache():
+    """Output the statistics of the cache for inserted PSP files."""
+    stats = fragmentCache.stats()
+    maxSize = stats['maxSize']
+    maxSize = 'unlimited' if maxSize is None else f'{maxSize} bytes'
+    lookups = stats['hits'] + stats['misses']
+    hitRate = f'{stats["hits"] / lookups:.1%}' if lookups else 'n/a'
+    return (
+        f'<p>Cached files: <strong>{stats["files"]}</strong>,'
+        f' size: {stats["size"]} bytes, limit: {maxSize} &nbsp; '
+        '<input type="submit" name="flush_FragmentCache" value="Flush"></p>\n'
+        f'<p>Cache hits: {stats["hits"]}, misses: {stats["misses"]},'
+        f' evictions: {stats["evictions"]}, hit rate: {hitRate}</p>')
+
+
 def htRecord(record):
     html = []
     wr = html.append
@@ -110,7 +173,7 @@ def htRecord(record):
         # check for special cases where we want a custom display
         if hasattr(value, '__name__'):
             htValue = value.__name__
-        if key == 'mtime':
+        if key in ('mtime', 'checked'):
             htValue = time.asctime(time.localtime(value))
             htValue = f'{htValue} ({value})'
         # the general case:
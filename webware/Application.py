@@ -6,27 +6,32 @@
 This is done using the WSGI protocol, so an `AppServer` class is not
 needed and not contained in Webware for Python anymore.
 `Application` receives the input via WSGI and turns it into `Transaction`,
-`HTTPRequest`, `HTTPResponse`, and `Session`.
+`HTTPRequest`, `HTTPResponse`, and `Session`. The application can also be
+served by an ASGI server using its `asgi()` method.
 
 Settings for Application are taken from ``Configs/Application.config``,
 which is used for many global settings, even if they aren't closely tied
 to the Application object itself.
 """
 
+import asyncio
 import atexit
 import importlib
 import os
 import signal
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from time import time, localtime
 
 from MiscUtils import NoDefault
 from MiscUtils.Funcs import asclocaltime
-from MiscUtils.NamedValueAccess import valueForName
 from TaskKit.Scheduler import Scheduler
 from WebUtils.Funcs import requestURI
 
+from ActivityLog import ActivityLog
+from ASGIAdapter import ASGIInput, ASGIResponder, environFromScope
 from ConfigurableForServerSidePath import ConfigurableForServerSidePath
 from ImportManager import ImportManager
 from ExceptionHandler import ExceptionHandler
@@ -48,8 +53,15 @@ defaultConfig = {
         'servlet.name', 'request.timeStamp',
         'transaction.duration', 'transaction.errorOccurred'
     ],
+    'ActivityLogQueueSize': 1000,
+    'ActivityLogFlushInterval': 1,
+    'ActivityLogDropPolicy': 'dropNew',
+    'ActivityLogMaxSize': None,
+    'ActivityLogRotateInterval': None,
+    'ActivityLogBackupCount': 5,
     'AlwaysSaveSessions': True,
     'AppLogFilename': 'Application.log',
+    'ASGIThreads': 20,
     'CacheDir': 'Cache',
     'CacheServletClasses': True,
     'CacheServletInstances': True,
@@ -94,21 +106,39 @@ defaultConfig = {
     'LogActivity': True,
     'LogDir': 'Logs',
     'LogErrors': True,
+    'MaxServletPoolSize': None,
+    'MaxUploadPartSize': None,
+    'MaxUploadSize': None,
     'MaxValueLengthInExceptionReport': 500,
     'OutputEncoding': 'utf-8',
     'PlugIns': ['MiscUtils', 'WebUtils', 'TaskKit', 'UserKit', 'PSP'],
     'PrintConfigAtStartUp': True,
     'PrintPlugIns': True,
+    'PushChannel': 'Memory',
+    'PushMaxMessages': 100,
+    'PushMessageTimeout': 300,
     'RegisterSignalHandler': False,
     'ReloadServletClasses': False,
     'ReportRPCExceptionsInWebware': True,
+    'ResponseBrotliQuality': 4,
     'ResponseBufferSize': 8 * 1024,  # 8 kBytes
+    'ResponseCompression': False,
+    'ResponseCompressionLevel': 6,
+    'ResponseCompressionMinSize': 1024,
+    'ResponseCompressionTypes': None,
     'RetainSessions': True,
     'RPCExceptionReturn': 'traceback',
     'RunTasks': True,
     'SaveErrorMessages': True,
     'SecureSessionCookie': True,
+    'ServletClassCheckInterval': 0,
+    'ServletPoolPrewarm': 0,
+    'SessionCodec': 'pickle',
+    'SessionCompressMinSize': 1024,
     'SessionCookiePath': None,
+    'SessionLocking': False,
+    'SessionLockTimeout': 30,
+    'SessionLockExpiration': 60,
     'HttpOnlySessionCookie': True,
     'SameSiteSessionCookie': 'Strict',
     'SessionModule': 'Session',
@@ -124,8 +154,13 @@ defaultConfig = {
         'Technique': 'serveContent',  # or redirectSansScript
         'CacheContent': False,
         'MaxCacheContentSize': 128 * 1024,
-        'ReadBufferSize': 32 * 1024
+        'CacheContentTotalSize': 16 * 1024 * 1024,
+        'CacheContentTTL': None,
+        'CacheCompressedContent': True,
+        'ReadBufferSize': 32 * 1024,
+        'StreamContent': True
     },
+    'URLResolutionCacheSize': 1000,
     'UseAutomaticPathSessions': False,
     'UseCascadingExtensions': True,
     'UseCookieSessions': True,
@@ -191,6 +226,9 @@ class Application(ConfigurableForServerSidePath):
         self._shutDownHandlers = []
         self._plugIns = {}
         self._requestID = 0
+        self._asgiExecutor = None
+        self._pushChannel = None
+        self._pushChannelLock = Lock()
 
         self._imp = ImportManager()
 
@@ -232,6 +270,14 @@ class Application(ConfigurableForServerSidePath):
         else:
             self._taskManager = None
 
+        # Initialize activity log:
+        self._activityLog = (
+            ActivityLog(self) if self.setting('LogActivity') else None)
+
+        # Size limits for the request body and its parts:
+        self._uploadLimits = (
+            self.setting('MaxUploadSize'), self.setting('MaxUploadPartSize'))
+
         # Define this before initializing URLParser, so that contexts have a
         # chance to override this. Also be sure to define it before loading the
         # sessions, in case the loading of the sessions causes an exception.
@@ -293,6 +339,7 @@ class Application(ConfigurableForServerSidePath):
         self._autoPathSessions = setting('UseAutomaticPathSessions')
         self._alwaysSaveSessions = setting('AlwaysSaveSessions')
         self._retainSessions = setting('RetainSessions')
+        self._sessionLocking = setting('SessionLocking')
         moduleName = setting('SessionModule')
         className = moduleName.rpartition('.')[2]
         try:
@@ -307,7 +354,8 @@ class Application(ConfigurableForServerSidePath):
             self._sessionClass = None
         moduleName = setting('SessionStore')
         if moduleName in (
-                'Dynamic', 'File', 'Memcached', 'Memory', 'Redis', 'Shelve'):
+                'Dynamic', 'File', 'Memcached', 'Memory', 'Redis', 'Shelve',
+                'Sqlite'):
             moduleName = f'Session{moduleName}Store'
         className = moduleName.rpartition('.')[2]
         try:
@@ -427,6 +475,12 @@ class Application(ConfigurableForServerSidePath):
         tm = self.taskManager()
         if tm:
             tm.stop()
+        if self._activityLog:
+            self._activityLog.close()
+        if self._pushChannel:
+            self._pushChannel.close()
+        if self._asgiExecutor:
+            self._asgiExecutor.shutdown(wait=False)
         # Call all registered shutdown handlers
         for shutDownHandler in self._shutDownHandlers:
             try:
@@ -522,11 +576,15 @@ class Application(ConfigurableForServerSidePath):
         if debug:
             print(prefix, 'sessId =', sessId)
         if sessId:
+            if self._sessionLocking:
+                # wait until concurrent transactions have stored the session
+                trans.checkOutSession(sessId)
             try:
                 session = self.session(sessId)
                 if debug:
                     print(prefix, 'retrieved session =', session)
             except KeyError:
+                trans.checkInSession()
                 trans.request().setSessionExpired(1)
                 if not self.setting('IgnoreInvalidSession'):
                     raise HTTPSessionExpired from None
@@ -583,6 +641,29 @@ class Application(ConfigurableForServerSidePath):
 
     # endregion Sessions
 
+    # region Push channel
+
+    def pushChannel(self):
+        """Get the channel for pushing messages to clients.
+
+        The channel is created when it is first used, using the class
+        given in the PushChannel setting.
+        """
+        if self._pushChannel is None:
+            with self._pushChannelLock:
+                if self._pushChannel is None:
+                    moduleName = self.setting('PushChannel')
+                    if moduleName == 'Memory':
+                        moduleName = 'PushChannel'
+                    elif moduleName == 'Redis':
+                        moduleName = 'PushRedisChannel'
+                    className = moduleName.rpartition('.')[2]
+                    module = importlib.import_module(moduleName)
+                    self._pushChannel = getattr(module, className)(self)
+        return self._pushChannel
+
+    # endregion Push channel
+
     # region Misc Access
 
     def serverSidePath(self, path=None):
@@ -628,41 +709,21 @@ class Application(ConfigurableForServerSidePath):
         if self.setting('PrintConfigAtStartUp'):
             self.printConfig()
 
+    def activityLog(self):
+        """Return the activity log, or None if activity is not logged."""
+        return self._activityLog
+
     def writeActivityLog(self, trans):
         """Write an entry to the activity log.
 
         Writes an entry to the script log file. Uses settings
         ``ActivityLogFilename`` and ``ActivityLogColumns``.
+        The entry is written asynchronously by a background thread
+        unless ``ActivityLogQueueSize`` is set to zero.
         """
-        filename = self.setting('ActivityLogFilename')
-        if '/' not in filename:
-            filename = os.path.join(self._logDir, filename)
-        filename = self.serverSidePath(filename)
-        mode = 'a' if os.path.exists(filename) else 'w'
-        with open(filename, mode, encoding='utf-8') as f:
-            if mode == 'w':
-                f.write(','.join(self.setting('ActivityLogColumns')) + '\n')
-            values = []
-            objects = {
-                'application': self, 'transaction': trans,
-                'request': trans.request(),
-                'response': trans.response(),
-                'servlet': trans.servlet(),
-                # don't cause creation of session here:
-                'session': trans._session
-            }
-            for column in self.setting('ActivityLogColumns'):
-                try:
-                    value = valueForName(objects, column)
-                except Exception:
-                    value = '(unknown)'
-                if isinstance(value, float):
-                    # probably need more flexibility in the future
-                    value = f'{value:02f}'
-                else:
-                    value = str(value)
-                values.append(value)
-            f.write(','.join(values) + '\n')
+        if (activityLog := self._activityLog) is None:
+            activityLog = self._activityLog = ActivityLog(self)
+        activityLog.write(trans)
 
     def startTime(self):
         """Return the time the application was started.
@@ -697,6 +758,8 @@ class Application(ConfigurableForServerSidePath):
         """
         request = self.createRequestForDict(requestDict)
         if request:
+            if any(self._uploadLimits):
+                request.setUploadLimits(*self._uploadLimits)
             trans = Transaction(application=self, request=request)
             if trans:
                 request.setTransaction(trans)
@@ -720,6 +783,8 @@ class Application(ConfigurableForServerSidePath):
                     if servlet:
                         # return the current servlet to its pool
                         self.returnServlet(servlet)
+                    # make sure the session is not checked out any more
+                    trans.checkInSession()
                 if self.setting('LogActivity'):
                     self.writeActivityLog(trans)
             request.clearTransaction()
@@ -1193,7 +1258,8 @@ class Application(ConfigurableForServerSidePath):
 
         streamOut = WSGIStreamOut(
             start_response, bufferSize=self._responseBufferSize,
-            useWrite=self._wsgiWrite, encoding=self._outputEncoding)
+            useWrite=self._wsgiWrite, encoding=self._outputEncoding,
+            fileWrapper=environ.get('wsgi.file_wrapper'))
         transaction = self.dispatchRawRequest(requestDict, streamOut)
         try:
             streamOut.close()
@@ -1218,3 +1284,62 @@ class Application(ConfigurableForServerSidePath):
         return streamOut.iterable()
 
     # endregion WSGI interface
+
+    # region ASGI interface
+
+    async def asgi(self, scope, receive, send):
+        """The ASGI application callable.
+
+        HTTP requests are handled by the WSGI application callable in a pool
+        of at most ASGIThreads worker threads, so that requests which are
+        waiting for I/O do not block the event loop of the ASGI server.
+        The request body is received while it is read by the request, and
+        the response output is sent whenever it is flushed by the response.
+        The lifespan protocol is supported as well; the application is shut
+        down when the ASGI server shuts down.
+        """
+        scopeType = scope['type']
+        if scopeType == 'http':
+            loop = asyncio.get_running_loop()
+            responder = ASGIResponder(send, loop)
+            environ = environFromScope(scope, ASGIInput(receive, loop))
+
+            def handleRequest():
+                responder.finish(self(environ, responder.startResponse))
+
+            await loop.run_in_executor(self.asgiExecutor(), handleRequest)
+        elif scopeType == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.shutDown)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        else:
+            raise NotImplementedError(
+                f'The ASGI scope type {scopeType!r} is not supported.')
+
+    def asgiExecutor(self):
+        """Get the pool of worker threads for handling ASGI requests."""
+        if self._asgiExecutor is None:
+            self._asgiExecutor = ThreadPoolExecutor(
+                max_workers=self.setting('ASGIThreads'),
+                thread_name_prefix='ASGIWorker')
+        return self._asgiExecutor
+
+    @staticmethod
+    def runCoroutine(coroutine):
+        """Run the given coroutine and return its result.
+
+        This is used for servlet methods defined as coroutine functions.
+        The coroutine is run in a new event loop in the current thread, not
+        in the event loop of the ASGI server, so that it can still use the
+        blocking methods of the response, such as flush(), and so that
+        blocking code in the servlet cannot block the ASGI server.
+        """
+        return asyncio.run(coroutine)
+
+    # endregion ASGI interface
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Generated automatically by PSP compiler on Sat Oct 17 04:25:04 2026
+
+import sys
+import os
+import time
+from PSP.Examples.PSPExamplePage import PSPExamplePage
+import Page
+from PSP.FragmentCache import fragmentCache as _fragmentCache
+__orig_file__ = '/root/package/webware/PSP/Examples/Braces.psp'
+
+import types
+_baseClasses = []
+if isinstance(PSPExamplePage, types.ModuleType):
+    _baseClasses.append(PSPExamplePage.PSPExamplePage)
+else:
+    _baseClasses.append(PSPExamplePage)
+
+class _root_package_webware_PSP_Examples_Braces_psp(_baseClasses[0]):
+    def canBeThreaded(self):
+        return False
+    
+    def canBeReused(self):
+        return True
+    
+    def awake(self, trans):
+        for baseclass in self.__class__.__bases__:
+            if hasattr(baseclass, "awake"):
+                baseclass.awake(self, trans)
+                break
+        self.initPSP()
+        
+    
+    def __includeFile(self, filename):
+        self.write(_fragmentCache.get(
+            filename, self.application().outputEncoding()))
+    
+    def initPSP(self):
+        pass
+    
+    def title(self):
+        
+        return "Braces Test"
+
+    
+    def writeContent(self, transaction=None):
+        """I take a Webware Transaction object."""
+        trans = self._transaction
+        res = trans.response()
+        req = trans.request()
+        self._writeContent(res, req, trans)
+    def _writeContent(self, res, req=None, trans=None):
+        """I take a file-like object. I am useful for unit testing."""
+        _formatter = str
+        _write = res.write
+        _write("""
+ 
+ 
+
+
+
+""")
+        _write("""
+
+<h4 style=\"text-align:center;color:navy\">Python Server Pages</h4>
+
+<h2 style=\"text-align:center\">Braces Test</h2>
+
+<p>Dave Wallace (dwallace@delanet.com) has written a module that will convert Python code that uses braces for indentation into properly whitespace indented python syntax. This is pretty nifty, and very useful for PSP.</p>
+
+<p>The whitespace significance in Python syntax is difficult in PSP because HTML is the exact opposite. Whitespace doesn't matter, and neither do carriage-returns or anything else. So that makes the melding of Python and HTML a challenge.</p>
+
+<p>So this is one solution.</p>
+
+<p>Take out all of the whitespace significance, and just use <strong>braces</strong>.</p>
+
+<p>This module allows you to use braces where you would normally be hitting <code>&lt;return&gt;&lt;tab&gt;</code>. You can put the opening brace (<code style=\"background-color:#f0f0f8\">{</code>) on the line befoe the block starts, or on the first line of the block.  Same kind of deal for the closing brace (<code style=\"background-color:#f0f0f8\">}</code>). You still need to have the colon (<code style=\"background-color:#f0f0f8\">:</code>) on the line right before the block starts. That's just part of Python.</p>
+
+<p>To enable this functionality in PSP, you have to set braces as the indent type for your page. So you add this directive to your PSP page:<br>
+
+<blockquote><code style=\"background-color:#f0f0f8\">&lt;%@ page indentType=\"braces\" %&gt;</code></blockquote>
+
+<p>This is a little test of the functionality:</p>
+
+<ul>""")
+        for i in range(5):
+            _write("""
+<li>I'm number """)
+            _write(_formatter(i+1))
+            _write("""</li>
+""")
+            
+        _write("""</ul>
+
+<p>Click on &quot;View source&quot; over on the left to see the source for this page.</p>
+
+<p>See also the PSP documentation on braces.</p>
+""")
+        
+    ##footer
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Generated automatically by PSP compiler on Sat Oct 17 04:25:04 2026
+
+import sys
+import os
+import time
+from PSP.Examples.PSPExamplePage import PSPExamplePage
+import Page
+from PSP.FragmentCache import fragmentCache as _fragmentCache
+__orig_file__ = '/root/package/webware/PSP/Examples/Hello.psp'
+
+import types
+_baseClasses = []
+if isinstance(PSPExamplePage, types.ModuleType):
+    _baseClasses.append(PSPExamplePage.PSPExamplePage)
+else:
+    _baseClasses.append(PSPExamplePage)
+
+class _root_package_webware_PSP_Examples_Hello_psp(_baseClasses[0]):
+    def canBeThreaded(self):
+        return False
+    
+    def canBeReused(self):
+        return True
+    
+    def awake(self, trans):
+        for baseclass in self.__class__.__bases__:
+            if hasattr(baseclass, "awake"):
+                baseclass.awake(self, trans)
+                break
+        self.initPSP()
+        
+    
+    def __includeFile(self, filename):
+        self.write(_fragmentCache.get(
+            filename, self.application().outputEncoding()))
+    
+    def initPSP(self):
+        pass
+    
+    def title(self):
+        
+        return "PSP Hello"
+
+    
+    def writeContent(self, transaction=None):
+        """I take a Webware Transaction object."""
+        trans = self._transaction
+        res = trans.response()
+        req = trans.request()
+        self._writeContent(res, req, trans)
+    def _writeContent(self, res, req=None, trans=None):
+        """I take a file-like object. I am useful for unit testing."""
+        _formatter = str
+        _write = res.write
+        _write("""
+
+
+
+
+
+
+
+
+""")
+        _write("""
+
+<h1 style=\"text-align:center;color:navy\">Hello from PSP!</h1>
+
+
+<p style=\"text-align:center\"><img src=\"psplogo.png\" alt=\"Python Server Pages\"></p>
+
+<p>This is <strong>PSP</strong>. Please read the user's guide for more information.</p>
+
+<p>Here are some examples. <a href=\"PSPTests\">PSPTests</a> shows most of the functionality:</p>
+
+<ul>""")
+        
+        import glob
+        filePath = self.request().serverSidePath()
+        files = glob.glob(os.path.join(os.path.dirname(filePath), "*.psp"))
+        for path in files:
+            name = os.path.split(path)[1]
+
+            _write("""
+<li><a href=\"""")
+            _write(_formatter(name))
+            _write("""\"> """)
+            _write(_formatter(name ))
+            _write("""</a></li>
+""")
+        _write("""</ul>
+
+<p>So anyway, read through the user's guide, and look at <a href=\"PSPTests\">PSPTests</a> for examples.</p>
+""")
+        
+    ##footer
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Generated automatically by PSP compiler on Sat Oct 17 04:25:04 2026
+
+import sys
+import os
+import time
+import PSP.Examples.PSPExamplePage
+import time
+import Page
+from PSP.FragmentCache import fragmentCache as _fragmentCache
+__orig_file__ = '/root/package/webware/PSP/Examples/PSPTests-Braces.psp'
+
+import types
+_baseClasses = []
+if isinstance(PSP.Examples.PSPExamplePage, types.ModuleType):
+    _baseClasses.append(PSP.Examples.PSPExamplePage.PSPExamplePage)
+else:
+    _baseClasses.append(PSP.Examples.PSPExamplePage)
+
+class _root_package_webware_PSP_Examples_PSPTests_Braces_psp(_baseClasses[0]):
+    def canBeThreaded(self):
+        return False
+    
+    def canBeReused(self):
+        return True
+    
+    def awake(self, trans):
+        for baseclass in self.__class__.__bases__:
+            if hasattr(baseclass, "awake"):
+                baseclass.awake(self, trans)
+                break
+        self.initPSP()
+        
+    
+    def __includeFile(self, filename):
+        self.write(_fragmentCache.get(
+            filename, self.application().outputEncoding()))
+    
+    def initPSP(self):
+        pass
+    
+    def title(self):
+        
+        return "PSP Tests Page - Braces"
+
+    def testing(self, val):
+        
+        self._response.write(f'<p>I\'m a method. <b style="color:maroon">{val}</b></p>')
+
+    
+    def writeContent(self, transaction=None):
+        """I take a Webware Transaction object."""
+        trans = self._transaction
+        res = trans.response()
+        req = trans.request()
+        self._writeContent(res, req, trans)
+    def _writeContent(self, res, req=None, trans=None):
+        """I take a file-like object. I am useful for unit testing."""
+        _formatter = str
+        _write = res.write
+        _write("""
+
+
+
+
+
+
+
+
+
+""")
+        _write("""
+
+<h1 style=\"text-align:center;color:navy\">Hello from PSP!</h1>
+
+
+<p style=\"text-align:center\"><img src=\"psplogo.png\" alt=\"Python Server Pages\"></p>
+
+<h4 style=\"text-align:center\">This is the sample/test page<br>
+for an implementation of<br>
+<span style=\"color:navy\">Python Server Pages</span>.</h4>
+
+<p style=\"text-align:center\"><span style=\"color:navy;background-color:yellow;padding:1pt 6pt\">This version
+of the test page uses <a href=\"Braces\"><strong>braces</strong></a> as the indent type.</span></p>
+
+<p style=\"text-align:center\">You will find more explanations the PSP User's Guide.
+See the <a href=\"View.py?filename=""")
+        _write(_formatter(os.path.basename(self.request().serverSidePath())))
+        _write("""\"><strong>source for this page</strong></a>.</p>
+
+<p>The text below comes from another psp page which was inserted into this one with the <code>&lt;%@&nbsp;include&nbsp;%&gt;</code> directive.</p>
+
+<div style=\"color:red\">
+<p>Hello from included file!<p>
+
+<p>""")
+        _write(_formatter(time.ctime() ))
+        _write("""</p>
+</div>
+
+<p>There are actually two ways to insert the contents of another file into a PSP page:</p>
+
+<p>If you use <code>&lt;%@&nbsp;include&nbsp;file=\"somefile\"&nbsp;%&gt;</code>, it will effectively insert the contents of the other file before class creation time.</p>
+
+<p>Using <code>&lt;psp:include&nbsp;path=\"somefile\"&gt;</code> will insert the output of the specified Webware URL into the page <em>dynamically</em>.</p>
+
+<div style=\"color:red\">""")
+        self.__includeFile('/root/package/webware/PSP/Examples/my_include.html')
+        _write("""</div>
+
+<p>Time at which dynamic output was generated:</p>
+""")
+        __pspincludepath = "PSPinclude.psp"
+        self.transaction().application().includeURL(self.transaction(), __pspincludepath)
+        _write("""
+
+<h4>Below is a loop test:</h4>
+
+<p>Loops are the trickiest part of PSP due to Python indentation for blocks syntax.</p>
+
+<p style=\"color:navy\">The use of braces, while not good for normal Python, does make things easier here where we are dealing with HTML.</p>
+
+
+<ul>""")
+        for i in range(2): # loop #1, an automatic loop
+            self.write('<li>Outer loop: ')
+            self.write(i+1) 
+            _write("""<ul>
+    """)
+            for j in range(2):
+                _write("""
+        <li>Inner loop: """)
+                _write(_formatter(j+1 ))
+                _write("""
+        """)
+                self.write('(still in the inner loop)</li>')
+                
+            # end loop #2
+            self.write('</ul></li>')
+            
+        # end loop #1
+        _write("""</ul>
+
+<hr>
+
+<h4>Unix system info:</h4>
+<table style=\"background-color:gray\">""")
+
+        if os.name == 'posix':
+            for info, value in zip(('OS name', 'Hostname',
+            'OS release', 'OS version', 'Hardware'), os.uname()):
+                res.write('<tr><td>' + info + ':&nbsp;</th>'
+                '<td style="color:white">' + str(value) + '</td></tr>')
+                
+            
+        else:
+            res.write('<tr><td style="color:white">'
+            'This is not a Unix system.</td></tr>')
+            
+        _write("""</table>
+
+<hr>
+
+<table>
+<tr><th style=\"text-align:left\">Path Info:</th><td>""")
+        _write(_formatter(req.pathInfo()))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">extraURLPath:</th><td>""")
+        _write(_formatter(req.extraURLPath()))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">Fields:</th><td>""")
+        _write(_formatter(req.fields() ))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">servletURI:</th><td>""")
+        _write(_formatter(req.servletURI()))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">uriWebwareRoot:&nbsp;</th><td>""")
+        _write(_formatter(req.uriWebwareRoot() ))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">serverURL:</th><td>""")
+        _write(_formatter(req.serverURL() ))
+        _write("""</td></tr>
+<tr><th style=\"text-align:left\">serverURLDir:</th><td>""")
+        _write(_formatter(req.serverURLDir() ))
+        _write("""</td></tr>
+</table>
+
+<hr>
+
+<h4>Request Variables:</h4>
+
+<table>""")
+        for i, v in self.request()._environ.items():
+            res.write('<tr style="vertical-align:top"><td style="color:red;font-size:small">'
+            +str(i)+'&nbsp;</td><td style="color:blue;font-size:small">'
+            +self.htmlEncode(v).replace(',', ',<wbr>').replace(';', ';<wbr>').replace(':/', ':<wbr>/')
+            +'</td></tr>') 
+        _write("""</table>
+
+<hr>
+
+<h4>Comments:</h4>
+
+<p>PSP comments will not show up in the source of the page.</p>
+
+<p>Nothing should be visible here.</p>
+
+
+<!-- Comment Check -->
+
+<hr>
+
+<h4>Testing a class method defined in the PSP code:</h4>
+
+
+""")
+        _write("""
+
+""")
+        self.testing('Howdy!')
+        _write("""
+
+<hr>
+
+<p><code>pass</code> can be used to end a block, so test that it can be used by itself too!</p>
+
+""")
+        pass 
+        _write("""
+
+<p><em>If-Test:</em>
+""")
+        if 1:
+            _write("""<b style=\"color:green\">It's True</b>""")
+            
+        else:
+            _write("""It's false""")
+            
+        _write("""</p>
+
+<hr>
+
+<p><strong>That's all, folks.</strong></p>
+
+<p>""")
+        _write(_formatter(time.ctime()))
+        _write("""</p>
+""")
+        
+    ##footer
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated automatically by PSP compiler on Sat Oct 17 04:25:04 2026
+
+import time
+import Page
+from PSP.FragmentCache import fragmentCache as _fragmentCache
+import Page
+__orig_file__ = '/root/package/webware/PSP/Examples/PSPinclude.psp'
+
+import types
+_baseClasses = []
+if isinstance(Page, types.ModuleType):
+    _baseClasses.append(Page.Page)
+else:
+    _baseClasses.append(Page)
+
+class _root_package_webware_PSP_Examples_PSPinclude_psp(_baseClasses[0]):
+    def canBeThreaded(self):
+        return False
+    
+    def canBeReused(self):
+        return True
+    
+    def awake(self, trans):
+        for baseclass in self.__class__.__bases__:
+            if hasattr(baseclass, "awake"):
+                baseclass.awake(self, trans)
+                break
+        self.initPSP()
+        
+    
+    def __includeFile(self, filename):
+        self.write(_fragmentCache.get(
+            filename, self.application().outputEncoding()))
+    
+    def initPSP(self):
+        pass
+    
+    
+    def writeHTML(self, transaction=None):
+        """I take a Webware Transaction object."""
+        trans = self._transaction
+        res = trans.response()
+        req = trans.request()
+        self._writeHTML(res, req, trans)
+    def _writeHTML(self, res, req=None, trans=None):
+        """I take a file-like object. I am useful for unit testing."""
+        _formatter = str
+        _write = res.write
+        _write("""
+
+<p style=\"color:purple\">The current time is: """)
+        _write(_formatter(time.ctime() ))
+        _write("""</p>
+
+<hr>
+""")
+        
+    ##footer
@@ -42,7 +42,7 @@ class PyJs:
         args = ','.join(map(quoteJs, args))
         kwArgs = ','.join(f'{k}={quoteJs(v)}' for k, v in kw.items())
         allArgs = f'{args},{kwArgs}' if args and kwArgs else args or kwArgs
-        return self.__class__(f'{self}({allArgs}')
+        return self.__class__(f'{self}({allArgs})')
 
     def __getitem__(self, index):
         return self.__class__(f'{self}[{quoteJs(index)}]')
@@ -61,16 +61,27 @@ class AjaxPage(BaseClass):
     are able to be called by an Ajax-enabled web page. This is very similar
     in functionality to Webware's actions.
 
-    A polling mechanism can be used for long running requests (e.g. generating
+    A push mechanism can be used for long running requests (e.g. generating
     reports) or if you want to send commands to the client without the client
     first triggering an event (e.g. for a chat application). In the first case,
-    you should also specify a timeout after which polling shall be used.
+    you should also specify a timeout after which the result shall be pushed.
+
+    Pushed commands are queued in the push channel of the application and
+    delivered to the client as server-sent events, or with long polling if
+    the client does not support these. In both cases, the request waits
+    until commands are pushed, so every client occupies one request thread
+    while it is connected. The push channel can also be shared between
+    several processes, see the PushChannel setting.
     """
 
     # Class level variables that can be overridden by servlet instances:
     _debug = False  # set to True if you want to see debugging output
     _clientPolling = True  # set to True if you want to use polling
+    _serverEvents = True  # use server-sent events if supported by the client
     _responseTimeout = 90  # timeout of client waiting for response in seconds
+    _longPollTimeout = 25  # time in seconds a poll waits for pushed commands
+    _eventStreamDuration = 300  # time in seconds before event stream renewal
+    _keepAliveInterval = 15  # interval in seconds for keep-alive events
 
     # Class level variables to help make client code simpler:
     window, document, alert, this = map(
@@ -79,21 +90,20 @@ class AjaxPage(BaseClass):
         PyJs, 'setTag setClass setID setValue setReadonly'.split())
     call, callForm = map(PyJs, ('ajax_call', 'ajax_call_form'))
 
-    # Response Queue for timed out queries:
-    _responseQueue = {}
-
     def writeJavaScript(self):
         BaseClass.writeJavaScript(self)
         s = '<script src="ajax{}.js"></script>'
         self.writeln(s.format('call'))
         if self._clientPolling:
+            self.writeln('<script>var server_events = {};</script>'.format(
+                str(self._serverEvents).lower()))
             self.writeln(s.format('poll'))
 
     def actions(self):
         actions = BaseClass.actions(self)
         actions.append('ajaxCall')
         if self._clientPolling:
-            actions.append('ajaxPoll')
+            actions.extend(('ajaxPoll', 'ajaxEvents'))
         return actions
 
     def exposedMethods(self):
@@ -101,11 +111,24 @@ class AjaxPage(BaseClass):
 
     @staticmethod
     def clientPollingInterval():
-        """Set the interval for the client polling.
+        """Set the interval for reconnecting after a poll.
+
+        Since the polls wait for pushed commands on the server,
+        the client can reconnect after a short interval. You should
+        always make it a little random to avoid synchronization.
+        """
+        return randrange(1, 3)
 
-        You should always make it a little random to avoid synchronization.
+    def pushKey(self):
+        """Get the key for the commands pushed to the client.
+
+        This is the session id. If it is sent with the request, the session
+        is not loaded, so that a waiting request does not hold the session.
         """
-        return randrange(3, 8)
+        sid = self.request().sessionId()
+        if not sid or not self.application().hasSession(sid):
+            sid = self.session().identifier()
+        return sid
 
     def ajaxCall(self):
         """Execute method with arguments on the server side.
@@ -162,23 +185,23 @@ class AjaxPage(BaseClass):
             # put the result in the queue and let client poll it:
             if self._debug:
                 self.log(f"Ajax puts in queue: {cmd}")
-            sid = self.session().identifier()
-            self._responseQueue.setdefault(sid, []).append(cmd)
+            self.ajaxPush(cmd)
 
     def ajaxPoll(self):
         """Return queued JavaScript functions to be executed on the client.
 
-        This is polled by the client in random intervals in order to get
-        results from long-running queries or push content to the client.
+        This is polled by the client in order to get results from
+        long-running queries or push content to the client. If no commands
+        are queued, the request waits until commands are pushed or the
+        long poll times out.
         """
         if self._clientPolling:
-            sid = self.session().identifier()
+            messages = self.application().pushChannel().pull(
+                self.pushKey(), self._longPollTimeout)
             # Set the timeout until the next time this method is called
             # by the client, using the Javascript wait variable:
             cmd = [f'wait={self.clientPollingInterval()}']
-            if sid in self._responseQueue:  # add in other commands
-                cmd.extend(map(str, self._responseQueue[sid]))
-                self._responseQueue[sid] = []
+            cmd.extend(map(str, messages))  # add in other commands
             cmd = ';'.join(cmd) + ';'
             if self._debug:
                 self.log(f"Ajax returns from queue: {cmd}")
@@ -189,6 +212,37 @@ class AjaxPage(BaseClass):
         self.response().setHeader('Content-Type', 'application/json')
         self.write(cmd)  # write out at least the wait variable
 
+    def ajaxEvents(self):
+        """Send pushed JavaScript functions to the client as events.
+
+        The client receives the commands as server-sent events as soon as
+        they are pushed. The event stream ends after a while, and is then
+        renewed by the client automatically.
+        """
+        response = self.response()
+        response.setHeader('Content-Type', 'text/event-stream')
+        response.setHeader('Cache-Control', 'no-cache')
+        response.setHeader('X-Accel-Buffering', 'no')
+        channel = self.application().pushChannel()
+        sid = self.pushKey()
+        # Set the time until the client reconnects in milliseconds:
+        self.write(f'retry: {self.clientPollingInterval() * 1000}\n\n')
+        response.flush()
+        endTime = time() + self._eventStreamDuration
+        while not channel.isClosed() and (remaining := endTime - time()) > 0:
+            messages = channel.pull(
+                sid, min(self._keepAliveInterval, remaining))
+            if messages:
+                for cmd in messages:
+                    if self._debug:
+                        self.log(f"Ajax sends event: {cmd}")
+                    self.write(''.join(
+                        f'data: {line}\n' for line in str(cmd).splitlines()))
+                    self.write('\n')
+            else:
+                self.write(': keep-alive\n\n')
+            response.flush()
+
     def ajaxPush(self, cmd):
         """Push JavaScript commands to be executed on the client.
 
@@ -198,12 +252,12 @@ class AjaxPage(BaseClass):
             if self._debug:
                 self.log(f"Ajax pushes in queue: {cmd}")
             sid = self.session().identifier()
-            self._responseQueue.setdefault(sid, []).append(cmd)
+            self.application().pushChannel().push(sid, str(cmd))
 
     def preAction(self, actionName):
-        if actionName not in ('ajaxCall', 'ajaxPoll'):
+        if actionName not in ('ajaxCall', 'ajaxPoll', 'ajaxEvents'):
             BaseClass.preAction(self, actionName)
 
     def postAction(self, actionName):
-        if actionName not in ('ajaxCall', 'ajaxPoll'):
+        if actionName not in ('ajaxCall', 'ajaxPoll', 'ajaxEvents'):
             BaseClass.postAction(self, actionName)
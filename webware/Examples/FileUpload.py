@@ -1,6 +1,25 @@
+from hashlib import sha256
+
 from .ExamplePage import ExamplePage
 
 
+class UploadSummary:
+    """Summary of an uploaded file, computed while the file arrives."""
+
+    previewSize = 4096
+
+    def __init__(self):
+        self.size = 0
+        self.hash = sha256()
+        self.preview = b''
+
+    def write(self, data):
+        self.size += len(data)
+        self.hash.update(data)
+        if len(self.preview) < self.previewSize:
+            self.preview += data[:self.previewSize - len(self.preview)]
+
+
 class FileUpload(ExamplePage):
     """This servlet shows how to handle uploaded files.
 
@@ -15,8 +34,20 @@ class FileUpload(ExamplePage):
     You'll need to do something with the data in this file. The temp file will
     be automatically deleted. If you want to save the data in the uploaded file
     read it out and write it to a new file, database, whatever.
+
+    If you don't need the whole file, or want to store it somewhere else
+    anyway, you can also set an upload handler on the request in awake(),
+    before the fields are accessed. This example uses a handler that only
+    computes the size and a hash of the uploaded file and keeps its beginning,
+    so the file is processed while it arrives and never stored on disk.
     """
 
+    def awake(self, transaction):
+        super().awake(transaction)
+        # must be set before the fields are accessed for the first time
+        transaction.request().setUploadHandler(
+            lambda field: UploadSummary())
+
     def title(self):
         return "File Upload Example"
 
@@ -24,7 +55,8 @@ class FileUpload(ExamplePage):
         self.writeln("<h1>Upload Test</h1>")
         try:
             f = self.request().field('filename')
-            contents = f.file.read()
+            summary = f.file
+            contents = summary.preview
         except Exception:
             output = f'''<p>{self.htmlEncode(self.__doc__)}</p>
 <form action="FileUpload" method="post" enctype="multipart/form-data">
@@ -48,7 +80,8 @@ class FileUpload(ExamplePage):
 <tr><th>disposition</th><td>{f.disposition}</td></tr>
 <tr><th>disposition_options</th><td>{f.disposition_options}</td></tr>
 <tr><th>headers</th><td>{f.headers}</td></tr>
-<tr><th>size</th><td>{len(contents)} bytes</td></tr>
+<tr><th>size</th><td>{summary.size} bytes</td></tr>
+<tr><th>sha256</th><td>{summary.hash.hexdigest()}</td></tr>
 <tr><th style="vertical-align:top">contents</th>
 <td><pre style="font-size:small;margin:0">{contentString}</pre></td></tr>
 </table>'''
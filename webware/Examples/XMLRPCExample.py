@@ -16,6 +16,15 @@ class XMLRPCExample(XMLRPCServlet):
     >>> server.add(10,20)
     30
 
+    Several calls can also be sent in one request:
+
+    >>> from xmlrpc.client import MultiCall
+    >>> multicall = MultiCall(server)
+    >>> multicall.multiply(10,20)
+    >>> multicall.add(10,20)
+    >>> tuple(multicall())
+    (200, 30)
+
     You'll get an exception if you try to call divide, because that
     method is not listed in exposedMethods.
     """
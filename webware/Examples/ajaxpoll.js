@@ -1,8 +1,9 @@
 /*
     Extended Ajax JavaScript functions used by AjaxPage.
 
-    Implements a periodic polling mechanism to prevent server timeouts
-    and to allow pushing commands from the server to the client.
+    Implements a push mechanism to prevent server timeouts and to allow
+    pushing commands from the server to the client, using server-sent
+    events if the browser supports these, and long polling otherwise.
 
     Written by John Dickinson based on ideas from
     Apple Developer Connection and DivMod Nevow.
@@ -10,7 +11,21 @@
 */
 
 var dying = false;
-var poll_requester = getRequester();
+var poll_requester = null;
+var event_source = null;
+
+function openEventSource()
+{
+    event_source = new EventSource(request_url + 'Events');
+    event_source.onmessage = function(event) {
+        try {
+            eval(event.data);
+        } catch(e) { } // ignore errors
+        if (dying) {
+            shutdown();
+        }
+    }
+}
 
 function openPollConnection()
 {
@@ -18,7 +33,7 @@ function openPollConnection()
     {
         var req = poll_requester;
         req.onreadystatechange = function() {
-            var wait = 3 + Math.random() * 5; // 3 - 8 seconds
+            var wait = 1 + Math.random() * 2; // 1 - 3 seconds
             if (req.readyState == 4) {
                 if (req.status == 200) {
                     try {
@@ -43,6 +58,9 @@ function shutdown()
     if (poll_requester) {
         poll_requester.abort();
     }
+    if (event_source) {
+        event_source.close();
+    }
     dying = true;
 }
 
@@ -52,4 +70,9 @@ else if (window.attachEvent)  // MSIE
     window.attachEvent("onbeforeunload", shutdown);
 
 // Open initial connection back to server:
-openPollConnection();
+if (window.server_events && window.EventSource) {
+    openEventSource();
+} else {
+    poll_requester = getRequester();
+    openPollConnection();
+}
@@ -293,6 +293,15 @@ class HTTPConflict(HTTPException):
     _code = 409, 'Conflict'
 
 
+class HTTPLengthRequired(HTTPException):
+    """HTTPException "length required" subclass.
+
+    The server refuses to accept the request without a defined
+    Content-Length header.
+    """
+    _code = 411, 'Length Required'
+
+
 class HTTPUnsupportedMediaType(HTTPException):
     """HTTPException "unsupported media type" subclass.
 
@@ -313,6 +322,17 @@ class HTTPPreconditionFailed(HTTPException):
     _code = 412, 'Precondition Failed'
 
 
+class HTTPRequestEntityTooLarge(HTTPException):
+    """HTTPException "request entity too large" subclass.
+
+    The server is refusing to process the request because the request
+    entity, usually a file upload, is larger than the server is willing
+    or able to process.
+    """
+    _code = 413, 'Request Entity Too Large'
+    _description = 'The data sent with the request is too large'
+
+
 class HTTPServerError(HTTPException):
     """HTTPException "Server Error" subclass.
 
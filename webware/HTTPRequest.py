@@ -3,14 +3,17 @@
 import os
 import sys
 import traceback
+from io import BytesIO
 from operator import itemgetter
+from tempfile import SpooledTemporaryFile
 from time import time
 from http.cookies import SimpleCookie as Cookie
 
 import HTTPResponse
 
 from MiscUtils import NoDefault
-from WebUtils.FieldStorage import FieldStorage
+from WebUtils.FieldStorage import FieldStorage, LimitExceeded
+from HTTPExceptions import HTTPRequestEntityTooLarge
 from Request import Request
 
 debug = False
@@ -19,6 +22,9 @@ debug = False
 class HTTPRequest(Request):
     """The base class for HTTP requests."""
 
+    # bodies up to this size are buffered in memory when read via rawInput()
+    rawInputMemorySize = 1024 * 1024
+
     # region Initialization
 
     def __init__(self, requestDict=None):
@@ -33,38 +39,18 @@ class HTTPRequest(Request):
             self._environ = requestDict['environ']
             self._input = requestDict['input']
             self._requestID = requestDict['requestID']
-            # Protect the loading of fields with an exception handler,
-            # because bad headers sometimes can break the field storage
-            # (see also https://github.com/python/cpython/issues/71964).
-            try:
-                self._fields = FieldStorage(
-                    self._input, environ=self._environ,
-                    keep_blank_values=True, strict_parsing=False)
-            except Exception:
-                self._fields = FieldStorage(keep_blank_values=True)
-                traceback.print_exc(file=sys.stderr)
-            self._cookies = Cookie()
-            if 'HTTP_COOKIE' in self._environ:
-                # If there are duplicate cookies, always use the first one
-                # because it is the most relevant one according to RFC 2965
-                # (see also https://github.com/python/cpython/issues/42664).
-                # noinspection PyTypeChecker
-                cookies = dict(cookie.split('=', 1) for cookie in reversed(
-                    self._environ['HTTP_COOKIE'].split('; ')))
-                # Protect the loading of cookies with an exception handler,
-                # because MSIE cookies sometimes can break the cookie module.
-                try:
-                    self._cookies.load(cookies)
-                except Exception:
-                    traceback.print_exc(file=sys.stderr)
         else:
             # If there's no dictionary, we pretend we're a CGI script
             # and see what happens...
             self._time = time()
             self._environ = os.environ.copy()
             self._input = None
-            self._fields = FieldStorage(keep_blank_values=True)
-            self._cookies = Cookie()
+        # The fields and cookies are parsed when they are first needed.
+        self._fieldStorage = self._fields = self._cookies = None
+        # the body is buffered when it is accessed via rawInput()
+        self._rawInput = None
+        self._maxUploadSize = self._maxUploadPartSize = None
+        self._uploadHandler = None
 
         env = self._environ
 
@@ -101,9 +87,45 @@ class HTTPRequest(Request):
             if self._queryString:
                 self._uri += '?' + self._queryString
 
+        self._contextName = None
+        self._serverSidePath = self._serverSideContextPath = None
+        self._serverRootPath = ''
+        self._sessionExpired = False
+
+        self._pathInfo = self.pathInfo()
+
+        if debug:
+            print("Done setting up request")
+
+    def parseFields(self):
+        """Parse the fields of the request.
+
+        This is done automatically when the fields are first accessed.
+        The body of the request is only read at this point.
+        """
+        if self._input is None:
+            fieldStorage = FieldStorage(keep_blank_values=True)
+        else:
+            if self._rawInput is not None:
+                self._rawInput.seek(0)  # reuse the buffered body
+            # Protect the loading of fields with an exception handler,
+            # because bad headers sometimes can break the field storage
+            # (see also https://github.com/python/cpython/issues/71964).
+            try:
+                fieldStorage = FieldStorage(
+                    self._input, environ=self._environ,
+                    keep_blank_values=True, strict_parsing=False,
+                    max_part_size=self._maxUploadPartSize,
+                    max_total_size=self._maxUploadSize,
+                    upload_handler=self._uploadHandler)
+            except LimitExceeded as e:
+                raise HTTPRequestEntityTooLarge(str(e)) from e
+            except Exception:
+                fieldStorage = FieldStorage(keep_blank_values=True)
+                traceback.print_exc(file=sys.stderr)
         # We use the cgi module to get the fields,
         # but then change them into an ordinary dictionary of values:
-        fieldStorage, fields = self._fields, {}
+        fields = {}
         try:
             # Avoid accessing fieldStorage as dict; that would be very slow
             # as it always iterates over all items to find a certain key.
@@ -126,22 +148,32 @@ class HTTPRequest(Request):
             for key, value in fields.items():
                 if len(value) == 1:
                     fields[key] = value[0]
+        if debug:
+            print("Found fields:", ', '.join(fields))
         self._fieldStorage, self._fields = fieldStorage, fields
 
+    def parseCookies(self):
+        """Parse the cookies of the request.
+
+        This is done automatically when the cookies are first accessed.
+        """
+        cookies = Cookie()
+        if 'HTTP_COOKIE' in self._environ:
+            # If there are duplicate cookies, always use the first one
+            # because it is the most relevant one according to RFC 2965
+            # (see also https://github.com/python/cpython/issues/42664).
+            # noinspection PyTypeChecker
+            values = dict(cookie.split('=', 1) for cookie in reversed(
+                self._environ['HTTP_COOKIE'].split('; ')))
+            # Protect the loading of cookies with an exception handler,
+            # because MSIE cookies sometimes can break the cookie module.
+            try:
+                cookies.load(values)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
         # We use Tim O'Malley's Cookie class to get the cookies,
         # but then change them into an ordinary dictionary of values
-        self._cookies = {
-            key: self._cookies[key].value for key in self._cookies}
-
-        self._contextName = None
-        self._serverSidePath = self._serverSideContextPath = None
-        self._serverRootPath = ''
-        self._sessionExpired = False
-
-        self._pathInfo = self.pathInfo()
-
-        if debug:
-            print("Done setting up request, found fields:", ', '.join(fields))
+        self._cookies = {key: cookies[key].value for key in cookies}
 
     # endregion Initialization
 
@@ -166,6 +198,12 @@ class HTTPRequest(Request):
     def responseClass(self):
         return HTTPResponse.HTTPResponse
 
+    def clearTransaction(self):
+        """Clear the transaction and close the buffer of the raw input."""
+        Request.clearTransaction(self)
+        if self._rawInput is not None:
+            self._rawInput.close()
+
     # endregion Transactions
 
     # region Values
@@ -176,13 +214,13 @@ class HTTPRequest(Request):
         Values are fields or cookies.
         Use this method when you're field/cookie agnostic.
         """
-        if name in self._fields:
-            return self._fields[name]
+        if name in (fields := self.fields()):
+            return fields[name]
         return self.cookie(name, default)
 
     def hasValue(self, name):
         """Check whether there is a value with the given name."""
-        return name in self._fields or name in self._cookies
+        return name in self.fields() or name in self.cookies()
 
     def extraURLPath(self):
         """Return additional path components in the URL.
@@ -197,24 +235,51 @@ class HTTPRequest(Request):
     # region Fields
 
     def fieldStorage(self):
+        if self._fieldStorage is None:
+            self.parseFields()
         return self._fieldStorage
 
+    def setUploadLimits(self, maxSize=None, maxPartSize=None):
+        """Set the size limits for the body and the parts of the request.
+
+        If the body of the request or one of the parts of a multipart form
+        has more bytes, accessing the fields raises an
+        `HTTPRequestEntityTooLarge` exception. Must be set before the fields
+        are accessed.
+        """
+        self._maxUploadSize = maxSize
+        self._maxUploadPartSize = maxPartSize
+
+    def setUploadHandler(self, handler):
+        """Set a handler for processing uploaded files while they arrive.
+
+        The handler is called with the field storage of every uploaded
+        file before its content is read, and can return an object with
+        a write() method, which will then get the content in chunks instead
+        of storing it in a temporary file. That object will be available as
+        the file attribute of the uploaded field. Must be set before the
+        fields are accessed, e.g. in the awake() method of the servlet.
+        """
+        self._uploadHandler = handler
+
     def field(self, name, default=NoDefault):
         if default is NoDefault:
-            return self._fields[name]
-        return self._fields.get(name, default)
+            return self.fields()[name]
+        return self.fields().get(name, default)
 
     def hasField(self, name):
-        return name in self._fields
+        return name in self.fields()
 
     def fields(self):
+        if self._fields is None:
+            self.parseFields()
         return self._fields
 
     def setField(self, name, value):
-        self._fields[name] = value
+        self.fields()[name] = value
 
     def delField(self, name):
-        del self._fields[name]
+        del self.fields()[name]
 
     # endregion Fields
 
@@ -223,15 +288,17 @@ class HTTPRequest(Request):
     def cookie(self, name, default=NoDefault):
         """Return the value of the specified cookie."""
         if default is NoDefault:
-            return self._cookies[name]
-        return self._cookies.get(name, default)
+            return self.cookies()[name]
+        return self.cookies().get(name, default)
 
     def hasCookie(self, name):
         """Return whether a cookie with the given name exists."""
-        return name in self._cookies
+        return name in self.cookies()
 
     def cookies(self):
         """Return a dict of all cookies the client sent with this request."""
+        if self._cookies is None:
+            self.parseCookies()
         return self._cookies
 
     # endregion Cookies
@@ -648,16 +715,66 @@ class HTTPRequest(Request):
         the request (e.g., the body of a POST request, or the document
         uploaded in a PUT request).
 
-        The file might not be rewound to the beginning if there was valid,
-        form-encoded POST data. Pass rewind=True if you want to be sure
-        you get the entire body of the request.
+        If the fields of the request have not been accessed yet, the body
+        is copied from the input stream passed by the server into a seekable
+        binary buffer, which is kept in memory unless it is larger than
+        rawInputMemorySize. This buffer is also used when the fields are
+        accessed later. Otherwise, the file might not be rewound to the
+        beginning if there was valid, form-encoded POST data, and it is None
+        if the body has been fully parsed into the fields. Pass rewind=True
+        if you want to be sure you get the entire body of the request.
+        """
+        rawInput = self._rawInput
+        if rawInput is None:
+            if self._fieldStorage is None and self._input is not None:
+                rawInput = self._bufferInput()
+            else:
+                fs = self.fieldStorage()
+                if fs is None or fs.file is None:
+                    return None
+                rawInput = fs.file
+                if hasattr(rawInput, 'encoding'):
+                    # non-form data has been stored as text
+                    rawInput.seek(0)
+                    rawInput = BytesIO(rawInput.read().encode(
+                        fs.encoding, fs.errors))
+                self._rawInput = rawInput
+        if rewind:
+            rawInput.seek(0)
+        return rawInput
+
+    def _bufferInput(self):
+        """Copy the body of the request into a seekable binary buffer.
+
+        According to PEP 3333, at most CONTENT_LENGTH bytes are read from
+        the input stream, unless the server has marked it as terminated.
         """
-        fs = self.fieldStorage()
-        if fs is None:
-            return None
-        if rewind and fs.file:
-            fs.file.seek(0)
-        return fs.file
+        env = self._environ
+        try:
+            length = int(env.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        maxSize = self._maxUploadSize
+        if maxSize is not None and length > maxSize:
+            raise HTTPRequestEntityTooLarge(
+                'Maximum size of request body exceeded')
+        toEof = not length and env.get('wsgi.input_terminated')
+        read, bufferSize = self._input.read, 64 * 1024
+        buffer = SpooledTemporaryFile(max_size=self.rawInputMemorySize)
+        size = 0
+        while toEof or length > 0:
+            data = read(bufferSize if toEof else min(length, bufferSize))
+            if not data:
+                break
+            size += len(data)
+            if maxSize is not None and size > maxSize:
+                raise HTTPRequestEntityTooLarge(
+                    'Maximum size of request body exceeded')
+            buffer.write(data)
+            length -= len(data)
+        buffer.seek(0)
+        self._input = self._rawInput = buffer
+        return buffer
 
     def time(self):
         """Return the time that the request was received."""
@@ -785,8 +902,8 @@ class HTTPRequest(Request):
             ('time', self._time),
             ('environ', self._environ),
             ('input', self._input),
-            ('fields', self._fields),
-            ('cookies', self._cookies)
+            ('fields', self.fields()),
+            ('cookies', self.cookies())
         ]
         for method in _infoMethods:
             try:
@@ -9,6 +9,8 @@ from MiscUtils.Funcs import localTimeDelta
 from WebUtils.Funcs import htmlEncode
 
 from Response import Response
+from ResponseCompression import (
+    compressor, contentCodings, matchesMimeType, preferredEncoding)
 from Cookie import Cookie  # pylint: disable=wrong-import-order
 from HTTPExceptions import HTTPException, HTTPServerError
 
@@ -30,6 +32,7 @@ class HTTPResponse(Response):
         else:
             self._headers = headers
         self._cookies = {}
+        self._delivering = False
 
     # endregion Init
 
@@ -319,6 +322,7 @@ class HTTPResponse(Response):
             print("HTTPResponse deliver called")
         self.recordEndTime()
         if not self._committed:
+            self._delivering = True
             self.commit()
 
     def commit(self):
@@ -336,10 +340,71 @@ class HTTPResponse(Response):
                 err = HTTPServerError()
                 self._transaction.setError(err)
             self.setErrorHeaders(err)
+        self.setupCompression()
         self.writeHeaders()
         self._committed = True
         self._strmOut.commit()
 
+    def setupCompression(self):
+        """Set up compression of the response content. Used internally.
+
+        Invoked by commit() if ResponseCompression is enabled. The response
+        is compressed with the preferred content coding accepted by the
+        client if its content type is eligible. Responses with an entity tag
+        or byte range are not compressed since these refer to the unaltered
+        content. If the response is committed when it is delivered, it is
+        only compressed if it has at least ResponseCompressionMinSize bytes,
+        and the length of the compressed content is sent. If it is committed
+        earlier, the content is compressed as it is streamed, and flushing
+        the response also flushes the compressor.
+        """
+        trans = self._transaction
+        app = trans.application()
+        if not app.setting('ResponseCompression', False):
+            return
+        headers = self._headers
+        if ('Content-encoding' in headers or 'Etag' in headers
+                or 'Content-range' in headers):
+            return
+        status = headers.get('Status', '200')
+        if status.startswith(('1', '204', '206', '304')):
+            return
+        mimeType = headers.get('Content-type')
+        if not mimeType:
+            return
+        mimeType = mimeType.partition(';')[0].strip().lower()
+        if not matchesMimeType(
+                mimeType, app.setting('ResponseCompressionTypes', None)):
+            return
+        vary = headers.get('Vary')
+        if not vary:
+            headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower() and vary != '*':
+            headers['Vary'] = f'{vary}, Accept-Encoding'
+        strmOut = self._strmOut
+        if strmOut.hasFile():
+            return
+        delivering = self._delivering
+        if delivering and strmOut.size() < app.setting(
+                'ResponseCompressionMinSize', 1024):
+            return
+        request = trans.request()
+        if request.method() == 'HEAD':
+            return
+        coding = preferredEncoding(
+            request.environ().get('HTTP_ACCEPT_ENCODING'), contentCodings)
+        if not coding:
+            return
+        strmOut.setCompressor(compressor(coding, app.setting(
+            'ResponseBrotliQuality' if coding == 'br'
+            else 'ResponseCompressionLevel', None)))
+        headers['Content-encoding'] = coding
+        if delivering:
+            strmOut.compress(finish=True)
+            headers['Content-length'] = str(strmOut.size())
+        else:
+            headers.pop('Content-length', None)
+
     def writeHeaders(self):
         """Write headers to the response stream. Used internally."""
         if self._committed:
@@ -1,5 +1,6 @@
 """HTTP servlets"""
 
+from inspect import isawaitable
 from time import gmtime, strftime
 
 from Servlet import Servlet
@@ -14,6 +15,11 @@ class HTTPServlet(Servlet):
     Subclasses implement HTTP method FOO in the Python method respondToFoo.
     Unsupported methods return a "501 Not Implemented" status.
 
+    The respondToSomething() methods may also be coroutine functions
+    defined with ``async def``. They are then run in their own event loop
+    in the thread handling the request, so that they can await several
+    asynchronous operations concurrently.
+
     Note that HTTPServlet inherits awake() and respond() methods from
     Servlet and that subclasses may make use of these.
 
@@ -40,6 +46,7 @@ class HTTPServlet(Servlet):
         httpMethodName = request.method()
         # For GET and HEAD, handle the HTTP If-Modified-Since header:
         # If the object's last modified time equals this header, we're done.
+        # An If-None-Match header takes precedence and is left to the servlet.
         if httpMethodName in ('GET', 'HEAD'):
             # pylint: disable=assignment-from-none
             lastMod = self.lastModified(transaction)
@@ -51,7 +58,8 @@ class HTTPServlet(Servlet):
                 envGet = request.environ().get
                 ims = envGet('HTTP_IF_MODIFIED_SINCE') or envGet(
                     'IF_MODIFIED_SINCE')
-                if ims and ims.partition(';')[0] == lastMod:
+                if (ims and ims.partition(';')[0] == lastMod
+                        and not envGet('HTTP_IF_NONE_MATCH')):
                     response.delHeader('Content-Type')
                     response.setStatus(304, 'Not Modified')
                     return
@@ -60,7 +68,9 @@ class HTTPServlet(Servlet):
             methodName = 'respondTo' + httpMethodName.capitalize()
             method = getattr(self, methodName, self.notImplemented)
             self._methodForRequestType[httpMethodName] = method
-        method(transaction)
+        result = method(transaction)
+        if result is not None and isawaitable(result):
+            transaction.application().runCoroutine(result)
 
     @staticmethod
     def notImplemented(trans):
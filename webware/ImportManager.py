@@ -61,6 +61,10 @@ class ImportManager:
             print()
         return reloader
 
+    def reloader(self):
+        """Get the reloader monitoring the application (if any)."""
+        return self._reloader
+
     def moduleFromSpec(self, spec):
         """Load the module with the given module spec."""
         if not spec or not isinstance(spec, ModuleSpec):
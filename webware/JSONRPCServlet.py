@@ -3,12 +3,24 @@
 Written by Jean-Francois Pieronne
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from inspect import signature
 from json import dumps, loads
 from io import StringIO
+from threading import Lock
 from traceback import print_exc
 
+try:
+    import orjson  # pylint: disable=import-error
+except ImportError:
+    orjson = None
+
 from HTTPContent import HTTPContent
 
+# thread pools for executing batch calls, keyed by their number of threads
+_batchExecutors = {}
+_batchExecutorsLock = Lock()
+
 
 class JSONRPCServlet(HTTPContent):
     """A superclass for Webware servlets using JSON-RPC techniques.
@@ -23,6 +35,21 @@ class JSONRPCServlet(HTTPContent):
     Some basic security measures against JavaScript hijacking are taken by
     default which can be deactivated if you're not dealing with sensitive data.
     You can further increase security by adding shared secret mechanisms.
+
+    Besides the original JSON-RPC format, JSON-RPC 2.0 is supported as well.
+    Requests in this format can be notifications, which are executed without
+    sending a response, and several requests can be sent as a batch in one
+    HTTP request. The calls in a batch can be executed in parallel by setting
+    _batchThreads, in which case the exposed methods must be thread-safe.
+    The responses to the calls in a batch are written one by one, so that
+    large results are sent while the other calls are still being encoded.
+    JSON-RPC 2.0 responses are never prefixed for protection against direct
+    evaluation, since they are only returned for POST requests.
+
+    The JSON-RPC 2.0 requests and responses are decoded and encoded with
+    orjson if it is installed, unless _useOrjson is set to False. You can
+    also override the decode() and encode() methods to use another library.
+    Responses in the original format are always encoded with json.dumps().
     """
 
     # Class level variables that can be overridden by servlet instances:
@@ -31,6 +58,10 @@ class JSONRPCServlet(HTTPContent):
     # a vulnerability known as "JavaScript hijacking".
     _allowGet = False  # set to True if you want to allow GET requests
     _allowEval = False  # set to True to allow direct evaluation of response
+    # The following variables control JSON-RPC 2.0 requests:
+    _batchThreads = 0  # number of threads for executing batch calls
+    _useOrjson = True  # set to False if you do not want to use orjson
+    _streamResults = True  # send large batch responses while encoding
 
     def __init__(self):
         HTTPContent.__init__(self)
@@ -62,14 +93,45 @@ class JSONRPCServlet(HTTPContent):
                     f'("Direct evaluation not allowed");\n/*{data}*/')
         self.write(data)
 
+    def decode(self, data):
+        """Decode a JSON-RPC 2.0 request."""
+        if orjson and self._useOrjson:
+            return orjson.loads(data)
+        return loads(data)
+
+    def encode(self, data):
+        """Encode a JSON-RPC 2.0 response as string or bytes."""
+        if orjson and self._useOrjson:
+            return orjson.dumps(data)
+        return dumps(data)
+
     def jsonCall(self):
         """Execute method with arguments on the server side.
 
         Returns JavaScript function to be executed by the client immediately.
         """
-        self.response().setHeader('Content-Type', 'application/json')
+        response = self.response()
+        response.setHeader('Content-Type', 'application/json')
         request = self.request()
-        data = loads(request.rawInput().read())
+        try:
+            data = self.decode(request.rawInput().read())
+        except ValueError:
+            self.write(self.encode(self.errorResponse(
+                None, -32700, 'Parse error')))
+            return
+        if isinstance(data, list):
+            self.jsonBatchCall(data)
+        elif isinstance(data, dict) and data.get('jsonrpc') == '2.0':
+            result = self.jsonRPC2Call(data)
+            if result is None:
+                response.setStatus(204, 'No Content')
+            else:
+                self.write(self.encode(result))
+        else:
+            self.jsonRPC1Call(data)
+
+    def jsonRPC1Call(self, data):
+        """Execute a call in the original JSON-RPC format."""
         self._id, call, params = data['id'], data['method'], data['params']
         if call == 'system.listMethods':
             self.writeResult(self.exposedMethods())
@@ -92,11 +154,112 @@ class JSONRPCServlet(HTTPContent):
                             result = method()
                     self.writeResult(result)
                 except Exception:
-                    err = StringIO()
-                    print_exc(file=err)
-                    e = err.getvalue()
-                    self.writeError(f'{call} was called,'
-                                    f' but encountered an error: {e}')
-                    err.close()
+                    self.writeError(self.callErrorMessage(call))
         else:
             self.writeError(f'{call} is not an approved method')
+
+    def jsonBatchCall(self, batch):
+        """Execute a batch of JSON-RPC 2.0 calls.
+
+        The responses are written as an array, leaving out notifications.
+        If the batch contains only notifications, nothing is written.
+        """
+        response = self.response()
+        if not batch:
+            self.write(self.encode(self.errorResponse(
+                None, -32600, 'Invalid Request')))
+            return
+        if self._streamResults:
+            response.streamOut().setAutoCommit()
+        threads = self._batchThreads
+        if threads and len(batch) > 1:
+            results = self.batchExecutor(threads).map(
+                self.jsonRPC2Call, batch)
+        else:
+            results = map(self.jsonRPC2Call, batch)
+        write, encode = self.write, self.encode
+        separator = '['
+        for result in results:
+            if result is not None:
+                write(separator)
+                write(encode(result))
+                separator = ','
+        if separator == '[':
+            response.setStatus(204, 'No Content')
+        else:
+            write(']')
+
+    def jsonRPC2Call(self, data):
+        """Execute a single JSON-RPC 2.0 call and return the response.
+
+        Returns None if the call is a notification.
+        """
+        if not isinstance(data, dict) or data.get('jsonrpc') != '2.0':
+            return self.errorResponse(None, -32600, 'Invalid Request')
+        id_ = data.get('id')
+        call = data.get('method')
+        params = data.get('params', ())
+        if not isinstance(call, str) or not isinstance(
+                params, list | tuple | dict) or not isinstance(
+                id_, str | int | float | None):
+            return self.errorResponse(None, -32600, 'Invalid Request')
+        if call == 'system.listMethods':
+            result = {'jsonrpc': '2.0', 'result': list(self.exposedMethods())}
+        else:
+            method = getattr(
+                self, call, None) if call in self.exposedMethods() else None
+            if method is None:
+                result = self.errorResponse(id_, -32601, 'Method not found')
+            else:
+                args, kwargs = ((), params) if isinstance(
+                    params, dict) else (params, {})
+                try:
+                    signature(method).bind(*args, **kwargs)
+                except TypeError as e:
+                    result = self.errorResponse(
+                        id_, -32602, 'Invalid params', str(e))
+                else:
+                    try:
+                        if self._debug:
+                            self.log(f"json call {call}({params})")
+                        result = method(*args, **kwargs)
+                    except Exception:
+                        result = self.errorResponse(
+                            id_, -32603, 'Internal error',
+                            self.callErrorMessage(call))
+                    else:
+                        result = {'jsonrpc': '2.0', 'result': result}
+        if 'id' not in data:
+            return None  # notification
+        result['id'] = id_
+        return result
+
+    @staticmethod
+    def errorResponse(id_, code, message, data=None):
+        """Create a JSON-RPC 2.0 error response."""
+        error = {'code': code, 'message': message}
+        if data is not None:
+            error['data'] = data
+        return {'jsonrpc': '2.0', 'error': error, 'id': id_}
+
+    @staticmethod
+    def callErrorMessage(call):
+        """Get the error message for an exception raised by a call."""
+        err = StringIO()
+        print_exc(file=err)
+        e = err.getvalue()
+        err.close()
+        return f'{call} was called, but encountered an error: {e}'
+
+    @staticmethod
+    def batchExecutor(threads):
+        """Get the thread pool for executing batch calls in parallel."""
+        executor = _batchExecutors.get(threads)
+        if executor is None:
+            with _batchExecutorsLock:
+                executor = _batchExecutors.get(threads)
+                if executor is None:
+                    executor = _batchExecutors[threads] = ThreadPoolExecutor(
+                        max_workers=threads,
+                        thread_name_prefix='JSONRPCBatch')
+        return executor
@@ -0,0 +1,104 @@
+"""Cache for files inserted into PSP pages at run time.
+
+Files inserted with ``<psp:insert file="..."/>`` (without the static
+attribute) are read at run time. This module provides a cache for the
+content of these files, already encoded with the output encoding, so
+that the files need not be read and encoded for every request again.
+Entries are validated using the modification time of the files.
+"""
+
+from codecs import lookup as lookupCodec
+from collections import OrderedDict
+from os.path import getmtime
+from threading import Lock
+
+
+class FragmentCache:
+    """Cache for the encoded content of inserted files.
+
+    This is a thread-safe LRU cache, keyed by the path of the inserted
+    files and the output encoding. It is bounded by the total size of the
+    cached content. Files which have been modified are read again.
+    """
+
+    def __init__(self, maxSize=None, fileEncoding='utf-8'):
+        self._maxSize = maxSize
+        self._fileEncoding = fileEncoding
+        # _entries maps paths and encodings to tuples
+        # of the encoded content and the modification time
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._size = 0
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def configure(self, maxSize=None, fileEncoding='utf-8'):
+        """Set the total size limit in bytes and the encoding of the files."""
+        with self._lock:
+            if fileEncoding != self._fileEncoding:
+                self._entries.clear()
+                self._size = 0
+            self._maxSize = maxSize
+            self._fileEncoding = fileEncoding
+            self._shrink()
+
+    def get(self, filename, encoding='utf-8'):
+        """Get the content of the given file encoded with the given encoding.
+
+        The file is only read if it is not cached or has been modified.
+        """
+        mtime = getmtime(filename)
+        key = filename, encoding
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                if entry[1] == mtime:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self._size -= len(entry[0])
+            self._misses += 1
+            fileEncoding = self._fileEncoding
+        with open(filename, 'rb') as f:
+            content = f.read()
+        if lookupCodec(encoding).name != lookupCodec(fileEncoding).name:
+            content = content.decode(fileEncoding).encode(encoding)
+        size = len(content)
+        with self._lock:
+            if self._maxSize is None or size <= self._maxSize:
+                if (entry := self._entries.pop(key, None)) is not None:
+                    self._size -= len(entry[0])
+                self._entries[key] = content, mtime
+                self._size += size
+                self._shrink()
+        return content
+
+    def clear(self):
+        """Clear the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Get statistics for the cache."""
+        with self._lock:
+            return {
+                'files': len(self._entries), 'size': self._size,
+                'maxSize': self._maxSize, 'hits': self._hits,
+                'misses': self._misses, 'evictions': self._evictions}
+
+    def _shrink(self):
+        """Evict least recently used entries until the limit is kept."""
+        maxSize = self._maxSize
+        if maxSize is None:
+            return
+        entries = self._entries
+        while self._size > maxSize and entries:
+            self._size -= len(entries.popitem(last=False)[1][0])
+            self._evictions += 1
+
+
+# The cache shared by all PSP pages:
+fragmentCache = FragmentCache()
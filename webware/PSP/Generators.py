@@ -25,6 +25,8 @@ from . import BraceConverter, PSPUtils
 
 # This is global so that the ParseEventHandler and this module agree:
 ResponseObject = 'res'
+# The local name for the write method of the response object:
+ResponseWrite = '_write'
 
 
 class GenericGenerator:
@@ -50,7 +52,8 @@ class ExpressionGenerator(GenericGenerator):
 
     def generate(self, writer, phase=None):
         writer.println(
-            f'res.write(_formatter({PSPUtils.removeQuotes(self.chars)}))')
+            f'{ResponseWrite}(_formatter('
+            f'{PSPUtils.removeQuotes(self.chars)}))')
 
 
 class CharDataGenerator(GenericGenerator):
@@ -75,7 +78,7 @@ class CharDataGenerator(GenericGenerator):
 
     def generateChunk(self, writer, start=0, stop=None):
         writer.printIndent()  # gives one level of indentation
-        writer.printChars(ResponseObject + '.write("""')
+        writer.printChars(ResponseWrite + '("""')
         writer.printChars(self.chars)
         writer.printChars('""")')
         writer.printChars('\n')
@@ -272,7 +275,8 @@ class InsertGenerator(GenericGenerator):
 
     If the attribute 'static' is set to True or 1, we include the file now,
     at compile time. Otherwise, we use a function added to every PSP page
-    named ``__includeFile``, which reads the file at run time.
+    named ``__includeFile``, which gets the file at run time from
+    a cache that is shared by all PSP pages (see `FragmentCache`).
     """
 
     def __init__(self, attrs, param, ctxt):
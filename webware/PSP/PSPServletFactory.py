@@ -11,14 +11,16 @@ that you make.
 """
 
 import sys
-from os import listdir, unlink, utime
+from os import listdir, scandir, unlink, utime, walk
 from os.path import (
-    getatime, getmtime, exists, isdir, isfile, join, normcase, splitdrive)
+    getatime, getmtime, isdir, isfile, join, normcase, splitdrive, splitext)
+from py_compile import compile as compileBytecode
 from shutil import rmtree
 from string import digits, ascii_letters
 
 from ServletFactory import ServletFactory
 from . import Context, PSPCompiler
+from .FragmentCache import fragmentCache
 
 
 class PSPServletFactory(ServletFactory):
@@ -36,6 +38,12 @@ class PSPServletFactory(ServletFactory):
         setting = application.setting
         self._extensions = setting('ExtensionsForPSP', ['.psp'])
         self._fileEncoding = setting('PSPFileEncoding', None)
+        # modification times of the compiled class files by class name,
+        # determined with one scan of the cache directory when needed
+        self._compiledTimes = None
+        fragmentCache.configure(
+            setting('PSPInsertCacheSize', 1024 * 1024),
+            self._fileEncoding or 'utf-8')
         if setting('ClearPSPCacheOnStart', False):
             self.clearFileCache()
         self._recordFile = application._imp.recordFile
@@ -53,10 +61,12 @@ class PSPServletFactory(ServletFactory):
     def flushCache(self):
         """Clean out the cache of classes in memory and on disk."""
         ServletFactory.flushCache(self)
+        fragmentCache.clear()
         self.clearFileCache()
 
     def clearFileCache(self):
         """Clear class files stored on disk."""
+        self._compiledTimes = None
         cacheDir = self._cacheDir
         for filename in listdir(cacheDir):
             path = join(cacheDir, filename)
@@ -90,11 +100,42 @@ class PSPServletFactory(ServletFactory):
                 'Cannot find expected class'
                 f' named {className} in {fileName}.') from None
 
-    def loadClass(self, transaction, path):
+    def compiledTimes(self):
+        """Get the modification times of all compiled class files.
+
+        The cache directory is scanned only once, instead of checking
+        the class files one by one when they are loaded.
+        """
+        compiledTimes = self._compiledTimes
+        if compiledTimes is None:
+            compiledTimes = {}
+            with scandir(self._cacheDir) as entries:
+                for entry in entries:
+                    name, ext = splitext(entry.name)
+                    if ext == '.py' and entry.is_file():
+                        compiledTimes[name] = entry.stat().st_mtime
+            self._compiledTimes = compiledTimes
+        return compiledTimes
+
+    def compileFile(self, path, mtime=None, force=False):
+        """Compile the given PSP file if the class file is outdated.
+
+        The class file is compiled to bytecode as well. Returns the path
+        of the class file and the class name, and whether it was compiled.
+        """
         className = self.computeClassName(path)
-        classFile = join(self._cacheDir, className + ".py")
-        mtime = getmtime(path)
-        if not exists(classFile) or getmtime(classFile) != mtime:
+        classFile = join(self._cacheDir, className + '.py')
+        if mtime is None:
+            mtime = getmtime(path)
+        compiledTimes = self.compiledTimes()
+        if not force and compiledTimes.get(className) != mtime:
+            # maybe the file has been compiled in the meantime
+            try:
+                compiledTimes[className] = getmtime(classFile)
+            except OSError:
+                pass
+        compiled = force or compiledTimes.get(className) != mtime
+        if compiled:
             context = Context.PSPCLContext(path)
             context.setClassName(className)
             context.setPythonFileName(classFile)
@@ -105,7 +146,38 @@ class PSPServletFactory(ServletFactory):
             # to be the same as the source file;
             # that's how we'll know if it needs to be recompiled:
             utime(classFile, (getatime(classFile), mtime))
+            compileBytecode(classFile, doraise=True)
+            compiledTimes[className] = mtime
             # Record all included files so we can spot any changes:
             for sourcefile in sourceFiles:
                 self._recordFile(sourcefile)
+        return classFile, className, compiled
+
+    def compileAll(self, paths=None, force=False):
+        """Compile all PSP files in the given directories ahead of time.
+
+        If no directories are given, the directories of all contexts of
+        the application are used. Only outdated class files are compiled,
+        unless you set force. Returns the number of compiled files and the
+        number of files that were up to date.
+        """
+        if paths is None:
+            paths = self._app.contexts().values()
+        extensions = set(self._extensions)
+        compiled = upToDate = 0
+        for path in dict.fromkeys(paths):
+            for dirPath, dirNames, fileNames in walk(path):
+                dirNames[:] = [name for name in dirNames
+                               if not name.startswith(('.', '__'))]
+                for fileName in fileNames:
+                    if splitext(fileName)[1] in extensions:
+                        if self.compileFile(
+                                join(dirPath, fileName), force=force)[2]:
+                            compiled += 1
+                        else:
+                            upToDate += 1
+        return compiled, upToDate
+
+    def loadClass(self, transaction, path):
+        classFile, className = self.compileFile(path)[:2]
         return self.loadClassFromFile(transaction, classFile, className)
@@ -20,7 +20,8 @@ This software is based in part on work done by the Jakarta group.
 import time
 
 from .Generators import (
-    ResponseObject, CharDataGenerator, EndBlockGenerator, ExpressionGenerator,
+    ResponseObject, ResponseWrite, CharDataGenerator,
+    EndBlockGenerator, ExpressionGenerator,
     IncludeGenerator, InsertGenerator, MethodGenerator, MethodEndGenerator,
     ScriptGenerator, ScriptFileGenerator, ScriptClassGenerator)
 
@@ -279,6 +280,8 @@ class ParseEventHandler:
         for imp in self._imports:
             self._writer.println(imp)
         self._writer.println('import Page')
+        self._writer.println(
+            'from PSP.FragmentCache import fragmentCache as _fragmentCache')
         for baseClass in self._baseClasses:
             if '.' not in baseClass and baseClass not in self._importedSymbols:
                 self._writer.println('import ' + baseClass)
@@ -351,7 +354,8 @@ class ParseEventHandler:
             writer.println()
         writer.println('def __includeFile(self, filename):')
         writer.pushIndent()
-        writer.println('self.write(open(filename).read())')
+        writer.println('self.write(_fragmentCache.get(')
+        writer.println('    filename, self.application().outputEncoding()))')
         writer.popIndent()
         writer.println()
 
@@ -385,6 +389,7 @@ class ParseEventHandler:
         writer.println(
             '"""I take a file-like object. I am useful for unit testing."""')
         writer.println(f'_formatter = {self._formatter}')
+        writer.println(f'{ResponseWrite} = {ResponseObject}.write')
 
     def generateFooter(self):
         self._writer.popIndent()
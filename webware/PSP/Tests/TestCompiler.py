@@ -79,6 +79,51 @@ class TestCompiler(unittest.TestCase):
             'two plus three is: <%= 2+3 %>', 'testExpression')
         self.assertEqual("two plus three is: 5", output)
 
+    def testWriteOrder(self):
+        psp = '<p>"<%= 2+3 %>" and \\<%= (res.write("4"), "5")[1] %></p>'
+        expect = ['<p>"', '5', '" and \\', '4', '5', '</p>']
+
+        class Output(StringIO):
+
+            def __init__(self):
+                super().__init__()
+                self.writes = []
+
+            def write(self, s):
+                self.writes.append(s)
+                return super().write(s)
+
+        pspInstance = self.compileString(psp, 'testWriteOrder')()
+        outStream = Output()
+        pspInstance._writeHTML(outStream)
+        self.assertEqual(outStream.writes, expect)
+        self.assertEqual(outStream.getvalue(), ''.join(expect))
+
+    def testOutputBeforeError(self):
+        psp = 'one divided by zero is: <%= 1/0 %>'
+        pspInstance = self.compileString(psp, 'testOutputBeforeError')()
+        outStream = StringIO()
+        with self.assertRaises(ZeroDivisionError):
+            pspInstance._writeHTML(outStream)
+        self.assertEqual(outStream.getvalue(), 'one divided by zero is: ')
+
+    def testCustomFormatter(self):
+        psp = '<%@page formatter="abs" %>minus <%= -2 %> is <%= 2 %>'
+        expect = 'minus 2 is 2'
+
+        class Output(StringIO):
+            writes = 0
+
+            def write(self, s):
+                self.writes += 1
+                return super().write(str(s))
+
+        pspInstance = self.compileString(psp, 'testCustomFormatter')()
+        outStream = Output()
+        pspInstance._writeHTML(outStream)
+        self.assertEqual(outStream.getvalue(), expect)
+        self.assertEqual(outStream.writes, 4)
+
     def testScript(self):
         output = self.compileAndRun(
             'one plus two is: <% res.write(str(1+2)) %>', 'testScript')
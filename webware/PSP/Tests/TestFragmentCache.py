@@ -0,0 +1,84 @@
+"""Automated tests for the FragmentCache"""
+
+import os
+import unittest
+
+from tempfile import TemporaryDirectory
+
+from PSP.FragmentCache import FragmentCache
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def makeFile(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def testGet(self):
+        cache = FragmentCache()
+        path = self.makeFile('a.html', '<p>Käse</p>')
+        self.assertEqual(cache.get(path), '<p>Käse</p>'.encode())
+        self.assertEqual(cache.get(path), '<p>Käse</p>'.encode())
+        self.assertEqual(cache.get(path, 'latin-1'), b'<p>K\xe4se</p>')
+        self.assertEqual(len(cache), 2)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 23)
+
+    def testModifiedFile(self):
+        cache = FragmentCache()
+        path = self.makeFile('a.html', 'old')
+        self.assertEqual(cache.get(path), b'old')
+        self.makeFile('a.html', 'new content')
+        mtime = os.path.getmtime(path) + 1
+        os.utime(path, (mtime, mtime))
+        self.assertEqual(cache.get(path), b'new content')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()['size'], 11)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def testMissingFile(self):
+        cache = FragmentCache()
+        self.assertRaises(
+            OSError, cache.get, os.path.join(self.dir.name, 'missing'))
+
+    def testSizeLimit(self):
+        cache = FragmentCache(maxSize=10)
+        paths = [self.makeFile(f'{n}.html', f'part {n}') for n in range(3)]
+        for path in paths:
+            cache.get(path)
+        self.assertEqual(len(cache), 1)
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 6)
+        self.assertEqual(stats['evictions'], 2)
+        big = self.makeFile('big.html', 'x' * 11)
+        self.assertEqual(cache.get(big), b'x' * 11)
+        self.assertEqual(len(cache), 1)
+        cache.configure(0)
+        self.assertEqual(len(cache), 0)
+
+    def testFileEncoding(self):
+        cache = FragmentCache(fileEncoding='latin-1')
+        path = os.path.join(self.dir.name, 'a.html')
+        with open(path, 'wb') as f:
+            f.write(b'K\xe4se')
+        self.assertEqual(cache.get(path), 'Käse'.encode())
+        self.assertEqual(cache.get(path, 'latin-1'), b'K\xe4se')
+        cache.configure(fileEncoding='utf-8')
+        self.assertEqual(len(cache), 0)
+
+    def testClear(self):
+        cache = FragmentCache()
+        cache.get(self.makeFile('a.html', 'a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['size'], 0)
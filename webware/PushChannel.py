@@ -0,0 +1,148 @@
+"""Channel for pushing messages to clients."""
+
+from collections import deque
+from threading import Condition, Lock
+from time import time
+
+
+class _Waiter:
+    """Requests waiting for messages with the same key."""
+
+    __slots__ = ('condition', 'count', 'version')
+
+    def __init__(self, lock):
+        self.condition = Condition(lock)
+        self.count = 0  # number of waiting requests
+        self.version = 0  # incremented when messages have been pushed
+
+
+class PushChannel:
+    """A channel for pushing messages to clients.
+
+    Messages are pushed into queues identified by keys, usually session ids,
+    and pulled from there by requests of the client, e.g. with long polling
+    or as server-sent events. Requests pulling from an empty queue can wait
+    until a message is pushed, and are then woken up immediately using a
+    condition variable for their key.
+
+    The queues are bounded by PushMaxMessages, dropping the oldest messages
+    when they are full, and messages which have not been pulled within
+    PushMessageTimeout seconds are dropped as well.
+
+    This channel keeps the queues in the current process. Subclasses such
+    as PushRedisChannel keep them in a shared store, so that messages can
+    be pushed and pulled by different processes.
+    """
+
+    # region Init
+
+    def __init__(self, app):
+        self._maxMessages = app.setting('PushMaxMessages', 100)
+        self._messageTimeout = app.setting('PushMessageTimeout', 300)
+        self._lock = Lock()
+        # _waiters maps keys to the requests waiting for messages
+        self._waiters = {}
+        self._closed = False
+        # _queues maps keys to deques of tuples of push time and message
+        self._queues = {}
+        self._nextCleanTime = time() + self._messageTimeout
+
+    def close(self):
+        """Close the channel, waking up all waiting requests."""
+        with self._lock:
+            self._closed = True
+            for waiter in self._waiters.values():
+                waiter.condition.notify_all()
+
+    def isClosed(self):
+        """Check whether the channel has been closed."""
+        return self._closed
+
+    # endregion Init
+
+    # region Access
+
+    def push(self, key, message):
+        """Push a message into the queue with the given key."""
+        now = time()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque(maxlen=self._maxMessages)
+            queue.append((now, message))
+        self.notify(key)
+        if now >= self._nextCleanTime:
+            self.cleanStale()
+
+    def pull(self, key, timeout=None):
+        """Pull all messages from the queue with the given key.
+
+        If the queue is empty and a timeout is given, wait at most that
+        many seconds for messages. Returns a list of the messages, which
+        is empty if no messages were pushed or the channel was closed.
+        """
+        if not timeout:
+            return self.take(key)
+        deadline = time() + timeout
+        lock = self._lock
+        with lock:
+            waiter = self._waiters.get(key)
+            if waiter is None:
+                waiter = self._waiters[key] = _Waiter(lock)
+            waiter.count += 1
+        try:
+            while True:
+                # the version must be read before the queue is checked,
+                # so that messages pushed in between will not be missed
+                version = waiter.version
+                messages = self.take(key)
+                if messages:
+                    return messages
+                with lock:
+                    while waiter.version == version and not self._closed:
+                        remaining = deadline - time()
+                        if remaining <= 0:
+                            break
+                        waiter.condition.wait(remaining)
+                    if waiter.version == version:
+                        return []  # timed out or closed
+        finally:
+            with lock:
+                waiter.count -= 1
+                if not waiter.count:
+                    del self._waiters[key]
+
+    def take(self, key):
+        """Take all messages from the queue with the given key at once."""
+        with self._lock:
+            queue = self._queues.pop(key, None)
+        if not queue:
+            return []
+        minTime = time() - self._messageTimeout
+        return [message for pushTime, message in queue if pushTime > minTime]
+
+    def discard(self, key):
+        """Discard the queue with the given key."""
+        with self._lock:
+            self._queues.pop(key, None)
+
+    def notify(self, key):
+        """Wake up the requests waiting for messages with the given key."""
+        with self._lock:
+            waiter = self._waiters.get(key)
+            if waiter is not None:
+                waiter.version += 1
+                waiter.condition.notify_all()
+
+    def cleanStale(self):
+        """Remove queues with messages that have all timed out."""
+        now = time()
+        minTime = now - self._messageTimeout
+        with self._lock:
+            self._nextCleanTime = now + self._messageTimeout
+            queues = self._queues
+            for key in [key for key, queue in queues.items()
+                        if not queue or queue[-1][0] <= minTime]:
+                del queues[key]
+
+    # endregion Access
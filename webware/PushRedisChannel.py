@@ -0,0 +1,168 @@
+"""Channel for pushing messages to clients via Redis."""
+
+from time import time
+
+try:
+    import redis  # pylint: disable=import-error
+except Exception as e:
+    raise ImportError(
+        "For using the Redis push channel,"
+        " redis-py must be installed.") from e
+
+from PushChannel import PushChannel
+
+
+class PushRedisChannel(PushChannel):
+    """A channel for pushing messages to clients via Redis.
+
+    The queues are kept as lists in Redis, so that messages can be pushed
+    by one process and pulled by the requests of the client in another
+    process. The lists are trimmed to PushMaxMessages when messages are
+    pushed, and they expire PushMessageTimeout seconds after the last push.
+
+    Every push is also published on a Redis channel for the key of the
+    queue. Each process subscribes to these channels with one connection
+    in a background thread, which wakes up the requests of the process
+    waiting for messages with the published key. If the connection of the
+    listener gets lost, the listener is stopped and a new one is started
+    when the next request waits for messages.
+
+    The Redis connection is configured with the same settings as the Redis
+    session store, and the keys are prefixed with 'Push:' and RedisNamespace.
+    """
+
+    # region Init
+
+    def __init__(self, app):
+        PushChannel.__init__(self, app)
+        pool = redis.ConnectionPool(
+            host=app.setting('RedisHost', 'localhost'),
+            port=app.setting('RedisPort', 6379),
+            db=app.setting('RedisDb', 0),
+            password=app.setting('RedisPassword', None),
+            max_connections=app.setting('RedisMaxConnections', None),
+            socket_timeout=app.setting('RedisSocketTimeout', None),
+            socket_connect_timeout=app.setting(
+                'RedisSocketConnectTimeout', None))
+        self._redis = redis.StrictRedis(connection_pool=pool)
+        self._prefix = 'Push:' + (
+            app.setting('RedisNamespace', 'WebwareSession:') or '')
+        self._pubSub = self._listener = None
+
+    def close(self):
+        """Close the channel and the connections to the Redis server."""
+        PushChannel.close(self)
+        with self._lock:
+            listener, self._listener = self._listener, None
+            pubSub, self._pubSub = self._pubSub, None
+        try:
+            if listener is not None:
+                listener.stop()
+            if pubSub is not None:
+                pubSub.close()
+            self._redis.connection_pool.disconnect()
+        except Exception as exc:
+            print("Not able to disconnect from redis:", exc)
+
+    # endregion Init
+
+    # region Access
+
+    def push(self, key, message):
+        """Push a message into the queue with the given key."""
+        redisKey = self.redisKey(key)
+        data = f'{time():.3f} {message}'.encode()
+        pipeline = self._redis.pipeline()
+        pipeline.rpush(redisKey, data)
+        pipeline.ltrim(redisKey, -self._maxMessages, -1)
+        pipeline.expire(redisKey, self._messageTimeout)
+        pipeline.publish(redisKey, b'')
+        pipeline.execute()
+
+    def pull(self, key, timeout=None):
+        """Pull all messages from the queue with the given key.
+
+        If the queue is empty and a timeout is given, wait at most that
+        many seconds for messages that are published via Redis.
+        """
+        if timeout:
+            self.listen()
+        return PushChannel.pull(self, key, timeout)
+
+    def take(self, key):
+        """Take all messages from the queue with the given key at once."""
+        redisKey = self.redisKey(key)
+        pipeline = self._redis.pipeline()
+        pipeline.lrange(redisKey, 0, -1)
+        pipeline.delete(redisKey)
+        items = pipeline.execute()[0]
+        if not items:
+            return []
+        minTime = time() - self._messageTimeout
+        messages = []
+        for item in items:
+            pushTime, message = item.decode().split(' ', 1)
+            if float(pushTime) > minTime:
+                messages.append(message)
+        return messages
+
+    def discard(self, key):
+        """Discard the queue with the given key."""
+        self._redis.delete(self.redisKey(key))
+
+    def cleanStale(self):
+        """Remove stale queues.
+
+        Nothing needs to be done here, since the queues expire in Redis.
+        """
+
+    # endregion Access
+
+    # region Auxiliary methods
+
+    def redisKey(self, key):
+        """Create the Redis key and channel name for the given queue key."""
+        return self._prefix + key
+
+    def listen(self):
+        """Start listening to pushes in a background thread if needed.
+
+        A new listener is also started if the previous one has died.
+        """
+        listener = self._listener
+        if listener is None or not listener.is_alive():
+            with self._lock:
+                listener = self._listener
+                if (listener is None or not listener.is_alive()) and (
+                        not self._closed):
+                    if (pubSub := self._pubSub) is not None:
+                        try:
+                            pubSub.close()
+                        except Exception:
+                            pass
+                    self._pubSub = pubSub = self._redis.pubsub(
+                        ignore_subscribe_messages=True)
+                    pubSub.psubscribe(**{self._prefix + '*': self.onPublish})
+                    self._listener = pubSub.run_in_thread(
+                        sleep_time=1, daemon=True,
+                        exception_handler=self.onListenerError)
+
+    def onListenerError(self, exc, _pubSub, listener):
+        """Stop the listener if it cannot receive published messages.
+
+        The next request waiting for messages will start a new listener.
+        """
+        print("Push channel lost connection to redis:", exc)
+        with self._lock:
+            if self._listener is listener:
+                self._listener = self._pubSub = None
+        listener.stop()
+
+    def onPublish(self, message):
+        """Handle a message published on the channel for some key."""
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        self.notify(channel[len(self._prefix):])
+
+    # endregion Auxiliary methods
@@ -57,7 +57,7 @@ class RPCServlet(HTTPServlet):
         response.write(contents)
 
     @staticmethod
-    def handleException(transaction):
+    def handleException(transaction, excInfo=None):
         """Handle exception.
 
         If ReportRPCExceptionsInWebware is set to True, then flush the response
@@ -65,13 +65,16 @@ class RPCServlet(HTTPServlet):
         the response) and then handle the exception in the standard Webware
         way. This means logging it to the console, storing it in the error log,
         sending error email, etc. depending on the settings.
+
+        By default, the exception currently being handled is reported,
+        but you can also pass the info of another exception.
         """
         setting = transaction.application().setting(
             'ReportRPCExceptionsInWebware')
         if setting:
             transaction.response().flush()
             transaction.application().handleExceptionInTransaction(
-                sys.exc_info(), transaction)
+                excInfo or sys.exc_info(), transaction)
 
     def transaction(self):
         """Get the corresponding transaction.
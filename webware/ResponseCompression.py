@@ -0,0 +1,137 @@
+"""Compression of HTTP responses.
+
+This module provides the functions for negotiating the content coding of
+responses and for compressing their content with gzip or brotli. Brotli
+is only used if the brotli package is installed.
+"""
+
+import zlib
+
+from fnmatch import fnmatchcase
+from gzip import compress as gzipCompress
+
+try:
+    import brotli
+except ImportError:  # brotli not available
+    brotli = None
+
+# the content codings that can be used, in order of preference
+contentCodings = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def isCompressible(mimeType):
+    """Check whether content of the given MIME type is worth compressing."""
+    mainType, _sep, subType = mimeType.partition('/')
+    return mainType == 'text' or subType in (
+        'javascript', 'x-javascript', 'json', 'xml', 'wasm'
+    ) or subType.endswith(('+xml', '+json'))
+
+
+def compressedVariants(content):
+    """Get compressed variants of the given content.
+
+    Returns a dictionary mapping content codings to the compressed content,
+    including only variants which are actually smaller than the content.
+    """
+    variants = {}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content)
+    variants['gzip'] = gzipCompress(content, 9, mtime=0)
+    size = len(content)
+    return {coding: data for coding, data in variants.items()
+            if len(data) < size}
+
+
+def preferredEncoding(header, codings):
+    """Get the preferred content coding accepted by an Accept-Encoding header.
+
+    The given content codings are checked in order of preference and the
+    first one that is acceptable to the client is returned, or None.
+    """
+    if not header or not codings:
+        return None
+    accepted = {}
+    for coding in header.lower().split(','):
+        coding, _sep, params = coding.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _sep, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip()] = quality
+    anyQuality = accepted.get('*', 0.0)
+    for coding in codings:
+        if accepted.get(coding, anyQuality) > 0:
+            return coding
+    return None
+
+
+def matchesMimeType(mimeType, patterns):
+    """Check whether a MIME type matches one of the given patterns.
+
+    The patterns may contain wildcards, as in 'text/*' or '*+json'.
+    If no patterns are given, isCompressible() is used instead.
+    """
+    if patterns is None:
+        return isCompressible(mimeType)
+    return any(fnmatchcase(mimeType, pattern) for pattern in patterns)
+
+
+class GzipCompressor:
+    """Streaming compressor for the gzip content coding."""
+
+    coding = 'gzip'
+
+    def __init__(self, level=6):
+        # the gzip container is used if wbits is between 25 and 31
+        self._compressor = zlib.compressobj(
+            -1 if level is None else level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """Compress the data, returning the output that is ready."""
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Return all pending output, so that it can be decompressed."""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """Return all pending output and the end of the compressed stream."""
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """Streaming compressor for the br content coding."""
+
+    coding = 'br'
+
+    def __init__(self, quality=4):
+        self._compressor = brotli.Compressor(
+            mode=brotli.MODE_TEXT, quality=11 if quality is None else quality)
+
+    def compress(self, data):
+        """Compress the data, returning the output that is ready."""
+        return self._compressor.process(data)
+
+    def flush(self):
+        """Return all pending output, so that it can be decompressed."""
+        return self._compressor.flush()
+
+    def finish(self):
+        """Return all pending output and the end of the compressed stream."""
+        return self._compressor.finish()
+
+
+def compressor(coding, level=None):
+    """Create a streaming compressor for the given content coding.
+
+    The level is the compression level for gzip or the quality for brotli.
+    """
+    if coding == 'gzip':
+        return GzipCompressor(level)
+    if coding == 'br' and brotli is not None:
+        return BrotliCompressor(level)
+    raise ValueError(f'Unsupported content coding: {coding!r}')
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""Compile the PSP files of a Webware application ahead of time."""
+
+import argparse
+
+
+def compilePSP(args):
+    from .WaitressServer import loadApplication
+    application = loadApplication(args.wsgi_script, not args.prod)
+    try:
+        from URLParser import ServletFactoryManager
+        factories = [
+            factory for factory in ServletFactoryManager.factories()
+            if hasattr(factory, 'compileAll')]
+        if not factories:
+            raise RuntimeError('The PSP plug-in is not installed')
+        compiled = upToDate = 0
+        for factory in factories:
+            counts = factory.compileAll(args.paths or None, force=args.force)
+            compiled += counts[0]
+            upToDate += counts[1]
+    finally:
+        application.shutDown()
+    print(f'Compiled {compiled} PSP files, {upToDate} were up to date.')
+
+
+def addArguments(parser):
+    """Add command line arguments to the given parser."""
+    parser.add_argument(
+        'paths', nargs='*',
+        help="Directories with PSP files (default: all contexts)",
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help="Also compile PSP files which are up to date",
+        default=False,
+    )
+    parser.add_argument(
+        '--prod',
+        action='store_true',
+        help="Do not set development mode",
+        default=False,
+    )
+    parser.add_argument(
+        '--wsgi-script',
+        help='The file path of the WSGI script',
+        default='Scripts/WSGIScript.py',
+    )
+
+
+def main(args=None):
+    """Evaluate the command line arguments and call compilePSP()."""
+    parser = argparse.ArgumentParser(
+        description="Compile the PSP files of a Webware application")
+    addArguments(parser)
+    args = parser.parse_args(args)
+    compilePSP(args)
+
+
+if __name__ == '__main__':
+    main()
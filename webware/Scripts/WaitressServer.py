@@ -6,6 +6,31 @@ import argparse
 import logging
 
 
+def loadApplication(wsgiScript, development):
+    """Get the Webware application from the given WSGI script."""
+    from os import environ
+    if development:
+        environ['WEBWARE_DEVELOPMENT'] = 'true'
+    elif 'WEBWARE_DEVELOPMENT' in environ:
+        del environ['WEBWARE_DEVELOPMENT']
+    try:
+        # get application from WSGI script
+        with open(wsgiScript, encoding='utf-8') as f:
+            script = f.read()
+        # set development flag in the script
+        script = script.replace(
+            'development =', f'development = {development} #')
+        # do not change working directory in the script
+        script = script.replace('workDir =', "workDir = '' #")
+        scriptVars = {}
+        exec(script, scriptVars)
+        return scriptVars['application']
+    except Exception as e:
+        raise RuntimeError(
+            'Cannot find Webware application.\nIs the current directory'
+            ' the application working directory?') from e
+
+
 def serve(args):
     try:
         from waitress import serve
@@ -47,27 +72,7 @@ def serve(args):
                 worker_args=[args])
 
     development = not args.prod
-    from os import environ
-    if development:
-        environ['WEBWARE_DEVELOPMENT'] = 'true'
-    elif 'WEBWARE_DEVELOPMENT' in environ:
-        del environ['WEBWARE_DEVELOPMENT']
-    try:
-        # get application from WSGI script
-        with open(args.wsgi_script, encoding='utf-8') as f:
-            script = f.read()
-        # set development flag in the script
-        script = script.replace(
-            'development =', f'development = {development} #')
-        # do not change working directory in the script
-        script = script.replace('workDir =', "workDir = '' #")
-        scriptVars = {}
-        exec(script, scriptVars)
-        application = scriptVars['application']
-    except Exception as e:
-        raise RuntimeError(
-            'Cannot find Webware application.\nIs the current directory'
-            ' the application working directory?') from e
+    application = loadApplication(args.wsgi_script, development)
 
     args = vars(args)
     for arg in 'browser reload reload_interval prod wsgi_script'.split():
@@ -4,6 +4,7 @@
 
 import argparse
 
+from .CompilePSP import addArguments as addCompileArguments, compilePSP
 from .MakeAppWorkDir import addArguments as addMakeArguments, make
 from .WaitressServer import addArguments as addServeArguments, serve
 from ..Properties import version as versionTuple
@@ -25,6 +26,9 @@ def main(args=None):
     makeParser = subparsers.add_parser(
         'make', help="Make a Webware application working directory")
     addMakeArguments(makeParser)
+    compileParser = subparsers.add_parser(
+        'compile-psp', help="Compile the PSP files of a Webware application")
+    addCompileArguments(compileParser)
     args = parser.parse_args(args)
     command = args.command
     del args.command
@@ -33,6 +37,8 @@ def main(args=None):
             make(args)
         case 'serve':
             serve(args)
+        case 'compile-psp':
+            compilePSP(args)
 
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ import sys
 import threading
 
 from keyword import iskeyword
+from time import time
 
 from MiscUtils import AbstractError
 
@@ -43,13 +44,33 @@ class ServletFactory:
         self._cacheClasses = self._app.setting("CacheServletClasses", True)
         self._cacheInstances = self._app.setting("CacheServletInstances", True)
         self._reloadClasses = self._app.setting("ReloadServletClasses", True)
+        self._checkInterval = self._app.setting(
+            "ServletClassCheckInterval", 0)
+        if isinstance(self._checkInterval, str):
+            if self._checkInterval.lower() != 'reloader':
+                raise ValueError(
+                    'Invalid ServletClassCheckInterval:'
+                    f' {self._checkInterval!r}')
+            # If the application is monitored by a reloader, it will
+            # be restarted anyway when a servlet file has been changed.
+            self._checkInterval = None if self._imp.reloader() else 0
         # All caches are keyed on the path.
         # _classCache caches the servlet classes,
-        # in dictionaries with keys 'mtime' and 'class'.
-        # 'mtime' is the modification time of the enclosing module.
+        # in dictionaries with keys 'mtime', 'class' and 'checked'.
+        # 'mtime' is the modification time of the enclosing module,
+        # 'checked' is the time when 'mtime' has been checked last.
         self._classCache = {}
         # _servletPool has lists of free reusable servlets
+        # (popping from these lists is atomic, but creating the lists
+        # and adding to them must be done with the _poolLock held,
+        # so that the pool size limit cannot be exceeded)
         self._servletPool = {}
+        self._maxPoolSize = self._app.setting("MaxServletPoolSize", None)
+        self._poolPrewarm = self._app.setting("ServletPoolPrewarm", 0)
+        # _poolStats has the numbers of pool hits, misses and evictions
+        # (these are also updated with the _poolLock held)
+        self._poolStats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._poolLock = threading.Lock()
         # _threadsafeServletCache has threadsafe servlets
         # (which are not pooled, so only one is kept at a time)
         self._threadsafeServletCache = {}
@@ -224,23 +245,28 @@ class ServletFactory:
         path = request.serverSidePath()
         # Do we need to import/reimport the class
         # because the file changed on disk or isn't in cache?
-        mtime = os.path.getmtime(path)
-        if (path not in self._classCache
-                or mtime != self._classCache[path]['mtime']):
-            # Use a lock to prevent multiple simultaneous
-            # imports of the same module:
-            with self._importLock:
-                if (path not in self._classCache
-                        or mtime != self._classCache[path]['mtime']):
-                    # pylint: disable = assignment-from-no-return
-                    theClass = self.loadClass(transaction, path)
-                    if self._cacheClasses:
-                        self._classCache[path] = {
-                            'mtime': mtime, 'class': theClass}
-                else:
-                    theClass = self._classCache[path]['class']
+        record = self._classCache.get(path)
+        if record is None or self.mustCheckClass(record):
+            mtime = os.path.getmtime(path)
+            if record is None or mtime != record['mtime']:
+                # Use a lock to prevent multiple simultaneous
+                # imports of the same module:
+                with self._importLock:
+                    record = self._classCache.get(path)
+                    if record is None or mtime != record['mtime']:
+                        # pylint: disable = assignment-from-no-return
+                        theClass = self.loadClass(transaction, path)
+                        if self._cacheClasses:
+                            self._classCache[path] = {
+                                'mtime': mtime, 'class': theClass,
+                                'checked': time()}
+                    else:
+                        theClass = record['class']
+            else:
+                record['checked'] = time()
+                theClass = record['class']
         else:
-            theClass = self._classCache[path]['class']
+            theClass = record['class']
 
         # Try to find a cached servlet of the correct class.
         # (Outdated servlets may have been returned to the pool after a new
@@ -250,32 +276,19 @@ class ServletFactory:
             if servlet.__class__ is theClass:
                 return servlet
         else:
-            while True:
-                try:
-                    servlet = self._servletPool[path].pop()
-                except (KeyError, IndexError):
-                    break
-                else:
-                    if servlet.__class__ is theClass:
-                        servlet.open()
-                        return servlet
-
-        # Use a lock to prevent multiple simultaneous imports of the same
-        # module. Note that (only) the import itself is already threadsafe.
-        with self._importLock:
-            mtime = os.path.getmtime(path)
-            # pylint: disable = assignment-from-no-return
-            if path not in self._classCache:
-                self._classCache[path] = {
-                    'mtime': mtime,
-                    'class': self.loadClass(transaction, path)}
-            elif mtime > self._classCache[path]['mtime']:
-                self._classCache[path]['mtime'] = mtime
-                self._classCache[path]['class'] = self.loadClass(
-                    transaction, path)
-            theClass = self._classCache[path]['class']
-            if not self._cacheClasses:
-                del self._classCache[path]
+            pool = self._servletPool.get(path)
+            if pool is not None:
+                while True:
+                    try:
+                        servlet = pool.pop()
+                    except IndexError:
+                        break
+                    else:
+                        if servlet.__class__ is theClass:
+                            with self._poolLock:
+                                self._poolStats['hits'] += 1
+                            servlet.open()
+                            return servlet
 
         # No adequate cached servlet exists, so create a new servlet instance
         servlet = theClass()
@@ -284,10 +297,54 @@ class ServletFactory:
             if servlet.canBeThreaded():
                 self._threadsafeServletCache[path] = servlet
             else:
-                self._servletPool[path] = []
+                with self._poolLock:
+                    self._poolStats['misses'] += 1
+                    pool = self._servletPool.get(path)
+                    if pool is None:
+                        pool = self._servletPool[path] = []
+                    else:
+                        pool = None  # already created by another thread
+                if pool is not None:
+                    self.prewarmPool(pool, theClass, path)
                 servlet.open()
         return servlet
 
+    def prewarmPool(self, pool, theClass, path):
+        """Fill a new servlet pool with free servlet instances.
+
+        The number of instances is given by the ``ServletPoolPrewarm``
+        setting. These will then be used by the following requests.
+        """
+        count = self._poolPrewarm
+        maxSize = self._maxPoolSize
+        if maxSize is not None:
+            count = min(count, maxSize)
+        servlets = []
+        for _count in range(count):
+            servlet = theClass()
+            servlet.setFactory(self)
+            servlet._serverSidePath = path
+            servlets.append(servlet)
+        if servlets:
+            with self._poolLock:
+                if maxSize is not None:
+                    # servlets may have been returned in the meantime
+                    del servlets[max(maxSize - len(pool), 0):]
+                pool.extend(servlets)
+
+    def mustCheckClass(self, record):
+        """Check whether the file of a cached class must be checked.
+
+        This depends on the ``ServletClassCheckInterval`` setting:
+        If it is zero, the modification time of the servlet file is checked
+        for every request, otherwise only after the given number of seconds.
+        If it is None, servlet files are never checked again once loaded.
+        """
+        interval = self._checkInterval
+        if not interval:
+            return interval is not None
+        return time() - record['checked'] >= interval
+
     def returnServlet(self, servlet):
         """Return servlet to the pool.
 
@@ -297,7 +354,27 @@ class ServletFactory:
         if (servlet.canBeReused() and not servlet.canBeThreaded()
                 and self._cacheInstances):
             path = servlet.serverSidePath()
-            self._servletPool[path].append(servlet)
+            maxSize = self._maxPoolSize
+            with self._poolLock:
+                pool = self._servletPool[path]
+                if maxSize is not None and len(pool) >= maxSize:
+                    # the pool is full, so we let this servlet go
+                    self._poolStats['evictions'] += 1
+                else:
+                    pool.append(servlet)
+
+    def poolStats(self):
+        """Return statistics for the servlet pools.
+
+        Returns a dictionary with the number of free servlets in the pools,
+        the number of pool hits, misses and evictions, and the hit rate.
+        """
+        with self._poolLock:
+            stats = self._poolStats.copy()
+            stats['free'] = sum(map(len, self._servletPool.values()))
+        requests = stats['hits'] + stats['misses']
+        stats['hitRate'] = stats['hits'] / requests if requests else None
+        return stats
 
     def flushCache(self):
         """Flush the servlet cache and start fresh.
@@ -309,8 +386,10 @@ class ServletFactory:
             self._classCache = {}
             # We can't just delete all the lists, because returning
             # servlets expect it to exist.
-            for key in self._servletPool:
-                self._servletPool[key] = []
+            with self._poolLock:
+                for key in self._servletPool:
+                    self._servletPool[key] = []
+                self._poolStats = {'hits': 0, 'misses': 0, 'evictions': 0}
             self._threadsafeServletCache = {}
 
     # endregion Servlet Pool
@@ -0,0 +1,111 @@
+"""Codecs for encoding sessions."""
+
+import zlib
+
+from copy import copy
+from pickle import dumps, loads, HIGHEST_PROTOCOL as maxPickleProtocol
+
+try:
+    import lz4.frame as lz4  # pylint: disable=import-error
+except ImportError:
+    lz4 = None
+
+
+class SessionCodec:
+    """Codec for encoding sessions as bytes.
+
+    Sessions are pickled with the highest protocol. Pickles which are at
+    least minSize bytes long can be compressed with zlib or lz4, in which
+    case they are prefixed with a marker byte for the compression method.
+    Pickles with the highest protocol always start with a different byte,
+    so that uncompressed pickles and pickles compressed with another
+    method can always be decoded, regardless of the compression setting.
+
+    The name of the codec can be 'pickle' (no compression), 'zlib' or
+    'lz4'. For using lz4, the lz4 package must be installed.
+
+    The codec can also encode the values of a session separately from the
+    rest of the session, so that stores can avoid writing unchanged values.
+    """
+
+    names = ('pickle', 'zlib', 'lz4')
+
+    # marker bytes which are not used as pickle opcodes
+    zlibMarker = b'\xfa'
+    lz4Marker = b'\xfb'
+
+    # the attribute of sessions holding their values
+    valuesAttribute = '_values'
+
+    def __init__(self, name='pickle', minSize=1024, level=None):
+        if name not in self.names:
+            raise ValueError(f'Unknown session codec: {name!r}')
+        if name == 'lz4' and lz4 is None:
+            raise ImportError(
+                "For using the lz4 session codec,"
+                " lz4 must be installed.")
+        self._name = name
+        self._minSize = minSize or 0
+        self._level = level
+
+    def name(self):
+        """Return the name of the codec."""
+        return self._name
+
+    def dumps(self, obj):
+        """Encode the given object as bytes."""
+        data = dumps(obj, maxPickleProtocol)
+        name = self._name
+        if name == 'pickle' or len(data) < self._minSize:
+            return data
+        level = self._level
+        if name == 'zlib':
+            return self.zlibMarker + zlib.compress(
+                data, -1 if level is None else level)
+        return self.lz4Marker + lz4.compress(
+            data, compression_level=level or 0)
+
+    def loads(self, data):
+        """Decode an object from the given bytes."""
+        marker = data[:1]
+        if marker == self.zlibMarker:
+            data = zlib.decompress(data[1:])
+        elif marker == self.lz4Marker:
+            if lz4 is None:
+                raise ImportError(
+                    "For decoding lz4 compressed sessions,"
+                    " lz4 must be installed.")
+            data = lz4.decompress(data[1:])
+        return loads(data)
+
+    def dump(self, obj, f):
+        """Encode the given object and write it to the file."""
+        f.write(self.dumps(obj))
+
+    def load(self, f):
+        """Read and decode an object from the file."""
+        return self.loads(f.read())
+
+    def dumpsWithValues(self, session):
+        """Encode a session and its values separately.
+
+        Returns the encoded session without its values and the encoded
+        values. If the session has no values attribute, the encoded
+        session is returned with None as the encoded values.
+        """
+        attr = self.valuesAttribute
+        values = getattr(session, attr, None)
+        if values is None:
+            return self.dumps(session), None
+        session = copy(session)
+        setattr(session, attr, None)
+        return self.dumps(session), self.dumps(values)
+
+    def loadsWithValues(self, data, values=None):
+        """Decode a session and its separately encoded values."""
+        session = self.loads(data)
+        if values is not None:
+            values = self.loads(values)
+            if values is not None:
+                setattr(session, self.valuesAttribute, values)
+        return session
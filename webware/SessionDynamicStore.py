@@ -3,6 +3,9 @@
 import time
 import threading
 
+from heapq import heapify, heappop, heappush
+from operator import itemgetter
+
 from MiscUtils import NoDefault
 
 import SessionMemoryStore
@@ -29,6 +32,12 @@ class SessionDynamicStore(SessionStore):
     One-shot sessions (usually created by crawler bots) aren't moved to
     FileStore on periodical clean-up. They are still saved on SessionStore
     shutdown. This reduces the number of files in the Sessions directory.
+
+    The access times of the sessions in memory are kept in a heap, so the
+    sessions which need to be moved to files can be found without looking
+    at all the other sessions in memory. One-shot sessions which have been
+    checked by the periodical clean-up are put into a separate heap, so that
+    they are not checked again on every following clean-up.
     """
 
     # region Init
@@ -62,6 +71,15 @@ class SessionDynamicStore(SessionStore):
         # nor in the memory store while it was being moved from file to memory.
         self._lock = threading.RLock()
 
+        # _accessTimes maps the keys of the sessions in memory to the times
+        # when they have been accessed, and _accessHeap is a heap of tuples
+        # of these times and keys, which may also contain outdated tuples;
+        # _oneShotHeap is such a heap for the checked one-shot sessions
+        self._accessTimes = {}
+        self._accessHeap = []
+        self._oneShotHeap = []
+        self._accessLock = threading.Lock()
+
         if debug:
             print("SessionDynamicStore Initialized")
 
@@ -80,18 +98,21 @@ class SessionDynamicStore(SessionStore):
         # for efficiency. Only if that fails do we acquire the lock and look
         # in the file store.
         try:
-            return self._memoryStore[key]
+            session = self._memoryStore[key]
         except KeyError:
             with self._lock:
                 if key in self._fileStore:
                     self.moveToMemory(key)
                 # let it raise a KeyError otherwise
-                return self._memoryStore[key]
+                session = self._memoryStore[key]
+        self.touch(key)
+        return session
 
     def __setitem__(self, key, value):
         """Set a sessing item, saving it to the memory store for now."""
         value.setDirty(False)
         self._memoryStore[key] = value
+        self.touch(key, value.lastAccessTime())
 
     def __delitem__(self, key):
         """Delete a session item from the memory and the file store."""
@@ -102,6 +123,7 @@ class SessionDynamicStore(SessionStore):
                 del self._memoryStore[key]
             except KeyError:
                 pass
+            self.forget(key)
             try:
                 del self._fileStore[key]
             except KeyError:
@@ -131,6 +153,10 @@ class SessionDynamicStore(SessionStore):
         """Clear the session store in memory and remove all session files."""
         with self._lock:
             self._memoryStore.clear()
+            with self._accessLock:
+                self._accessTimes.clear()
+                self._accessHeap = []
+                self._oneShotHeap = []
             self._fileStore.clear()
 
     def setdefault(self, key, default=None):
@@ -146,18 +172,21 @@ class SessionDynamicStore(SessionStore):
         """Return value if key available, else default (also remove key)."""
         with self._lock:
             try:
-                return self._memoryStore.pop(key)
+                session = self._memoryStore.pop(key)
             except Exception:
                 if default is NoDefault:
                     return self._fileStore.pop(key)
                 return self._fileStore.pop(key, default)
+            self.forget(key)
+            return session
 
     def moveToMemory(self, key):
         """Move the value for a session from file to memory."""
         with self._lock:
             if debug:
                 print(f">> Moving {key} to Memory")
-            self._memoryStore[key] = self._fileStore.pop(key)
+            session = self._memoryStore[key] = self._fileStore.pop(key)
+            self.touch(key, session.lastAccessTime())
 
     def moveToFile(self, key):
         """Move the value for a session from memory to file."""
@@ -165,6 +194,27 @@ class SessionDynamicStore(SessionStore):
             if debug:
                 print(f">> Moving {key} to File")
             self._fileStore[key] = self._memoryStore.pop(key)
+            self.forget(key)
+
+    def moveToFiles(self, keys):
+        """Move the values for several sessions from memory to files.
+
+        Sessions which are not in memory any more are ignored.
+        """
+        memoryStore, fileStore = self._memoryStore, self._fileStore
+        with self._lock:
+            for key in keys:
+                if debug:
+                    print(f">> Moving {key} to File")
+                try:
+                    session = memoryStore.pop(key)
+                except KeyError:
+                    continue
+                fileStore[key] = session
+            with self._accessLock:
+                accessTimes = self._accessTimes
+                for key in keys:
+                    accessTimes.pop(key, None)
 
     def setEncoderDecoder(self, encoder, decoder):
         """Set the serializer and deserializer for the store."""
@@ -192,8 +242,8 @@ class SessionDynamicStore(SessionStore):
     def storeAllSessions(self):
         """Permanently save all sessions in the store."""
         with self._lock:
-            for key in self._memoryStore.keys():
-                self.moveToFile(key)
+            self.moveToFiles(self._memoryStore.keys())
+            self._fileStore.storeAllSessions()
 
     def cleanStaleSessions(self, task=None):
         """Clean stale sessions.
@@ -244,34 +294,35 @@ class SessionDynamicStore(SessionStore):
         now = time.time()
 
         moveToFileTime = now - self._moveToFileInterval
-        keys = []
-        for key in self._memoryStore.keys():
-            try:
-                if self._memoryStore[key].lastAccessTime() < moveToFileTime:
-                    if self._memoryStore[key].isNew():
-                        if debug:
-                            print("trashing one-shot session", key)
-                    else:
-                        keys.append(key)
-            except KeyError:
-                pass
-        for key in keys:
+        memoryStore = self._memoryStore
+        keys, keep, oneShots = [], [], []
+        for accessTime, key in self.popLeastRecentlyAccessed(
+                before=moveToFileTime, oneShots=False):
             try:
-                self.moveToFile(key)
+                session = memoryStore[key]
             except KeyError:
-                pass
-
-        if len(self._memoryStore) > self._maxDynamicMemorySessions:
-            keys = self.memoryKeysInAccessTimeOrder()
-            excess = len(self._memoryStore) - self._maxDynamicMemorySessions
+                continue
+            lastAccessTime = session.lastAccessTime()
+            if lastAccessTime < moveToFileTime:
+                if session.isNew():
+                    if debug:
+                        print("trashing one-shot session", key)
+                    oneShots.append((accessTime, key))
+                else:
+                    keys.append(key)
+            else:  # accessed without using the store
+                keep.append((lastAccessTime, key))
+        self.retouch(keep)
+        self.retouch(oneShots, oneShots=True)
+        self.moveToFiles(keys)
+        self.forgetRemovedOneShots()
+
+        excess = len(memoryStore) - self._maxDynamicMemorySessions
+        if excess > 0:
             if debug:
                 print(excess, "sessions beyond the limit")
-            keys = keys[:excess]
-            for key in keys:
-                try:
-                    self.moveToFile(key)
-                except KeyError:
-                    pass
+            self.moveToFiles([key for _accessTime, key in
+                              self.popLeastRecentlyAccessed(excess)])
 
         if debug:
             print("Finished interval Sweep at", time.ctime(time.time()))
@@ -280,7 +331,108 @@ class SessionDynamicStore(SessionStore):
 
     def memoryKeysInAccessTimeOrder(self):
         """Fetch memory store's keys in ascending order of last access time."""
-        return [session.identifier() for session in sorted(
-            self._memoryStore.values(), key=lambda v: v.lastAccessTime())]
+        with self._accessLock:
+            accessTimes = self._accessTimes.copy()
+        memoryStore = self._memoryStore
+        return [key for key in sorted(accessTimes, key=accessTimes.get)
+                if key in memoryStore]
 
     # endregion Application support
+
+    # region Access times
+
+    def touch(self, key, accessTime=None):
+        """Record the time when the session in memory has been accessed.
+
+        If no time is given, the current time is used.
+        """
+        if accessTime is None:
+            accessTime = time.time()
+        with self._accessLock:
+            accessTimes = self._accessTimes
+            accessTimes[key] = accessTime
+            heap, oneShotHeap = self._accessHeap, self._oneShotHeap
+            heappush(heap, (accessTime, key))
+            if len(heap) + len(oneShotHeap) > 2 * len(accessTimes) + 100:
+                # remove the outdated entries from the heaps
+                oneShotHeap = [(t, k) for t, k in oneShotHeap
+                               if accessTimes.get(k) == t]
+                heapify(oneShotHeap)
+                self._oneShotHeap = oneShotHeap
+                oneShotKeys = {k for _t, k in oneShotHeap}
+                heap = [(t, k) for k, t in accessTimes.items()
+                        if k not in oneShotKeys]
+                heapify(heap)
+                self._accessHeap = heap
+
+    def retouch(self, entries, oneShots=False):
+        """Record access times for sessions again.
+
+        The entries must be tuples of access times and keys, as returned
+        by popLeastRecentlyAccessed(). Sessions which have been accessed
+        in the meantime are not touched again. If oneShots is set, the
+        entries are put into the heap for the checked one-shot sessions.
+        """
+        with self._accessLock:
+            accessTimes = self._accessTimes
+            heap = self._oneShotHeap if oneShots else self._accessHeap
+            for accessTime, key in entries:
+                if key not in accessTimes:
+                    accessTimes[key] = accessTime
+                    heappush(heap, (accessTime, key))
+
+    def forget(self, key):
+        """Forget the access time of the session in memory."""
+        with self._accessLock:
+            self._accessTimes.pop(key, None)
+
+    def forgetRemovedOneShots(self):
+        """Forget checked one-shot sessions which are not in memory any more.
+
+        Only the start of the heap for the checked one-shot sessions is
+        cleaned up, since these are usually the sessions that have expired.
+        """
+        memoryStore = self._memoryStore
+        with self._accessLock:
+            accessTimes, heap = self._accessTimes, self._oneShotHeap
+            while heap:
+                accessTime, key = heap[0]
+                if accessTimes.get(key) == accessTime:
+                    if key in memoryStore:
+                        break
+                    del accessTimes[key]
+                heappop(heap)
+
+    def popLeastRecentlyAccessed(self, count=None, before=None, oneShots=True):
+        """Remove and return the least recently accessed sessions.
+
+        Returns a list of at most count tuples of access times and keys,
+        in the order of the access times, which must be older than the
+        given time. The access times of these sessions are forgotten.
+        One-shot sessions which have already been checked by the interval
+        sweep are only included if oneShots is set.
+        """
+        entries = []
+        memoryStore = self._memoryStore
+        with self._accessLock:
+            accessTimes = self._accessTimes
+            heaps = [self._accessHeap]
+            if oneShots:
+                heaps.append(self._oneShotHeap)
+            while count is None or len(entries) < count:
+                heap = min(filter(None, heaps), key=itemgetter(0),
+                           default=None)
+                if heap is None:
+                    break
+                accessTime, key = heap[0]
+                if before is not None and accessTime >= before:
+                    break
+                heappop(heap)
+                if accessTimes.get(key) != accessTime:
+                    continue  # outdated entry
+                del accessTimes[key]
+                if key in memoryStore:
+                    entries.append((accessTime, key))
+        return entries
+
+    # endregion Access times
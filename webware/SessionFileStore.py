@@ -3,6 +3,10 @@
 import os
 import threading
 
+from pickle import load, dump, HIGHEST_PROTOCOL
+from tempfile import NamedTemporaryFile
+from time import time
+
 from MiscUtils import NoDefault
 
 from SessionStore import SessionStore
@@ -13,9 +17,19 @@ class SessionFileStore(SessionStore):
 
     Stores the sessions on disk in the Sessions/ directory,
     one file per session.
+
+    The store also keeps the expiration time of every session together
+    with the modification time of its file in an index which is saved in
+    the same directory. Stale sessions can then be found without loading
+    all sessions. Only sessions without valid index entries are loaded,
+    and stale sessions are only loaded if their expiring() method must be
+    called. The index entries are validated with the modification time
+    of the session files, so sessions written by other processes are
+    not removed by mistake.
     """
 
     _extension = '.ses'
+    _indexFilename = 'Session.index'
 
     # region Init
 
@@ -30,7 +44,13 @@ class SessionFileStore(SessionStore):
             restoreFiles = self._retain
         self._sessionDir = app._sessionDir
         self._lock = threading.RLock()
-        if not restoreFiles:
+        self._loadBeforeDelete = self.needsExpiring()
+        # _expires maps session keys to tuples of the expiration time
+        # of the session and the modification time of the session file
+        self._expires = {}
+        if restoreFiles:
+            self.loadIndex()
+        else:
             self.clear()
 
     # endregion Init
@@ -84,7 +104,11 @@ class SessionFileStore(SessionStore):
                     except Exception:
                         # remove the session file because it is corrupt
                         os.remove(filename)
+                        self._expires.pop(key, None)
                         raise  # raise original exception
+                    self._expires[key] = (
+                        self.expirationTime(value),
+                        os.stat(filename).st_mtime_ns)
                 except Exception:  # error pickling the session
                     if dirty:
                         value.setDirty()
@@ -96,13 +120,11 @@ class SessionFileStore(SessionStore):
         filename = self.filenameForKey(key)
         if not os.path.exists(filename):
             raise KeyError(key)
-        session = self[key]
-        if not session.isExpired():
-            session.expiring()
-        try:
-            os.remove(filename)
-        except Exception:
-            pass
+        if self._loadBeforeDelete:
+            session = self[key]
+            if not session.isExpired():
+                session.expiring()
+        self.removeKey(key)
 
     def __contains__(self, key):
         """Check whether the session store has a file for the given key."""
@@ -120,6 +142,7 @@ class SessionFileStore(SessionStore):
     def removeKey(self, key):
         """Remove the session file for the given key."""
         filename = self.filenameForKey(key)
+        self._expires.pop(key, None)
         try:
             os.remove(filename)
         except Exception:
@@ -133,6 +156,11 @@ class SessionFileStore(SessionStore):
         """Clear the session file store, removing all of the session files."""
         for key in self:
             self.removeKey(key)
+        self._expires.clear()
+        try:
+            os.remove(self.indexFilename())
+        except OSError:
+            pass
 
     def setdefault(self, key, default=None):
         """Return value if key available, else default (also setting it)."""
@@ -166,9 +194,110 @@ class SessionFileStore(SessionStore):
     def storeAllSessions(self):
         """Permanently save all sessions in the store."""
         # sessions have all been saved to files already
+        self.saveIndex()
+
+    def cleanStaleSessions(self, _task=None):
+        """Clean stale sessions.
+
+        The stale sessions are found using the index. Only the sessions
+        without valid index entries need to be loaded for this purpose.
+        """
+        curTime = time()
+        expires = self._expires
+        ext = self._extension
+        pos = -len(ext)
+        found = set()
+        with os.scandir(self._sessionDir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(ext):
+                    continue
+                key = entry.name[:pos]
+                found.add(key)
+                try:
+                    mtime = entry.stat().st_mtime_ns
+                except OSError:
+                    continue  # session was already deleted
+                meta = expires.get(key)
+                if meta is None or meta[1] != mtime:
+                    # the session is unknown or has been changed
+                    try:
+                        session = self[key]
+                    except KeyError:
+                        continue
+                    newMeta = self.expirationTime(session), mtime
+                    with self._lock:
+                        if expires.get(key) is not meta:
+                            continue  # the session has been stored again
+                        meta = expires[key] = newMeta
+                if meta[0] is not None and curTime >= meta[0]:
+                    self.removeStaleSession(key, meta)
+        with self._lock:
+            for key in list(expires):
+                if key not in found:
+                    del expires[key]
+        self.saveIndex()
+
+    def removeStaleSession(self, key, meta):
+        """Remove the stale session with the given key and index entry.
+
+        The session is not removed if it has been stored in the meantime.
+        """
+        with self._lock:
+            if self._expires.get(key) is not meta:
+                return
+            try:
+                if self._loadBeforeDelete:
+                    del self[key]
+                else:
+                    self.removeKey(key)
+            except KeyError:
+                pass  # already deleted by some other thread
 
     # endregion Application support
 
+    # region Index
+
+    def indexFilename(self):
+        """Return the name of the file holding the index."""
+        return os.path.join(self._sessionDir, self._indexFilename)
+
+    def loadIndex(self):
+        """Load the index with the expiration times of the sessions.
+
+        Entries for sessions which have been removed are ignored, and
+        entries for sessions which have been changed are validated when
+        stale sessions are cleaned.
+        """
+        try:
+            with open(self.indexFilename(), 'rb') as f:
+                expires = load(f)
+            if not isinstance(expires, dict):
+                raise TypeError('The index is not a dictionary')
+        except Exception:
+            expires = {}
+        with self._lock:
+            for key, meta in expires.items():
+                self._expires.setdefault(key, meta)
+
+    def saveIndex(self):
+        """Save the index with the expiration times of the sessions.
+
+        The file is written atomically, replacing the old index.
+        """
+        with self._lock:
+            expires = self._expires.copy()
+        try:
+            with NamedTemporaryFile(
+                    'wb', dir=self._sessionDir, prefix='.Session.',
+                    suffix='.tmp', delete=False) as f:
+                dump(expires, f, HIGHEST_PROTOCOL)
+            os.replace(f.name, self.indexFilename())
+        except Exception:
+            print("Error saving the index of the session files")
+            self.application().handleException()
+
+    # endregion Index
+
     # region Self utility
 
     def filenameForKey(self, key):
@@ -1,5 +1,6 @@
 """Session store using the Memcached memory object caching system."""
 
+from uuid import uuid4
 from warnings import warn
 from pickle import HIGHEST_PROTOCOL as maxPickleProtocol
 
@@ -12,6 +13,7 @@ except Exception as e:
 
 from MiscUtils import NoDefault
 
+from SessionNearCache import SessionNearCache
 from SessionStore import SessionStore
 
 debug = False
@@ -28,6 +30,20 @@ class SessionMemcachedStore(SessionStore):
     The keys are prefixed with a configurable namespace, allowing you to
     store other data in the same Memcached system.
 
+    The sessions are encoded with the encoder of the store, so that they
+    can be compressed using the SessionCodec setting. Sessions which have
+    been pickled by the Memcached client itself can still be read.
+
+    If the setting SessionNearCacheSize is set, recently used sessions are
+    also kept in an in-process cache of that size. A version stamp is then
+    written under a separate key after each session, and a cached session
+    is used only if the stamp in Memcached is unchanged. Since Memcached
+    cannot write both keys atomically, concurrent writes of the same session
+    from different processes can leave one of them with an outdated session
+    until the session is written again, so the near cache should only be
+    used when a load balancer sends the requests of each user to the same
+    process. All processes sharing the sessions must use the same setting.
+
     Cleaning/timing out of sessions is performed by Memcached itself since
     no single application can know about the existence of all sessions or
     the last access for a given session. Besides it is built in Memcached
@@ -73,6 +89,11 @@ class SessionMemcachedStore(SessionStore):
         # you can trigger an error or a warning
         self._onIteration = app.setting('MemcachedOnIteration', 'Warning')
 
+        # keep recently used sessions in an in-process cache
+        nearCacheSize = app.setting('SessionNearCacheSize', 0)
+        self._nearCache = SessionNearCache(
+            nearCacheSize) if nearCacheSize else None
+
         self._client = memcache.Client(
             self._servers, debug=debug, pickleProtocol=maxPickleProtocol)
 
@@ -93,14 +114,30 @@ class SessionMemcachedStore(SessionStore):
         """Get a session item, reading it from the store."""
         if debug:
             print(f">> getitem({key})")
+        nearCache = self._nearCache
+        if nearCache is not None:
+            # the stamp must be fetched before the session, so that the
+            # cached session can never be newer than its stamp
+            try:
+                stamp = self._client.get(self.mcVersionKey(key))
+            except Exception:
+                stamp = None
+            if stamp is None:
+                nearCache.discard(key)
+            elif (value := nearCache.get(key, stamp)) is not None:
+                return value
         # returns None if key non-existent or no server to contact
         try:
             value = self._client.get(self.mcKey(key))
+            if isinstance(value, bytes):
+                value = self.decode(value)
         except Exception:
             value = None
         if value is None:
             # SessionStore expects KeyError when no result
             raise KeyError(key)
+        if nearCache is not None and stamp is not None:
+            nearCache.put(key, stamp, value)
         return value
 
     def __setitem__(self, key, value):
@@ -111,13 +148,28 @@ class SessionMemcachedStore(SessionStore):
         if self._alwaysSave or dirty:
             if dirty:
                 value.setDirty(False)
+            nearCache = self._nearCache
             try:
+                if nearCache is not None:
+                    # invalidate cached copies in other processes first
+                    self._client.delete(self.mcVersionKey(key))
                 if not self._client.set(
-                        self.mcKey(key), value, time=self._sessionTimeout):
+                        self.mcKey(key), self.encode(value),
+                        time=self._sessionTimeout):
                     raise ValueError("Setting value in the memcache failed.")
+                if nearCache is not None:
+                    stamp = uuid4().hex
+                    if self._client.set(
+                            self.mcVersionKey(key), stamp,
+                            time=self._sessionTimeout):
+                        nearCache.put(key, stamp, value)
+                    else:
+                        nearCache.discard(key)
             except Exception as exc:
                 if dirty:
                     value.setDirty()
+                if nearCache is not None:
+                    nearCache.discard(key)
                 # Not able to store the session is a failure
                 print(f"Error saving session {key!r} to memcache: {exc}")
                 self.application().handleException()
@@ -130,10 +182,17 @@ class SessionMemcachedStore(SessionStore):
         """
         if debug:
             print(f">> delitem({key})")
+        nearCache = self._nearCache
+        if nearCache is not None:
+            # expire a fresh copy, as without the near cache
+            nearCache.discard(key)
         session = self[key]
         if not session.isExpired():
             session.expiring()
         try:
+            if nearCache is not None:
+                nearCache.discard(key)
+                self._client.delete(self.mcVersionKey(key))
             if not self._client.delete(self.mcKey(key)):
                 raise ValueError("Deleting value from the memcache failed.")
         except Exception as exc:
@@ -184,6 +243,8 @@ class SessionMemcachedStore(SessionStore):
         """
         if debug:
             print(">> clear()")
+        if self._nearCache is not None:
+            self._nearCache.clear()
         if self._onIteration:
             err = 'Memcached does not support clearing the store.'
             if self._onIteration == 'Error':
@@ -251,4 +312,15 @@ class SessionMemcachedStore(SessionStore):
         """Create the real key with namespace to be used with Memcached."""
         return self._namespace + key
 
+    def mcVersionKey(self, key):
+        """Create the key for the version stamp of the session in Memcached.
+
+        The version stamps are only written if the near cache is used.
+        """
+        return 'Version:' + self._namespace + key
+
+    def nearCache(self):
+        """Get the in-process cache for sessions or None if not used."""
+        return self._nearCache
+
     # endregion Auxiliary methods
@@ -0,0 +1,73 @@
+"""In-process cache for sessions kept in a remote session store."""
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class SessionNearCache:
+    """Cache for sessions which have been read from or written to a store.
+
+    Session stores which keep the sessions on a remote server, such as
+    Redis or Memcached, can use this cache to avoid fetching and decoding
+    sessions which have been written or read by the same process before.
+
+    The sessions are cached together with a version stamp. The store writes
+    a new stamp with every session and looks up the current stamp before
+    using a cached session, which is only used if the stamp is unchanged.
+    This is a thread-safe LRU cache bounded by the number of sessions.
+    """
+
+    def __init__(self, maxSize=1000):
+        self._maxSize = maxSize
+        # _entries maps session keys to tuples of the stamp and the session
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stamp):
+        """Get the session with the given key if it has the given stamp.
+
+        Returns None if the session is not cached or has another stamp.
+        In the latter case, the session is also removed from the cache.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                if entry[0] == stamp:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self._misses += 1
+        return None
+
+    def put(self, key, stamp, session):
+        """Put the session with the given key and stamp into the cache."""
+        with self._lock:
+            entries = self._entries
+            entries[key] = stamp, session
+            entries.move_to_end(key)
+            maxSize = self._maxSize
+            while len(entries) > maxSize:
+                entries.popitem(last=False)
+                self._evictions += 1
+
+    def discard(self, key):
+        """Remove the session with the given key from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Clear the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get statistics for the cache."""
+        with self._lock:
+            return {
+                'sessions': len(self._entries), 'maxSize': self._maxSize,
+                'hits': self._hits, 'misses': self._misses,
+                'evictions': self._evictions}
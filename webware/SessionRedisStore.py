@@ -1,6 +1,9 @@
 """Session store using the Redis in-memory data store."""
 
-from pickle import loads, dumps
+from hashlib import blake2b
+from time import sleep, time
+from uuid import uuid4
+from weakref import WeakKeyDictionary
 
 try:
     import redis  # pylint: disable=import-error
@@ -11,6 +14,7 @@ except Exception as e:
 
 from MiscUtils import NoDefault
 
+from SessionNearCache import SessionNearCache
 from SessionStore import SessionStore
 
 debug = False
@@ -22,10 +26,32 @@ class SessionRedisStore(SessionStore):
     Stores the sessions in a single Redis store using 'last write wins'
     semantics. This increases fault tolerance and allows server clustering.
     In clustering configurations with concurrent writes for the same
-    session(s) the last writer will always overwrite the session.
+    session(s) the last writer will always overwrite the session, unless
+    SessionLocking is enabled. In this case, sessions are checked out
+    using a lock in Redis that expires after SessionLockExpiration seconds.
 
     The keys are prefixed with a configurable namespace, allowing you to
-    store other data in the same Redis system.
+    store other data in the same Redis system. The keys are listed using
+    SCAN instead of KEYS, so that the Redis server is never blocked, and
+    operations on multiple keys are sent in pipelines.
+
+    If the setting RedisDeltaValues is enabled, the values of the sessions
+    are stored under separate keys, which contain a digest of the values,
+    and the sessions refer to these keys. Unchanged values are then not
+    written again when the sessions are stored; only their expiration time
+    is renewed. This saves a lot of bandwidth when the sessions hold large
+    values such as shopping carts. In this mode, the sessions are always
+    encoded with the session codec, ignoring setEncoderDecoder().
+
+    If the setting SessionNearCacheSize is set, recently used sessions are
+    also kept in an in-process cache of that size. A version stamp is then
+    written under a separate key in the same transaction as the session,
+    and a cached session is used only if the stamp in Redis is unchanged.
+    This replaces fetching and decoding the session with fetching a short
+    stamp, which helps when a load balancer sends the requests of each
+    user to the same process. Note that a cached session is shared by the
+    requests of the process, as with the memory session store, and that
+    all processes sharing the sessions must use the same setting.
 
     Cleaning/timing out of sessions is performed by Redis itself since
     no single application can know about the existence of all sessions or
@@ -51,15 +77,52 @@ class SessionRedisStore(SessionStore):
         self._db = app.setting('RedisDb', 0)
         self._password = app.setting('RedisPassword', None)
 
+        # connection pool settings
+        self._maxConnections = app.setting('RedisMaxConnections', None)
+        self._socketTimeout = app.setting('RedisSocketTimeout', None)
+        self._socketConnectTimeout = app.setting(
+            'RedisSocketConnectTimeout', None)
+
+        # number of keys fetched per SCAN call and per pipeline
+        self._scanCount = app.setting('RedisScanCount', 1000)
+
         # timeout in seconds
         self._sessionTimeout = app.setting('SessionTimeout', 180) * 60
 
         # the redis "namespace" used by our store
         self._namespace = app.setting(
             'RedisNamespace', 'WebwareSession:') or ''
-
-        self._redis = redis.StrictRedis(
-            self._host, self._port, self._db, self._password)
+        # prefixes of other keys which are matched by the namespace pattern
+        self._reservedPrefixes = tuple(
+            prefix for prefix in self.reservedPrefixes
+            if (prefix + self._namespace).startswith(self._namespace))
+
+        # expiration time of session locks in seconds
+        self._lockExpiration = app.setting('SessionLockExpiration', 60)
+
+        # Sessions need to be loaded before deleting them only if they
+        # have an expiring() hook that does more than the default one.
+        loadBeforeDelete = app.setting('RedisLoadBeforeDelete', None)
+        if loadBeforeDelete is None:
+            loadBeforeDelete = self.needsExpiring()
+        self._loadBeforeDelete = loadBeforeDelete
+
+        # store the session values separately, writing them only if changed
+        self._deltaValues = app.setting('RedisDeltaValues', False)
+        # _valuesDigests maps sessions to the digests of their stored values
+        self._valuesDigests = WeakKeyDictionary()
+
+        # keep recently used sessions in an in-process cache
+        nearCacheSize = app.setting('SessionNearCacheSize', 0)
+        self._nearCache = SessionNearCache(
+            nearCacheSize) if nearCacheSize else None
+
+        pool = redis.ConnectionPool(
+            host=self._host, port=self._port, db=self._db,
+            password=self._password, max_connections=self._maxConnections,
+            socket_timeout=self._socketTimeout,
+            socket_connect_timeout=self._socketConnectTimeout)
+        self._redis = redis.StrictRedis(connection_pool=pool)
 
     # endregion Init
 
@@ -75,14 +138,33 @@ class SessionRedisStore(SessionStore):
         """Get a session item, reading it from the store."""
         if debug:
             print(f">> getitem({key})")
+        nearCache = self._nearCache
+        if nearCache is not None:
+            # the stamp must be fetched before the session, so that the
+            # cached session can never be newer than its stamp
+            try:
+                stamp = self._redis.get(self.redisVersionKey(key))
+            except Exception:
+                stamp = None
+            if stamp is None:
+                nearCache.discard(key)
+            elif (value := nearCache.get(key, stamp)) is not None:
+                return value
         # returns None if key non-existent or no server to contact
         try:
-            value = loads(self._redis.get(self.redisKey(key)))
+            if self._deltaValues:
+                value = self.decodeWithValues(self._redis.eval(
+                    self._getWithValuesScript, 1, self.redisKey(key),
+                    self.redisValuesKey(key)))
+            else:
+                value = self.decode(self._redis.get(self.redisKey(key)))
         except Exception:
             value = None
         if value is None:
             # SessionStore expects KeyError when no result
             raise KeyError(key)
+        if nearCache is not None and stamp is not None:
+            nearCache.put(key, stamp, value)
         return value
 
     def __setitem__(self, key, value):
@@ -93,15 +175,33 @@ class SessionRedisStore(SessionStore):
         if self._alwaysSave or dirty:
             if dirty:
                 value.setDirty(False)
+            nearCache = self._nearCache
+            stamp = None if nearCache is None else uuid4().hex.encode()
             try:
-                self._redis.setex(
-                    self.redisKey(key), self._sessionTimeout, dumps(value, -1))
+                if self._deltaValues:
+                    self.setWithValues(key, value, stamp)
+                elif stamp:
+                    timeout = self._sessionTimeout
+                    pipeline = self._redis.pipeline()
+                    pipeline.setex(
+                        self.redisKey(key), timeout, self.encode(value))
+                    pipeline.setex(self.redisVersionKey(key), timeout, stamp)
+                    pipeline.execute()
+                else:
+                    self._redis.setex(
+                        self.redisKey(key), self._sessionTimeout,
+                        self.encode(value))
             except Exception as exc:
                 if dirty:
                     value.setDirty()
+                if nearCache is not None:
+                    nearCache.discard(key)
                 # Not able to store the session is a failure
                 print(f"Error saving session {key!r} to redis: {exc}")
                 self.application().handleException()
+            else:
+                if nearCache is not None:
+                    nearCache.put(key, stamp, value)
 
     def __delitem__(self, key):
         """Delete a session item from the store.
@@ -111,15 +211,31 @@ class SessionRedisStore(SessionStore):
         """
         if debug:
             print(f">> delitem({key})")
-        session = self[key]
-        if not session.isExpired():
-            session.expiring()
+        nearCache = self._nearCache
+        if self._loadBeforeDelete:
+            if nearCache is not None:
+                # expire a fresh copy, as without the near cache
+                nearCache.discard(key)
+            session = self[key]
+            if not session.isExpired():
+                session.expiring()
         try:
-            self._redis.delete(self.redisKey(key))
+            if nearCache is not None:
+                nearCache.discard(key)
+                self._redis.delete(self.redisVersionKey(key))
+            if self._deltaValues:
+                deleted = self._redis.eval(
+                    self._deleteWithValuesScript, 1, self.redisKey(key),
+                    self.redisValuesKey(key))
+            else:
+                deleted = self._redis.delete(self.redisKey(key))
         except Exception as exc:
             # Not able to delete the session is a failure
             print(f"Error deleting session {key!r} from redis: {exc}")
             self.application().handleException()
+        else:
+            if not deleted and not self._loadBeforeDelete:
+                raise KeyError(key)
 
     def __contains__(self, key):
         """Check whether the session store has a given key."""
@@ -143,10 +259,9 @@ class SessionRedisStore(SessionStore):
         if debug:
             print(">> keys()")
         try:
-            if self._namespace:
-                n = len(self._namespace)
-                return [k[n:] for k in self._redis.keys(self.redisKey('*'))]
-            return self._redis.keys(self.redisKey('*'))
+            n = len(self._namespace)
+            return [(k.decode() if isinstance(k, bytes) else k)[n:]
+                    for k in self.scanKeys()]
         except Exception as exc:
             # Not able to get the keys is a failure
             print("Error checking sessions from redis:", exc)
@@ -156,9 +271,24 @@ class SessionRedisStore(SessionStore):
         """Clear the session store, removing all of its items."""
         if debug:
             print(">> clear()")
+        if self._nearCache is not None:
+            self._nearCache.clear()
         try:
             if self._namespace:
-                self._redis.delete(*self._redis.keys(self.redisKey('*')))
+                pipeline = self._redis.pipeline(transaction=False)
+                for batch in self.batches(self.scanKeys()):
+                    pipeline.delete(*batch)
+                prefixes = []
+                if self._deltaValues:
+                    prefixes.append('Values:')
+                if self._nearCache is not None:
+                    prefixes.append('Version:')
+                for prefix in prefixes:
+                    for batch in self.batches(self._redis.scan_iter(
+                            match=f'{prefix}{self._namespace}*',
+                            count=self._scanCount)):
+                        pipeline.delete(*batch)
+                pipeline.execute()
             else:
                 self._redis.flushdb()
         except Exception as exc:
@@ -193,6 +323,50 @@ class SessionRedisStore(SessionStore):
 
     # endregion Access
 
+    # region Convenience methods
+
+    def iteritems(self):
+        """Return an iterator over the (key, value) pairs for all sessions.
+
+        The sessions are fetched from Redis in batches.
+        """
+        if debug:
+            print(">> iteritems()")
+        redisKey = self.redisKey
+        deltaValues = self._deltaValues
+        decode = self.decodeWithValues if deltaValues else self.decode
+        for keys in self.batches(self.keys()):
+            try:
+                if deltaValues:
+                    pipeline = self._redis.pipeline(transaction=False)
+                    for key in keys:
+                        pipeline.eval(
+                            self._getWithValuesScript, 1, redisKey(key),
+                            self.redisValuesKey(key))
+                    values = pipeline.execute()
+                else:
+                    values = self._redis.mget([redisKey(key) for key in keys])
+            except Exception as exc:
+                print("Error getting sessions from redis:", exc)
+                self.application().handleException()
+                return
+            for key, value in zip(keys, values):
+                if value is not None:
+                    # the session may have been deleted in the meantime
+                    try:
+                        value = decode(value)
+                    except Exception:
+                        continue
+                    if value is not None:
+                        yield key, value
+
+    def itervalues(self):
+        """Return an iterator over the stored values of all sessions."""
+        for _key, value in self.iteritems():
+            yield value
+
+    # endregion Convenience methods
+
     # region Application support
 
     def storeSession(self, session):
@@ -224,10 +398,186 @@ class SessionRedisStore(SessionStore):
 
     # endregion Application support
 
+    # region Session locking
+
+    # delete the lock only if it is still owned by the given token
+    _unlockScript = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then"
+        " return redis.call('del', KEYS[1]) else return 0 end")
+
+    def checkOut(self, key):
+        """Check out the session with the given key.
+
+        This sets a lock in Redis, so that the session is also protected
+        against concurrent transactions in other processes. The lock expires
+        after SessionLockExpiration seconds in case it is never released.
+        """
+        if debug:
+            print(f">> checkOut({key})")
+        lockKey = self.redisLockKey(key)
+        token = uuid4().hex
+        expiration = self._lockExpiration
+        expiration = int(expiration * 1000) if expiration else None
+        timeout = self._lockTimeout
+        deadline = None if timeout is None else time() + timeout
+        delay = 0.005
+        while True:
+            try:
+                if self._redis.set(lockKey, token, nx=True, px=expiration):
+                    return token
+            except Exception as exc:
+                print(f"Error locking session {key!r} in redis: {exc}")
+                return None
+            if deadline is not None:
+                if (remaining := deadline - time()) <= 0:
+                    return None
+                delay = min(delay, remaining)
+            sleep(delay)
+            delay = min(2 * delay, 0.1)
+
+    def checkIn(self, key, token):
+        """Check in the session that has been checked out with the token."""
+        if debug:
+            print(f">> checkIn({key})")
+        try:
+            self._redis.eval(
+                self._unlockScript, 1, self.redisLockKey(key), token)
+        except Exception as exc:
+            print(f"Error unlocking session {key!r} in redis: {exc}")
+
+    # endregion Session locking
+
     # region Auxiliary methods
 
     def redisKey(self, key):
         """Create the real key with namespace to be used with Redis."""
         return self._namespace + key
 
+    # prefixes of the keys for locks, separate values, version stamps
+    # and the push channel, which are put in front of the namespace
+    reservedPrefixes = ('Lock:', 'Values:', 'Version:', 'Push:')
+
+    def scanKeys(self):
+        """Iterate over the real keys of all sessions using SCAN.
+
+        If the namespace is empty, the keys with reserved prefixes
+        are matched as well, so they are skipped here.
+        """
+        keys = self._redis.scan_iter(
+            match=self.redisKey('*'), count=self._scanCount)
+        if not (prefixes := self._reservedPrefixes):
+            return keys
+        bytePrefixes = tuple(prefix.encode() for prefix in prefixes)
+        return (key for key in keys if not key.startswith(
+            bytePrefixes if isinstance(key, bytes) else prefixes))
+
+    def batches(self, keys):
+        """Split the given keys into batches for multi-key operations."""
+        batch, size = [], self._scanCount or 1000
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def redisValuesKey(self, key, digest=''):
+        """Create the key for the values of the session to be used with Redis.
+
+        The key ends with the digest of the values, which is stored at the
+        beginning of the session. Like the lock keys, these keys are put in
+        front of the namespace and skipped by scanKeys(), so they are not
+        taken for sessions.
+        """
+        return f'Values:{self._namespace}{key}:{digest}'
+
+    def redisLockKey(self, key):
+        """Create the key of the lock for the session to be used with Redis.
+
+        The lock keys are put in front of the namespace and skipped by
+        scanKeys(), so that they are not taken for sessions when the keys
+        in the namespace are listed, even if the namespace is empty.
+        """
+        return 'Lock:' + self._namespace + key
+
+    def redisVersionKey(self, key):
+        """Create the key for the version stamp of the session in Redis.
+
+        The version stamps are only written if the near cache is used.
+        """
+        return 'Version:' + self._namespace + key
+
+    def nearCache(self):
+        """Get the in-process cache for sessions or None if not used."""
+        return self._nearCache
+
     # endregion Auxiliary methods
+
+    # region Separate values
+
+    # length of the hex digest of session values
+    _digestSize = 32
+
+    # get a session together with its values, which are stored under
+    # the values key prefix passed as argument plus the digest
+    # stored at the beginning of the session
+    _getWithValuesScript = (
+        "local s = redis.call('get', KEYS[1])"
+        " if not s then return nil end"
+        " return {s, redis.call('get', ARGV[1] .. string.sub(s, 1, 32))}")
+
+    # delete a session together with its values
+    _deleteWithValuesScript = (
+        "local s = redis.call('get', KEYS[1])"
+        " if not s then return 0 end"
+        " redis.call('del', ARGV[1] .. string.sub(s, 1, 32))"
+        " return redis.call('del', KEYS[1])")
+
+    def decodeWithValues(self, result):
+        """Decode a session fetched together with its values.
+
+        Returns None if the session or its values could not be found.
+        The digest of the values is remembered for the decoded session.
+        """
+        if not result or len(result) < 2 or result[1] is None:
+            return None
+        data, values = result[:2]
+        size = self._digestSize
+        digest = data[:size]
+        if isinstance(digest, bytes):
+            digest = digest.decode('ascii')
+        session = self._codec.loadsWithValues(data[size:], values)
+        self._valuesDigests[session] = digest
+        return session
+
+    def setWithValues(self, key, session, stamp=None):
+        """Write the session, writing its values only if they have changed.
+
+        If the values are unchanged, only their expiration time is renewed.
+        If a version stamp is passed, it is written in the same transaction.
+        """
+        data, values = self._codec.dumpsWithValues(session)
+        if values is None:
+            values = self._codec.dumps(None)
+        digest = blake2b(values, digest_size=self._digestSize // 2).hexdigest()
+        oldDigest = self._valuesDigests.get(session)
+        timeout = self._sessionTimeout
+        valuesKey = self.redisValuesKey(key, digest)
+        pipeline = self._redis.pipeline()
+        pipeline.setex(self.redisKey(key), timeout, digest.encode() + data)
+        if digest == oldDigest:
+            pipeline.expire(valuesKey, timeout)
+        else:
+            pipeline.setex(valuesKey, timeout, values)
+            if oldDigest:
+                pipeline.delete(self.redisValuesKey(key, oldDigest))
+        if stamp:
+            pipeline.setex(self.redisVersionKey(key), timeout, stamp)
+        results = pipeline.execute()
+        if digest == oldDigest and not results[1]:
+            # the values have been removed in the meantime
+            self._redis.setex(valuesKey, timeout, values)
+        self._valuesDigests[session] = digest
+
+    # endregion Separate values
@@ -13,6 +13,11 @@ class SessionShelveStore(SessionStore):
     """A session store implemented with a shelve object.
 
     To use this store, set SessionStore in Application.config to 'Shelve'.
+
+    The sessions are encoded with the encoder of the store before they
+    are put on the shelf, so that they can be compressed using the
+    SessionCodec setting. Sessions which have been put on the shelf
+    without encoding them first can still be read.
     """
 
     _filename = 'Session.Store'
@@ -44,7 +49,7 @@ class SessionShelveStore(SessionStore):
     def __getitem__(self, key):
         """Get a session item, reading it from the store."""
         # multiple simultaneous read accesses are safe
-        return self._store[key]
+        return self.decodeValue(self._store[key])
 
     def __setitem__(self, key, value):
         """Set a session item, writing it to the store."""
@@ -55,7 +60,7 @@ class SessionShelveStore(SessionStore):
                 if dirty:
                     value.setDirty(False)
                 try:
-                    self._store[key] = value
+                    self._store[key] = self.encode(value)
                 except Exception:
                     if dirty:
                         value.setDirty()
@@ -88,14 +93,21 @@ class SessionShelveStore(SessionStore):
     def setdefault(self, key, default=None):
         """Return value if key available, else default (also setting it)."""
         with self._lock:
-            return self._store.setdefault(key, default)
+            try:
+                return self[key]
+            except KeyError:
+                self._store[key] = self.encode(default)
+                return default
 
     def pop(self, key, default=NoDefault):
         """Return value if key available, else default (also remove key)."""
         with self._lock:
             if default is NoDefault:
-                return self._store.pop(key)
-            return self._store.pop(key, default)
+                return self.decodeValue(self._store.pop(key))
+            try:
+                return self.decodeValue(self._store.pop(key))
+            except KeyError:
+                return default
 
     # endregion Access
 
@@ -124,3 +136,11 @@ class SessionShelveStore(SessionStore):
         self._store.sync()
 
     # endregion Application support
+
+    # region Auxiliary methods
+
+    def decodeValue(self, value):
+        """Decode a value from the shelf if it has been encoded."""
+        return self.decode(value) if isinstance(value, bytes) else value
+
+    # endregion Auxiliary methods
@@ -0,0 +1,243 @@
+"""Session store using an SQLite database."""
+
+import os
+import sqlite3
+import threading
+
+from time import time
+
+from MiscUtils import NoDefault
+
+from SessionStore import SessionStore
+
+
+class SessionSqliteStore(SessionStore):
+    """A session store implemented with an SQLite database.
+
+    To use this store, set SessionStore in Application.config to 'Sqlite'.
+
+    The sessions are stored in a single database file in the session
+    directory, which is used in write-ahead logging (WAL) mode, so that
+    reading sessions is not blocked while sessions are written. Several
+    processes on the same machine can share the database.
+
+    Besides the encoded session, the table also stores the time when each
+    session expires in an indexed column, so that stale sessions can be
+    removed with a single DELETE statement without loading them. This is
+    not done if the session class overrides the expiring() method, since
+    it must then be called for each stale session.
+    """
+
+    _filename = 'Session.sqlite'
+
+    # region Init
+
+    def __init__(self, app, restoreFiles=None, filename=None):
+        """Initialize the session database.
+
+        If restoreFiles is true, existing sessions in the database
+        will be reused, otherwise the database will be cleared.
+        """
+        SessionStore.__init__(self, app)
+        self._filename = os.path.join(
+            app._sessionDir, filename or self._filename)
+        if restoreFiles is None:
+            restoreFiles = self._retain
+        # seconds to wait for a database locked by another connection
+        self._timeout = app.setting('SqliteTimeout', 10)
+        self._loadBeforeDelete = self.needsExpiring()
+        # every thread uses its own connection to the database
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'id TEXT PRIMARY KEY, data BLOB NOT NULL,'
+            ' lastAccessTime REAL, expires REAL)')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS sessions_expires'
+            ' ON sessions (expires)')
+        if not restoreFiles:
+            self.clear()
+
+    # endregion Init
+
+    # region Access
+
+    def __len__(self):
+        """Return the number of sessions."""
+        return self.connection().execute(
+            'SELECT count(*) FROM sessions').fetchone()[0]
+
+    def __getitem__(self, key):
+        """Get a session item, reading it from the database."""
+        row = self.connection().execute(
+            'SELECT data FROM sessions WHERE id=?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self.decode(row[0])
+
+    def __setitem__(self, key, value):
+        """Set a session item, writing it to the database."""
+        dirty = value.isDirty()
+        if self._alwaysSave or dirty:
+            if dirty:
+                value.setDirty(False)
+            try:
+                self.save(key, value)
+            except Exception:
+                if dirty:
+                    value.setDirty()
+                raise  # raise original exception
+
+    def __delitem__(self, key):
+        """Delete a session item from the database."""
+        if self._loadBeforeDelete:
+            session = self[key]
+            if not session.isExpired():
+                session.expiring()
+        with self.connection() as conn:
+            deleted = conn.execute(
+                'DELETE FROM sessions WHERE id=?', (key,)).rowcount
+        if not deleted:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        """Check whether the session store has a given key."""
+        return self.connection().execute(
+            'SELECT 1 FROM sessions WHERE id=?', (key,)).fetchone() is not None
+
+    def __iter__(self):
+        """Return an iterator over the stored session keys."""
+        return iter(self.keys())
+
+    def keys(self):
+        """Return a list with the keys of all the stored sessions."""
+        return [row[0] for row in self.connection().execute(
+            'SELECT id FROM sessions')]
+
+    def clear(self):
+        """Clear the session store, removing all of its items."""
+        with self.connection() as conn:
+            conn.execute('DELETE FROM sessions')
+
+    def setdefault(self, key, default=None):
+        """Return value if key available, else default (also setting it)."""
+        try:
+            return self[key]
+        except KeyError:
+            self.save(key, default, replace=False)
+            return self[key]
+
+    def pop(self, key, default=NoDefault):
+        """Return value if key available, else default (also remove key)."""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT data FROM sessions WHERE id=?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM sessions WHERE id=?', (key,))
+        if row is None:
+            if default is NoDefault:
+                raise KeyError(key)
+            return default
+        return self.decode(row[0])
+
+    # endregion Access
+
+    # region Convenience methods
+
+    def iteritems(self):
+        """Return an iterator over the (key, value) pairs for all sessions.
+
+        All sessions are fetched from the database with a single query.
+        """
+        decode = self.decode
+        for key, data in self.connection().execute(
+                'SELECT id, data FROM sessions').fetchall():
+            yield key, decode(data)
+
+    def itervalues(self):
+        """Return an iterator over the stored values of all sessions."""
+        for _key, value in self.iteritems():
+            yield value
+
+    # endregion Convenience methods
+
+    # region Application support
+
+    def storeSession(self, session):
+        """Save potentially changed session in the store."""
+        self[session.identifier()] = session
+
+    def storeAllSessions(self):
+        """Permanently save all sessions in the store.
+
+        Should be used (only) when the application server is shut down.
+        This closes all connections to the database.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def cleanStaleSessions(self, _task=None):
+        """Clean stale sessions.
+
+        The stale sessions are found using the index on their expiration
+        time and, if possible, deleted without loading them.
+        """
+        curTime = time()
+        with self.connection() as conn:
+            if self._loadBeforeDelete:
+                keys = [row[0] for row in conn.execute(
+                    'SELECT id FROM sessions WHERE expires<=?', (curTime,))]
+            else:
+                conn.execute(
+                    'DELETE FROM sessions WHERE expires<=?', (curTime,))
+                return
+        for key in keys:
+            try:
+                del self[key]
+            except KeyError:
+                pass  # already deleted by some other thread
+
+    # endregion Application support
+
+    # region Auxiliary methods
+
+    def connection(self):
+        """Get the database connection for the current thread."""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._filename, timeout=self._timeout,
+                check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._lock:
+                self._connections.append(conn)
+                self._local.connection = conn
+        return conn
+
+    def save(self, key, session, replace=True):
+        """Write the session to the database.
+
+        The session is always written, whether it is dirty or not.
+        If replace is false, an existing session will not be replaced.
+        """
+        lastAccessTime = session.lastAccessTime()
+        expires = self.expirationTime(session)
+        with self.connection() as conn:
+            conn.execute(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'}"
+                ' INTO sessions (id, data, lastAccessTime, expires)'
+                ' VALUES (?, ?, ?, ?)',
+                (key, self.encode(session), lastAccessTime, expires))
+
+    # endregion Auxiliary methods
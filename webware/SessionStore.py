@@ -1,12 +1,17 @@
 """A general session store."""
 
-from pickle import load, dump, HIGHEST_PROTOCOL as maxPickleProtocol
+from io import BytesIO
+from pickle import dump, HIGHEST_PROTOCOL as maxPickleProtocol
+from threading import Lock
 from warnings import warn
 
 from time import time
 
 from MiscUtils import AbstractError
 
+from Session import Session
+from SessionCodec import SessionCodec
+
 
 def dumpWithHighestProtocol(obj, f):
     """Same as pickle.dump, but by default with the highest protocol."""
@@ -24,11 +29,13 @@ class SessionStore:
 
     Subclasses often encode sessions for storage somewhere. In light
     of that, this class also defines methods encoder(), decoder() and
-    setEncoderDecoder(). The encoder and decoder default to the load()
-    and dump() functions of the pickle module. However, using the
-    setEncoderDecoder() method, you can use the functions from marshal
-    (if appropriate) or your own encoding scheme. Subclasses should use
-    encoder() and decoder() (and not pickle.load() and pickle.dump()).
+    setEncoderDecoder(). The encoder and decoder default to the dump()
+    and load() methods of the session codec chosen with the SessionCodec
+    setting, which pickles the sessions and optionally compresses them.
+    However, using the setEncoderDecoder() method, you can use the
+    functions from marshal (if appropriate) or your own encoding scheme.
+    Subclasses should use encoder() and decoder(), or encode() and
+    decode() if they need bytes (and not pickle.load() and pickle.dump()).
 
     Subclasses may rely on the attribute self._app to point to the
     application.
@@ -39,12 +46,13 @@ class SessionStore:
     will also need to add another import statement in Application.py.
     Search for SessionStore and you'll find the place.
 
-    TO DO
-
-      * Should there be a check-in/check-out strategy for sessions to
-        prevent concurrent requests on the same session? If so, that can
-        probably be done at this level (as opposed to pushing the burden
-        on various subclasses).
+    If the setting SessionLocking is enabled, the Application checks out
+    a session with checkOut() before using it in a transaction and checks
+    it in again with checkIn() when the transaction has stored it, so that
+    concurrent requests on the same session are serialized. By default,
+    this is done using locks in the current process, which is sufficient
+    for stores used by only one process. Stores that are shared between
+    several processes should override these methods.
     """
 
     # region Init
@@ -57,8 +65,16 @@ class SessionStore:
         self._app = app
         self._alwaysSave = app._alwaysSaveSessions
         self._retain = app._retainSessions
-        self._encoder = dumpWithHighestProtocol
-        self._decoder = load
+        self._codec = SessionCodec(
+            app.setting('SessionCodec', 'pickle') or 'pickle',
+            app.setting('SessionCompressMinSize', 1024))
+        self._encoder = self._codec.dump
+        self._decoder = self._codec.load
+        self._lockTimeout = app.setting('SessionLockTimeout', 30)
+        # _locks maps session keys to lists of a lock
+        # and the number of transactions using that lock
+        self._locks = {}
+        self._locksLock = Lock()
 
     # endregion Init
 
@@ -183,6 +199,10 @@ class SessionStore:
 
         Called by the Application to tell this store to clean out all
         sessions that have exceeded their lifetime.
+
+        This default implementation loads every session in the store.
+        Subclasses storing sessions outside the memory should override
+        this method and use some metadata for finding the stale sessions.
         """
         curTime = time()
         keys = []
@@ -192,23 +212,74 @@ class SessionStore:
             except KeyError:
                 pass  # session was already deleted by some other thread
             else:
-                try:
-                    timeout = session.timeout()
-                    if timeout is not None and (
-                            timeout == 0 or
-                            curTime >= session.lastAccessTime() + timeout):
-                        keys.append(key)
-                except AttributeError as e:
-                    raise ValueError(
-                        f'Not a Session object: {session!r}') from e
+                expires = self.expirationTime(session)
+                if expires is not None and curTime >= expires:
+                    keys.append(key)
         for key in keys:
             try:
                 del self[key]
             except KeyError:
                 pass  # already deleted by some other thread
 
+    @staticmethod
+    def expirationTime(session):
+        """Get the time when the given session expires.
+
+        Returns None if the session never expires.
+        """
+        try:
+            timeout = session.timeout()
+            if timeout is None:
+                return None
+            return session.lastAccessTime() + timeout
+        except AttributeError as e:
+            raise ValueError(f'Not a Session object: {session!r}') from e
+
+    def needsExpiring(self):
+        """Check whether sessions must be loaded before they are deleted.
+
+        This is only necessary if the session class of the application
+        overrides the expiring() method, which must then be called.
+        """
+        sessionClass = getattr(self._app, '_sessionClass', None)
+        return not (sessionClass and sessionClass.expiring is Session.expiring)
+
     # endregion Application support
 
+    # region Session locking
+
+    def checkOut(self, key):
+        """Check out the session with the given key.
+
+        Waits until the session is not used by any other transaction any
+        more, but at most SessionLockTimeout seconds (no limit if this is
+        set to None). Returns a token that must be passed to checkIn(),
+        or None if the session could not be checked out in time.
+        """
+        with self._locksLock:
+            if (entry := self._locks.get(key)) is None:
+                entry = self._locks[key] = [Lock(), 0]
+            entry[1] += 1
+        timeout = self._lockTimeout
+        if entry[0].acquire(timeout=-1 if timeout is None else timeout):
+            return entry
+        self._releaseLockEntry(key, entry)
+        return None
+
+    def checkIn(self, key, token):
+        """Check in the session that has been checked out with the token."""
+        token[0].release()
+        self._releaseLockEntry(key, token)
+
+    def _releaseLockEntry(self, key, entry):
+        """Remove the lock for the key if it is not used any more."""
+        with self._locksLock:
+            entry[1] -= 1
+            if not entry[1] and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    # endregion Session locking
+
     # region Convenience methods
 
     def get(self, key, default=None):
@@ -263,6 +334,24 @@ class SessionStore:
         self._encoder = encoder
         self._decoder = decoder
 
+    def codec(self):
+        """Return the session codec of the store."""
+        return self._codec
+
+    def encode(self, value):
+        """Encode the value as bytes using the encoder of the store."""
+        if self._encoder == self._codec.dump:
+            return self._codec.dumps(value)
+        f = BytesIO()
+        self._encoder(value, f)
+        return f.getvalue()
+
+    def decode(self, data):
+        """Decode a value from bytes using the decoder of the store."""
+        if self._decoder == self._codec.load:
+            return self._codec.loads(data)
+        return self._decoder(BytesIO(data))
+
     # endregion Encoder/decoder
 
     # region As a string
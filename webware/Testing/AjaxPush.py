@@ -0,0 +1,22 @@
+from Examples.AjaxPage import AjaxPage
+
+
+class AjaxPush(AjaxPage):
+    """Test of pushing commands to the client with AjaxPage.
+
+    The timeouts are very short, so that this can be tested quickly.
+    """
+
+    _longPollTimeout = 0.5
+    _eventStreamDuration = 0.5
+    _keepAliveInterval = 0.2
+
+    def writeContent(self):
+        self.writeln('<h2>Ajax Push Test</h2>')
+
+    def exposedMethods(self):
+        return ['push']
+
+    def push(self, text):
+        self.ajaxPush(self.alert(text))
+        return self.setTag('status', 'pushed')
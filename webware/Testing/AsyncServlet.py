@@ -0,0 +1,23 @@
+from asyncio import gather, sleep
+
+from HTTPServlet import HTTPServlet
+
+
+class AsyncServlet(HTTPServlet):
+    """Test of a servlet responding with a coroutine.
+
+    The output is flushed before the coroutine waits for some results.
+    """
+
+    async def respondToGet(self, transaction):
+        response = transaction.response()
+        response.setHeader('Content-Type', 'text/plain')
+        response.write('Waiting for results...\n')
+        response.flush()
+        results = await gather(*map(self.square, range(4)))
+        response.write(f'Results: {results}\n')
+
+    @staticmethod
+    async def square(n):
+        await sleep(0.01 * n)
+        return n * n
@@ -0,0 +1,22 @@
+from threading import current_thread
+from time import sleep
+
+from JSONRPCServlet import JSONRPCServlet
+
+
+class JSONRPCBatch(JSONRPCServlet):
+    """Test of JSON-RPC 2.0 batches executed in parallel."""
+
+    _batchThreads = 4
+
+    @staticmethod
+    def wait(seconds):
+        sleep(seconds)
+        return current_thread().name
+
+    @staticmethod
+    def fail():
+        raise ValueError('failed')
+
+    def exposedMethods(self):
+        return ['wait', 'fail']
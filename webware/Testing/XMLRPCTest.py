@@ -0,0 +1,22 @@
+from xmlrpc.client import Fault
+
+from XMLRPCServlet import XMLRPCServlet
+
+
+class XMLRPCTest(XMLRPCServlet):
+    """Test of XML-RPC calls and faults."""
+
+    def exposedMethods(self):
+        return ['echo', 'fail', 'fault']
+
+    @staticmethod
+    def echo(value):
+        return value
+
+    @staticmethod
+    def fail():
+        raise ValueError('failed')
+
+    @staticmethod
+    def fault():
+        raise Fault(42, 'custom fault')
@@ -0,0 +1,126 @@
+"""Test the ASGI adapter"""
+
+import asyncio
+import unittest
+
+from threading import Thread
+
+from ASGIAdapter import ASGIInput, ASGIResponder, environFromScope
+
+
+class TestASGIAdapter(unittest.TestCase):
+
+    def runInThread(self, func, *messages):
+        """Run func in a thread while an event loop serves the messages."""
+        received, sent = list(messages), []
+        result = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(event):
+            sent.append(event)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            thread = Thread(target=lambda: result.append(
+                func(receive, send, loop)))
+            thread.start()
+            while thread.is_alive():
+                await asyncio.sleep(0.001)
+            thread.join()
+
+        asyncio.run(main())
+        self.assertEqual(len(result), 1)
+        return result[0], sent
+
+    @staticmethod
+    def body(*chunks):
+        return [{'type': 'http.request', 'body': chunk,
+                 'more_body': n < len(chunks) - 1}
+                for n, chunk in enumerate(chunks)]
+
+    def testRead(self):
+        def read(receive, _send, loop):
+            f = ASGIInput(receive, loop)
+            return f.read(3), f.read(4), f.read(), f.read()
+
+        result = self.runInThread(read, *self.body(b'ab', b'cdef', b'ghi'))[0]
+        self.assertEqual(result, (b'abc', b'defg', b'hi', b''))
+
+    def testReadLines(self):
+        def readLines(receive, _send, loop):
+            f = ASGIInput(receive, loop)
+            return f.readline(), f.readline(3), list(f)
+
+        result = self.runInThread(
+            readLines, *self.body(b'one\ntw', b'o\nthree\nfo', b'ur'))[0]
+        self.assertEqual(
+            result, (b'one\n', b'two', [b'\n', b'three\n', b'four']))
+
+    def testDisconnect(self):
+        def read(receive, _send, loop):
+            try:
+                ASGIInput(receive, loop).read()
+            except ConnectionAbortedError:
+                return True
+
+        self.assertTrue(self.runInThread(
+            read, {'type': 'http.request', 'body': b'x', 'more_body': True},
+            {'type': 'http.disconnect'})[0])
+
+    def testEnviron(self):
+        environ = environFromScope({
+            'type': 'http', 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'https', 'root_path': '/app', 'path': '/app/Pfad/ä',
+            'query_string': b'a=1&b=2', 'server': ('example.com', 8443),
+            'client': ('127.0.0.1', 54321), 'headers': [
+                (b'host', b'example.com'), (b'content-type', b'text/plain'),
+                (b'content-length', b'4'), (b'cookie', b'a=1'),
+                (b'cookie', b'b=2'), (b'x-forwarded-for', b'1.2.3.4')]},
+            None)
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['SCRIPT_NAME'], '/app')
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin-1').decode(), '/Pfad/ä')
+        self.assertEqual(environ['QUERY_STRING'], 'a=1&b=2')
+        self.assertEqual(environ['SERVER_NAME'], 'example.com')
+        self.assertEqual(environ['SERVER_PORT'], '8443')
+        self.assertEqual(environ['REMOTE_ADDR'], '127.0.0.1')
+        self.assertEqual(environ['wsgi.url_scheme'], 'https')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['CONTENT_LENGTH'], '4')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '1.2.3.4')
+        self.assertIsNone(environ['wsgi.input'])
+
+    def testResponder(self):
+        def respond(_receive, send, loop):
+            responder = ASGIResponder(send, loop)
+            write = responder.startResponse(
+                '201 Created', [('Content-Type', 'text/plain')])
+            write(b'Hello')
+            write(b'')
+            responder.finish([b', ', b'World'])
+
+        events = self.runInThread(respond)[1]
+        self.assertEqual(events, [
+            {'type': 'http.response.start', 'status': 201,
+             'headers': [(b'content-type', b'text/plain')]},
+            {'type': 'http.response.body', 'body': b'Hello',
+             'more_body': True},
+            {'type': 'http.response.body', 'body': b', ', 'more_body': True},
+            {'type': 'http.response.body', 'body': b'World',
+             'more_body': True},
+            {'type': 'http.response.body', 'body': b''}])
+
+    def testEmptyResponse(self):
+        def respond(_receive, send, loop):
+            responder = ASGIResponder(send, loop)
+            responder.startResponse('204 No Content', [])
+            responder.finish([])
+
+        events = self.runInThread(respond)[1]
+        self.assertEqual(events, [
+            {'type': 'http.response.start', 'status': 204, 'headers': []},
+            {'type': 'http.response.body', 'body': b''}])
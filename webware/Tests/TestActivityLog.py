@@ -0,0 +1,245 @@
+"""Test the activity log"""
+
+import os
+import unittest
+
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+
+from ActivityLog import ActivityLog, getterForColumn
+
+
+class Request:
+
+    def __init__(self, uri):
+        self._uri = uri
+
+    def uri(self):
+        return self._uri
+
+    def method(self):
+        return 'GET'
+
+
+class Transaction:
+
+    _session = None
+
+    def __init__(self, application, uri='/', duration=0.5):
+        self._application = application
+        self._request = Request(uri)
+        self.duration = duration
+
+    def application(self):
+        return self._application
+
+    def request(self):
+        return self._request
+
+    @staticmethod
+    def response():
+        return None
+
+    @staticmethod
+    def servlet():
+        return None
+
+
+class Application:
+
+    def __init__(self, logDir, **settings):
+        self._logDir = logDir
+        self._settings = {
+            'ActivityLogFilename': 'Activity.csv',
+            'ActivityLogColumns': [
+                'request.method', 'request.uri', 'transaction.duration'],
+            'ActivityLogQueueSize': 0,
+            **settings}
+
+    def setting(self, name, default=None):
+        return self._settings.get(name, default)
+
+    @staticmethod
+    def serverSidePath(path):
+        return path
+
+
+class TestGetterForColumn(unittest.TestCase):
+
+    def testGetters(self):
+        app = Application('.')
+        trans = Transaction(app, '/foo', 0.25)
+        objects = {'transaction': trans, 'request': trans.request(),
+                   'session': None, 'info': {'answer': 42}}
+        self.assertEqual(getterForColumn('request.uri')(objects), '/foo')
+        self.assertEqual(
+            getterForColumn('transaction.duration')(objects), 0.25)
+        self.assertEqual(
+            getterForColumn('transaction.request.method')(objects), 'GET')
+        self.assertEqual(getterForColumn('info.answer')(objects), 42)
+        self.assertRaises(
+            Exception, getterForColumn('request.missing'), objects)
+        self.assertRaises(
+            Exception, getterForColumn('session.identifier'), objects)
+
+
+class TestActivityLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.logDir = self.dir.name
+        self.filename = os.path.join(self.logDir, 'Activity.csv')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def readLog(self, suffix=''):
+        with open(self.filename + suffix, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def testSynchronousWriting(self):
+        app = Application(self.logDir)
+        log = ActivityLog(app)
+        self.assertEqual(log.filename(), self.filename)
+        log.write(Transaction(app, '/foo'))
+        log.write(Transaction(app, '/bar'))
+        self.assertEqual(self.readLog(), [
+            'request.method,request.uri,transaction.duration',
+            'GET,/foo,0.500000', 'GET,/bar,0.500000'])
+        log.close()
+
+    def testUnknownValues(self):
+        app = Application(self.logDir, ActivityLogColumns=[
+            'request.uri', 'request.foo', 'session.identifier'])
+        log = ActivityLog(app)
+        log.write(Transaction(app, '/foo'))
+        self.assertEqual(self.readLog()[1], '/foo,(unknown),(unknown)')
+
+    def testAsynchronousWriting(self):
+        app = Application(
+            self.logDir, ActivityLogQueueSize=100,
+            ActivityLogFlushInterval=0.05)
+        log = ActivityLog(app)
+        for n in range(10):
+            log.write(Transaction(app, f'/page{n}'))
+        log.flush()
+        lines = self.readLog()
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(lines[-1], 'GET,/page9,0.500000')
+        log.write(Transaction(app, '/last'))
+        log.close()
+        self.assertEqual(self.readLog()[-1], 'GET,/last,0.500000')
+        self.assertEqual(log.numDropped(), 0)
+
+    def testBatchedWriting(self):
+        app = Application(self.logDir, ActivityLogQueueSize=100)
+        log = ActivityLog(app)
+        batches = []
+        writeEntries = log.writeEntries
+        log.writeEntries = lambda entries: (
+            batches.append(len(entries)), writeEntries(entries))
+        for n in range(20):
+            log.write(Transaction(app, f'/page{n}'))
+        log.close()
+        self.assertEqual(batches, [20])
+        self.assertEqual(len(self.readLog()), 21)
+
+    def blockedLog(self, **settings):
+        app = Application(self.logDir, ActivityLogQueueSize=2, **settings)
+        log = ActivityLog(app)
+        blocked, written = Event(), []
+        writeEntries = log.writeEntries
+
+        def blockingWriteEntries(entries):
+            blocked.wait()
+            written.extend(entries)
+            writeEntries(entries)
+
+        log.writeEntries = blockingWriteEntries
+        # the first entry will be taken by the blocked writer
+        log.write(Transaction(app, '/first'))
+        while not log._queue.empty():
+            pass
+        return app, log, blocked
+
+    def testDropNewPolicy(self):
+        app, log, blocked = self.blockedLog(ActivityLogFlushInterval=0)
+        for n in range(4):
+            log.write(Transaction(app, f'/page{n}'))
+        self.assertEqual(log.numDropped(), 2)
+        blocked.set()
+        log.close()
+        self.assertEqual([line.split(',')[1] for line in self.readLog()[1:]],
+                         ['/first', '/page0', '/page1'])
+
+    def testDropOldPolicy(self):
+        app, log, blocked = self.blockedLog(
+            ActivityLogFlushInterval=0, ActivityLogDropPolicy='dropOld')
+        for n in range(4):
+            log.write(Transaction(app, f'/page{n}'))
+        self.assertEqual(log.numDropped(), 2)
+        blocked.set()
+        log.close()
+        self.assertEqual([line.split(',')[1] for line in self.readLog()[1:]],
+                         ['/first', '/page2', '/page3'])
+
+    def testDropOldPolicyWithFullQueue(self):
+        app = Application(
+            self.logDir, ActivityLogQueueSize=1,
+            ActivityLogFlushInterval=0, ActivityLogDropPolicy='dropOld')
+        log = ActivityLog(app)
+        for n in range(50):
+            log.write(Transaction(app, f'/page{n}'))
+        flush = Thread(target=log.flush, daemon=True)
+        flush.start()
+        flush.join(2)
+        self.assertFalse(flush.is_alive())
+        self.assertEqual(self.readLog()[-1], 'GET,/page49,0.500000')
+        log.write(Transaction(app, '/last'))
+        close = Thread(target=log.close, daemon=True)
+        close.start()
+        close.join(2)
+        self.assertFalse(close.is_alive())
+        self.assertEqual(len(self.readLog()), 52 - log.numDropped())
+
+    def testDropOldPolicyKeepsStopMarker(self):
+        app, log, blocked = self.blockedLog(
+            ActivityLogFlushInterval=0, ActivityLogDropPolicy='dropOld')
+        queue = log._queue
+        queue.put(None)  # the stop marker put there by close()
+        queue.put(['GET', '/page0', 0.5])
+        log.write(Transaction(app, '/page1'))
+        self.assertEqual(log.numDropped(), 1)
+        self.assertEqual(queue.queue[-1], None)
+        blocked.set()
+        log._thread.join(2)
+        self.assertFalse(log._thread.is_alive())
+        log.flush()
+
+    def testInvalidDropPolicy(self):
+        app = Application(self.logDir, ActivityLogDropPolicy='ignore')
+        self.assertRaises(ValueError, ActivityLog, app)
+
+    def testRotationBySize(self):
+        app = Application(
+            self.logDir, ActivityLogMaxSize=100, ActivityLogBackupCount=2)
+        log = ActivityLog(app)
+        for n in range(20):
+            log.write(Transaction(app, f'/page{n}'))
+        self.assertLessEqual(len(self.readLog()), 5)
+        self.assertEqual(self.readLog()[0], self.readLog('.1')[0])
+        self.assertTrue(os.path.exists(self.filename + '.2'))
+        self.assertFalse(os.path.exists(self.filename + '.3'))
+        self.assertEqual(self.readLog()[-1], 'GET,/page19,0.500000')
+
+    def testRotationByTime(self):
+        app = Application(self.logDir, ActivityLogRotateInterval=60)
+        log = ActivityLog(app)
+        log.write(Transaction(app, '/foo'))
+        log.write(Transaction(app, '/bar'))
+        self.assertFalse(os.path.exists(self.filename + '.1'))
+        log._fileCreated -= 60
+        log.write(Transaction(app, '/baz'))
+        self.assertEqual(self.readLog('.1')[1:], [
+            'GET,/foo,0.500000', 'GET,/bar,0.500000'])
+        self.assertEqual(self.readLog()[1:], ['GET,/baz,0.500000'])
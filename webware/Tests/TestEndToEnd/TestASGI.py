@@ -0,0 +1,136 @@
+"""Test Webware Application via its ASGI interface"""
+
+import asyncio
+import unittest
+
+from urllib.parse import urlencode
+
+from .AppTest import AppTest
+
+
+class TestASGI(AppTest, unittest.TestCase):
+
+    settings = {'PrintConfigAtStartUp': False, 'ASGIThreads': 2}
+
+    def request(self, path, method='GET', query=b'', body=b'', headers=None,
+                chunkSize=None):
+        """Send a request to the ASGI callable with an in-process client."""
+        chunks = [body[i:i + chunkSize] for i in range(
+            0, len(body), chunkSize)] if body and chunkSize else [body]
+        messages = [
+            {'type': 'http.request', 'body': chunk,
+             'more_body': n < len(chunks) - 1}
+            for n, chunk in enumerate(chunks)]
+        events = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(10)  # wait for disconnect
+            return {'type': 'http.disconnect'}
+
+        async def send(event):
+            events.append(event)
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path,
+            'raw_path': path.encode(), 'query_string': query,
+            'root_path': '', 'server': ('localhost', 8080),
+            'client': ('127.0.0.1', 12345), 'headers': [
+                (name.lower().encode(), value.encode())
+                for name, value in (headers or {}).items()]}
+        asyncio.run(self.app.asgi(scope, receive, send))
+        return events
+
+    def testGetPage(self):
+        events = self.request('/')
+        start, body = events[0], events[1:]
+        self.assertEqual(start['type'], 'http.response.start')
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/html'), start['headers'])
+        self.assertTrue(all(
+            event['type'] == 'http.response.body' for event in body))
+        self.assertFalse(body[-1].get('more_body'))
+        text = b''.join(event['body'] for event in body).decode()
+        self.assertTrue(text.startswith('<!DOCTYPE html>'))
+        self.assertTrue(text.rstrip().endswith('</html>'))
+
+    def testNotFound(self):
+        events = self.request('/Examples/DoesNotExist')
+        self.assertEqual(events[0]['status'], 404)
+
+    def testPostBody(self):
+        getFields = urlencode([
+            ('getfield1', 'getvalue1'),
+            ('getfield2', 'getvalue21'), ('getfield2', 'getvalue22'),
+            ('dualfield1', 'getdual1'),
+            ('dualfield2', 'getdual21'), ('dualfield2', 'getdual22'),
+            ('getempty', '')])
+        postFields = urlencode([
+            ('postfield1', 'postvalue1'),
+            ('postfield2', 'postvalue21'), ('postfield2', 'postvalue22'),
+            ('dualfield1', 'postdual1'),
+            ('dualfield2', 'postdual21'), ('dualfield2', 'postdual22'),
+            ('postempty', ''), ('testbutton', 'Submit')]).encode()
+        events = self.request(
+            '/Testing/FieldStorage', 'POST', getFields.encode(), postFields,
+            {'Content-Type': 'application/x-www-form-urlencoded',
+             'Content-Length': str(len(postFields))}, chunkSize=20)
+        self.assertEqual(events[0]['status'], 200)
+        text = b''.join(event['body'] for event in events[1:]).decode()
+        self.assertIn('Everything ok', text)
+
+    def testCoroutineIsStreamed(self):
+        events = self.request('/Testing/AsyncServlet')
+        self.assertEqual(events[0]['status'], 200)
+        body = [event['body'] for event in events[1:] if event['body']]
+        self.assertEqual(body, [
+            b'Waiting for results...\n', b'Results: [0, 1, 4, 9]\n'])
+        self.assertFalse(events[-1].get('more_body'))
+
+    def testCoroutineWithWSGI(self):
+        r = self.testApp.get('/Testing/AsyncServlet')
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(
+            r.text, 'Waiting for results...\nResults: [0, 1, 4, 9]\n')
+
+    def testConcurrentRequests(self):
+        async def requests():
+            loop = asyncio.get_running_loop()
+            return await asyncio.gather(*(loop.run_in_executor(
+                None, self.request, '/Testing/AsyncServlet')
+                for _count in range(5)))
+
+        for events in asyncio.run(requests()):
+            self.assertEqual(events[0]['status'], 200)
+        self.assertEqual(self.app.asgiExecutor()._max_workers, 2)
+
+    def testLifespanStartup(self):
+        messages = [{'type': 'lifespan.startup'}]
+        events = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            raise asyncio.CancelledError
+
+        async def send(event):
+            events.append(event)
+
+        async def lifespan():
+            try:
+                await self.app.asgi(
+                    {'type': 'lifespan', 'asgi': {'version': '3.0'}},
+                    receive, send)
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(lifespan())
+        self.assertEqual(events, [{'type': 'lifespan.startup.complete'}])
+
+    def testUnsupportedScope(self):
+        async def websocket():
+            await self.app.asgi({'type': 'websocket'}, None, None)
+
+        self.assertRaises(NotImplementedError, asyncio.run, websocket())
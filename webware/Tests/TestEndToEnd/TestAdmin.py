@@ -165,6 +165,7 @@ class TestAdmin(AppTest, unittest.TestCase):
             '<title>Servlet Cache</title>', '<h4>PythonServletFactory</h4>',
             '<p>Uniqueness: file</p>', "<p>Extensions: '.py', '.pyc'</p>",
             'Click any link to jump to the details for that path.', 'Flush',
+            'Free servlets in the pools:', 'pool hits:', 'hit rate:',
             '<h5>Filenames:</h5>', '<tr><th>File</th><th>Directory</th></tr>',
             '<h5>Full paths:</h5>', '<tr><th>Servlet path</th></tr>',
             '>Main.py</a></td><td>', '>ServletCache.py</a></td><td>',
@@ -173,6 +174,8 @@ class TestAdmin(AppTest, unittest.TestCase):
             '<th>class</th>', '<th>instances</th>',
             '<th>mtime</th>', '<th>path</th>',
             '<td>Main</td>', '<td>ServletCache</td>',
+            '<h4>Static File Cache</h4>', 'Cached files:',
+            'Cache hits:', 'evictions:', '<h4>PSP Insert Cache</h4>',
             no='has been flushed')
         r = r.form.submit('flush_PythonServletFactory')
         self.assertEqual(r.status, '200 OK')
@@ -199,6 +202,17 @@ class TestAdmin(AppTest, unittest.TestCase):
             '<strong>Main.py</strong>', '<td>Main</td>',
             '<strong>ServletCache.py</strong>', '<td>ServletCache</td>',
             no='has been flushed')
+        r = r.form.submit('flush_FileCache')
+        self.assertEqual(r.status, '200 OK')
+        r.mustcontain(
+            '<h4>Static File Cache</h4>',
+            'The static file cache has been flushed.',
+            '<h4>PSP Insert Cache</h4>')
+        r = r.form.submit('flush_FragmentCache')
+        self.assertEqual(r.status, '200 OK')
+        r.mustcontain(
+            '<h4>PSP Insert Cache</h4>',
+            'The PSP insert cache has been flushed.')
 
     def testAppControl(self):
         r = self.testApp.get('/Admin/').click('Application Control')
@@ -0,0 +1,80 @@
+"""Test pushing commands to the client with AjaxPage"""
+
+import unittest
+
+from threading import Timer
+from time import time
+
+from .AppTest import AppTest
+
+
+class TestAjaxPush(AppTest, unittest.TestCase):
+
+    settings = {'PrintConfigAtStartUp': False, 'PushMaxMessages': 5}
+
+    def setUp(self):
+        AppTest.setUp(self)
+        self.testApp.reset()
+        self.page = self.testApp.get('/Testing/AjaxPush')
+        # the session is created when the first command is pushed
+        self.testApp.get(self.url('Call', _call_='push', _='start'))
+        self.sid = self.testApp.cookies['_SID_']
+        self.assertEqual(
+            self.app.pushChannel().pull(self.sid), ["alert('start')"])
+
+    def url(self, action, **fields):
+        args = ''.join(f'&{key}={value}' for key, value in fields.items())
+        return f'/Testing/AjaxPush?_action_=ajax{action}&_req_=1{args}'
+
+    def testPage(self):
+        r = self.page
+        self.assertEqual(r.status, '200 OK')
+        r.mustcontain(
+            '<h2>Ajax Push Test</h2>',
+            '<script src="ajaxcall.js"></script>',
+            '<script>var server_events = true;</script>',
+            '<script src="ajaxpoll.js"></script>')
+
+    def testPushAndPoll(self):
+        r = self.testApp.get(self.url('Call', _call_='push', _='hello'))
+        self.assertEqual(r.text, "setTag('status','pushed')")
+        start = time()
+        r = self.testApp.get(self.url('Poll'))
+        self.assertLess(time() - start, 0.4)
+        self.assertEqual(r.content_type, 'application/json')
+        self.assertRegex(r.text, r"^wait=\d;alert\('hello'\);$")
+
+    def testPollTimesOut(self):
+        start = time()
+        r = self.testApp.get(self.url('Poll'))
+        self.assertGreaterEqual(time() - start, 0.5)
+        self.assertRegex(r.text, r'^wait=\d;$')
+
+    def testPollIsWokenUp(self):
+        channel = self.app.pushChannel()
+        Timer(0.1, channel.push, (self.sid, 'foo()')).start()
+        r = self.testApp.get(self.url('Poll'))
+        self.assertRegex(r.text, r'^wait=\d;foo\(\);$')
+
+    def testBoundedQueue(self):
+        channel = self.app.pushChannel()
+        for n in range(8):
+            channel.push(self.sid, f'foo({n})')
+        r = self.testApp.get(self.url('Poll'))
+        self.assertRegex(
+            r.text, r'^wait=\d;foo\(3\);foo\(4\);foo\(5\);foo\(6\);foo\(7\);$')
+
+    def testEvents(self):
+        channel = self.app.pushChannel()
+        channel.push(self.sid, 'foo()')
+        channel.push(self.sid, 'bar();\nbaz();')
+        Timer(0.3, channel.push, (self.sid, 'qux()')).start()
+        r = self.testApp.get(self.url('Events'))
+        self.assertEqual(r.content_type, 'text/event-stream')
+        self.assertEqual(r.headers['Cache-Control'], 'no-cache')
+        text = r.text
+        self.assertRegex(text, r'^retry: \d000\n\n')
+        self.assertIn(
+            '\n\ndata: foo()\n\ndata: bar();\ndata: baz();\n\n', text)
+        self.assertIn(': keep-alive\n\n', text)
+        self.assertIn('\n\ndata: qux()\n\n', text)
@@ -1,5 +1,6 @@
 """Test Webware Testing context"""
 
+import os
 import unittest
 
 from .AppTest import AppTest
@@ -80,3 +81,57 @@ class TestOnlyDefaultContext(AppTest, unittest.TestCase):
         self.assertEqual(r.status, '404 Not Found', r.status)
         r = self.testApp.get('/TestAlias/', expect_errors=True)
         self.assertEqual(r.status, '404 Not Found', r.status)
+
+
+class TestURLResolutionCache(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'URLResolutionCacheSize': 2,
+        'Contexts': {'Testing': 'Testing', 'default': 'Testing'}}
+
+    def setUp(self):
+        super().setUp()
+        self.parser = self.app.rootURLParser()
+        self.parser.clearResolutionCache()
+
+    def getStats(self):
+        stats = self.parser.resolutionCacheStats()
+        return stats['size'], stats['hits'], stats['misses']
+
+    def testCachedResolution(self):
+        size, hits, misses = self.getStats()
+        self.assertEqual(size, 0)
+        r = self.testApp.get('/Testing/')
+        r.mustcontain('<title>Testing</title>')
+        self.assertEqual(self.getStats(), (1, hits, misses + 1))
+        r = self.testApp.get('/Testing/')
+        r.mustcontain('<title>Testing</title>')
+        self.assertEqual(self.getStats(), (1, hits + 1, misses + 1))
+        self.assertEqual(self.parser.resolutionCacheStats()['maxSize'], 2)
+
+    def testBoundedSize(self):
+        size, hits, misses = self.getStats()
+        for path in ('/Testing/', '/Testing/Servlet', '/Testing/test.html'):
+            self.testApp.get(path)
+        self.assertEqual(self.getStats(), (2, hits, misses + 3))
+        self.testApp.get('/Testing/')  # has been evicted
+        self.assertEqual(self.getStats(), (2, hits, misses + 4))
+        self.testApp.get('/Testing/test.html')
+        self.assertEqual(self.getStats(), (2, hits + 1, misses + 4))
+
+    def testChangedDirectory(self):
+        size, hits, misses = self.getStats()
+        self.testApp.get('/Testing/Servlet')
+        path = self.app.contexts()['Testing']
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        try:
+            self.testApp.get('/Testing/Servlet')
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.getStats(), (1, hits, misses + 2))
+
+    def testNotFoundIsNotCached(self):
+        size, hits, misses = self.getStats()
+        self.testApp.get('/Testing/NoSuchServlet/', expect_errors=True)
+        self.assertEqual(self.getStats(), (0, hits, misses + 1))
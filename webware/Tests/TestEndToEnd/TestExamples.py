@@ -355,6 +355,8 @@ class TestExamples(AppTest, unittest.TestCase):
             ' name="filename"; filename="README.txt"',
             'Content-Type: text/plain',
             '<tr><th>size</th><td>25 bytes</td></tr>',
+            '<tr><th>sha256</th><td>d81f6d5568ad1e99f445921dc2f12604'
+            'b8f9df4651b65366e451a962aa4c56d9</td></tr>',
             '<tr><th style="vertical-align:top">contents</th>',
             '<pre style=', 'Hello from uploaded file!', '</pre>',
             no='<form')
@@ -0,0 +1,132 @@
+"""Test JSON-RPC 2.0 requests with the JSONRPCServlet"""
+
+import json
+import unittest
+
+from time import time
+
+from webob import Request  # pylint: disable=import-error
+
+from .AppTest import AppTest
+
+
+class TestJSONRPC(AppTest, unittest.TestCase):
+
+    settings = {'PrintConfigAtStartUp': False}
+
+    def post(self, data, url='/JSONRPCExample', status=200):
+        r = self.testApp.post(
+            url, data if isinstance(data, str) else json.dumps(data),
+            content_type='application/json', status=status)
+        self.assertEqual(r.content_type, 'application/json')
+        return r.json if r.text else None
+
+    def testCall(self):
+        self.assertEqual(self.post({
+            'jsonrpc': '2.0', 'id': 1, 'method': 'reverse',
+            'params': ['Hello, World!']}), {
+            'jsonrpc': '2.0', 'result': '!dlroW ,olleH', 'id': 1})
+
+    def testCallWithNamedParams(self):
+        self.assertEqual(self.post({
+            'jsonrpc': '2.0', 'id': 'a', 'method': 'uppercase',
+            'params': {'msg': 'Hello'}}), {
+            'jsonrpc': '2.0', 'result': 'HELLO', 'id': 'a'})
+
+    def testListMethods(self):
+        self.assertEqual(self.post({
+            'jsonrpc': '2.0', 'id': 1, 'method': 'system.listMethods'}), {
+            'jsonrpc': '2.0', 'id': 1,
+            'result': ['echo', 'reverse', 'uppercase', 'lowercase']})
+
+    def testNotification(self):
+        self.assertIsNone(self.post({
+            'jsonrpc': '2.0', 'method': 'echo', 'params': ['Hello']},
+            status=204))
+
+    def testErrors(self):
+        self.assertEqual(self.post('{"jsonrpc": "2.0", "method"'), {
+            'jsonrpc': '2.0', 'id': None,
+            'error': {'code': -32700, 'message': 'Parse error'}})
+        self.assertEqual(self.post({'jsonrpc': '2.0', 'method': 1}), {
+            'jsonrpc': '2.0', 'id': None,
+            'error': {'code': -32600, 'message': 'Invalid Request'}})
+        self.assertEqual(self.post({
+            'jsonrpc': '2.0', 'id': 2, 'method': 'invalid'}), {
+            'jsonrpc': '2.0', 'id': 2,
+            'error': {'code': -32601, 'message': 'Method not found'}})
+        response = self.post({
+            'jsonrpc': '2.0', 'id': 3, 'method': 'echo', 'params': [1, 2]})
+        self.assertEqual(response['error']['code'], -32602)
+        self.assertEqual(response['error']['message'], 'Invalid params')
+        self.assertIn('too many positional arguments',
+                      response['error']['data'])
+        response = self.post({
+            'jsonrpc': '2.0', 'id': 4, 'method': 'uppercase', 'params': [1]})
+        self.assertEqual(response['error']['code'], -32603)
+        self.assertEqual(response['error']['message'], 'Internal error')
+        self.assertIn("AttributeError: 'int' object has no attribute",
+                      response['error']['data'])
+
+    def testBatch(self):
+        self.assertEqual(self.post([
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'echo', 'params': ['a']},
+            {'jsonrpc': '2.0', 'method': 'echo', 'params': ['b']},
+            {'jsonrpc': '2.0', 'id': 2, 'method': 'reverse', 'params': ['cd']},
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'invalid'},
+            {'foo': 'bar'}]), [
+            {'jsonrpc': '2.0', 'result': 'a', 'id': 1},
+            {'jsonrpc': '2.0', 'result': 'dc', 'id': 2},
+            {'jsonrpc': '2.0', 'id': 3,
+             'error': {'code': -32601, 'message': 'Method not found'}},
+            {'jsonrpc': '2.0', 'id': None,
+             'error': {'code': -32600, 'message': 'Invalid Request'}}])
+
+    def testEmptyBatch(self):
+        self.assertEqual(self.post([]), {
+            'jsonrpc': '2.0', 'id': None,
+            'error': {'code': -32600, 'message': 'Invalid Request'}})
+
+    def testBatchOfNotifications(self):
+        self.assertIsNone(self.post([
+            {'jsonrpc': '2.0', 'method': 'echo', 'params': ['a']},
+            {'jsonrpc': '2.0', 'method': 'echo', 'params': ['b']}],
+            status=204))
+
+    def testLargeBatchIsStreamed(self):
+        text = 'x' * 10000
+        batch = [{'jsonrpc': '2.0', 'id': n, 'method': 'echo',
+                  'params': [text]} for n in range(20)]
+        request = Request.blank(
+            '/JSONRPCExample', method='POST', body=json.dumps(batch).encode(),
+            content_type='application/json')
+        # WebTest would set the Content-Length, so we use WebOb directly
+        status, headers, output = request.call_application(self.app)
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Length', dict(headers))
+        output = list(output)
+        self.assertGreater(len(output), 1)
+        self.assertEqual(json.loads(b''.join(output)), [
+            {'jsonrpc': '2.0', 'result': text, 'id': n} for n in range(20)])
+
+    def testParallelBatch(self):
+        batch = [{'jsonrpc': '2.0', 'id': n, 'method': 'wait',
+                  'params': [0.2]} for n in range(4)]
+        batch.append({'jsonrpc': '2.0', 'id': 4, 'method': 'fail'})
+        start = time()
+        response = self.post(batch, '/Testing/JSONRPCBatch')
+        self.assertLess(time() - start, 0.6)
+        self.assertEqual([r['id'] for r in response], list(range(5)))
+        threads = {r['result'] for r in response[:4]}
+        self.assertEqual(len(threads), 4)
+        self.assertTrue(all(
+            thread.startswith('JSONRPCBatch') for thread in threads))
+        error = response[4]['error']
+        self.assertEqual(error['code'], -32603)
+        self.assertIn('ValueError: failed', error['data'])
+
+    def testOriginalFormat(self):
+        r = self.testApp.post_json('/JSONRPCExample', params={
+            "id": 1, "method": "echo", "params": ["Hello"]})
+        self.assertEqual(r.text, 'throw new Error("Direct evaluation'
+                         ' not allowed");\n/*{"id": 1, "result": "Hello"}*/')
@@ -77,6 +77,17 @@ class TestPSPExamples(AppTest, unittest.TestCase):
             no=['test page uses <a href="Braces"><strong>braces</strong></a>',
                 'Comment check', 'not even in Python file'])
 
+    def testInsertCache(self):
+        from PSP.FragmentCache import fragmentCache
+        fragmentCache.clear()
+        hits = fragmentCache.stats()['hits']
+        for _count in range(2):
+            r = self.testApp.get('/PSP/Examples/PSPTests')
+            r.mustcontain(
+                'This is an HTML file that is dynamically inserted.')
+        self.assertEqual(len(fragmentCache), 1)
+        self.assertEqual(fragmentCache.stats()['hits'], hits + 1)
+
     def testSamplePageBraces(self):
         r = self.testApp.get('/PSP/Examples/').click('^PSPTests-Braces$')
         self.assertEqual(r.status, '200 OK')
@@ -0,0 +1,83 @@
+"""Test compression of dynamic responses"""
+
+import unittest
+
+from gzip import decompress
+
+from webob import Request  # pylint: disable=import-error
+from webob.headers import ResponseHeaders  # pylint: disable=import-error
+
+from .AppTest import AppTest
+
+from ResponseCompression import contentCodings, matchesMimeType
+
+
+class TestMatchesMimeType(unittest.TestCase):
+
+    def testDefaultTypes(self):
+        self.assertTrue(matchesMimeType('text/html', None))
+        self.assertTrue(matchesMimeType('application/json', None))
+        self.assertFalse(matchesMimeType('image/png', None))
+
+    def testPatterns(self):
+        patterns = ['text/*', 'application/*+json']
+        self.assertTrue(matchesMimeType('text/plain', patterns))
+        self.assertTrue(matchesMimeType('application/ld+json', patterns))
+        self.assertFalse(matchesMimeType('application/json', patterns))
+        self.assertFalse(matchesMimeType('text/html', []))
+
+
+class TestResponseCompression(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'ResponseCompression': True,
+        'ResponseCompressionMinSize': 2048}
+
+    def setUp(self):
+        AppTest.setUp(self)
+        self.testApp.reset()
+
+    def call(self, url, acceptEncoding):
+        # bypass WebTest here since it decodes compressed content
+        status, headers, body = Request.blank(
+            url, headers={'Accept-Encoding': acceptEncoding}
+        ).call_application(self.app)
+        return status, ResponseHeaders(headers), b''.join(body)
+
+    def testUncompressed(self):
+        r = self.testApp.get('/')
+        self.assertEqual(r.status, '200 OK')
+        self.assertIsNone(r.headers.get('Content-Encoding'))
+        self.assertEqual(r.headers.get('Vary'), 'Accept-Encoding')
+        self.assertTrue(r.text.startswith('<!DOCTYPE html>'))
+
+    def testCompressed(self):
+        page = self.testApp.get('/').body
+        self.assertGreater(len(page), 2048)
+        status, headers, body = self.call('/', 'gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(headers.get('Vary'), 'Accept-Encoding')
+        self.assertEqual(headers.get('Content-Length'), str(len(body)))
+        self.assertLess(len(body), len(page) // 2)
+        self.assertEqual(decompress(body), page)
+
+    def testPreferredCoding(self):
+        headers = self.call('/', 'br, gzip')[1]
+        self.assertEqual(headers.get('Content-Encoding'), contentCodings[0])
+        headers = self.call('/', 'deflate')[1]
+        self.assertIsNone(headers.get('Content-Encoding'))
+
+    def testSmallResponseIsNotCompressed(self):
+        status, headers, body = self.call('/Examples/Simple', 'gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertLess(len(body), 2048)
+        self.assertIsNone(headers.get('Content-Encoding'))
+        self.assertEqual(headers.get('Vary'), 'Accept-Encoding')
+
+    def testImageIsNotCompressed(self):
+        status, headers, body = self.call('/PSP/Examples/psplogo.png', 'gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertIsNone(headers.get('Content-Encoding'))
+        self.assertIsNone(headers.get('Vary'))
+        self.assertEqual(headers.get('Content-Length'), str(len(body)))
@@ -0,0 +1,168 @@
+"""Test Webware servlet factories"""
+
+import os
+import unittest
+
+from threading import Barrier, Thread
+
+from webob import Request  # pylint: disable=import-error
+
+from URLParser import ServletFactoryManager
+
+from .AppTest import AppTest
+
+
+class TestServletClassCheck(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'CacheServletClasses': True,
+        'ServletClassCheckInterval': 0}
+
+    reloadExpected = True
+
+    def setUp(self):
+        super().setUp()
+        self.factory = ServletFactoryManager.factoryForFile('Servlet.py')
+        self.factory.flushCache()
+
+    def getRecord(self):
+        self.testApp.get('/Testing/Servlet').mustcontain('Servlet')
+        path = os.path.join('Testing', 'Servlet.py')
+        for key, record in self.factory._classCache.items():
+            if key.endswith(path):
+                return record
+        self.fail('Servlet class has not been cached')
+
+    def testServletClassCheck(self):
+        record = self.getRecord()
+        cls = record['class']
+        record['mtime'] -= 1
+        record = self.getRecord()
+        self.assertIs(record['class'] is not cls, self.reloadExpected)
+
+
+class TestServletClassCheckInterval(TestServletClassCheck):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'CacheServletClasses': True,
+        'ServletClassCheckInterval': 3600}
+
+    reloadExpected = False
+
+    def testServletClassCheckAfterInterval(self):
+        record = self.getRecord()
+        cls = record['class']
+        record['mtime'] -= 1
+        record['checked'] -= 3600
+        record = self.getRecord()
+        self.assertIsNot(record['class'], cls)
+
+
+class TestFrozenServletClasses(TestServletClassCheck):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'CacheServletClasses': True,
+        'ServletClassCheckInterval': None}
+
+    reloadExpected = False
+
+
+class TestServletClassCheckWithoutReloader(TestServletClassCheck):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'CacheServletClasses': True,
+        'ServletClassCheckInterval': 'Reloader'}
+
+    reloadExpected = True
+
+
+class TestServletPool(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'CacheServletClasses': True,
+        'CacheServletInstances': True,
+        'MaxServletPoolSize': 1, 'ServletPoolPrewarm': 2}
+
+    def testServletPool(self):
+        factory = ServletFactoryManager.factoryForFile('Servlet.py')
+        stats = factory.poolStats()
+        self.assertEqual(stats['hits'], 0)
+        self.assertEqual(stats['misses'], 0)
+        self.assertIsNone(stats['hitRate'])
+        self.testApp.get('/Testing/Servlet').mustcontain('Servlet')
+        stats = factory.poolStats()
+        self.assertEqual(stats['hits'], 0)
+        self.assertEqual(stats['misses'], 1)
+        # the servlet was evicted since the pool was already prewarmed
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['free'], 1)
+        self.testApp.get('/Testing/Servlet').mustcontain('Servlet')
+        stats = factory.poolStats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['free'], 1)
+        self.assertEqual(stats['hitRate'], 0.5)
+
+
+class TestServletPoolConcurrency(AppTest, unittest.TestCase):
+
+    settings = TestServletPool.settings
+
+    def testConcurrentRequests(self):
+        factory = ServletFactoryManager.factoryForFile('Servlet.py')
+        start = Barrier(8)
+        statuses = []
+
+        def request():
+            start.wait()
+            statuses.append(Request.blank(
+                '/Testing/Servlet').call_application(self.app)[0])
+
+        threads = [Thread(target=request) for _count in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, ['200 OK'] * 8)
+        stats = factory.poolStats()
+        # the pool size limit is never exceeded
+        self.assertEqual(stats['free'], 1)
+        self.assertEqual(stats['hits'] + stats['misses'], 8)
+
+
+class TestPSPCompileAll(AppTest, unittest.TestCase):
+
+    settings = {'PrintConfigAtStartUp': False, 'ClearPSPCacheOnStart': True}
+
+    def testCompileAll(self):
+        factory = ServletFactoryManager.factoryForFile('index.psp')
+        factory.flushCache()
+        compiled, upToDate = factory.compileAll()
+        self.assertGreater(compiled, 1)
+        self.assertEqual(upToDate, 0)
+        cacheDir = factory._cacheDir
+        classFiles = [name for name in os.listdir(cacheDir)
+                      if name.endswith('.py')]
+        self.assertEqual(len(classFiles), compiled)
+        self.assertEqual(
+            len(os.listdir(os.path.join(cacheDir, '__pycache__'))), compiled)
+        self.assertEqual(factory.compileAll(), (0, compiled))
+        self.assertEqual(factory.compileAll(force=True), (compiled, 0))
+        # the pages must be served without compiling them again
+        factory._compiledTimes = None
+        compileFile = factory.compileFile
+        compiledFiles = []
+
+        def checkedCompileFile(path, *args, **kwargs):
+            result = compileFile(path, *args, **kwargs)
+            if result[2]:
+                compiledFiles.append(path)
+            return result
+
+        factory.compileFile = checkedCompileFile
+        try:
+            self.testApp.get('/PSP/Examples/').mustcontain('Hello from PSP!')
+        finally:
+            del factory.compileFile
+        self.assertEqual(compiledFiles, [])
@@ -0,0 +1,50 @@
+"""Test serializing concurrent requests on the same session"""
+
+import unittest
+
+from re import compile as reCompile
+from threading import Thread
+
+from webob import Request  # pylint: disable=import-error
+
+from .AppTest import AppTest
+
+countPattern = reCompile(rb'&nbsp;(\d+)&nbsp;')
+
+
+class TestSessionLocking(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False,
+        'SessionStore': 'File', 'SessionLocking': True}
+
+    def count(self, body):
+        return int(countPattern.search(body).group(1))
+
+    def testConcurrentRequests(self):
+        r = self.testApp.get('/CountVisits')
+        self.assertEqual(self.count(r.body), 1)
+        cookie = r.headers['Set-Cookie'].partition(';')[0]
+        counts = []
+
+        def visit():
+            request = Request.blank(
+                '/CountVisits', headers={'Cookie': cookie})
+            counts.append(self.count(request.get_response(self.app).body))
+
+        threads = [Thread(target=visit) for _n in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(counts), list(range(2, 12)))
+        r = self.testApp.get('/CountVisits')
+        self.assertEqual(self.count(r.body), 12)
+        self.assertEqual(self.app.sessions()._locks, {})
+
+    def testInvalidSession(self):
+        self.testApp.reset()
+        self.testApp.set_cookie('_SID_', 'invalid')
+        r = self.testApp.get('/CountVisits')
+        self.assertEqual(self.count(r.body), 1)
+        self.assertEqual(self.app.sessions()._locks, {})
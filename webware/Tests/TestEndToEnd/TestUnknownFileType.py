@@ -0,0 +1,323 @@
+"""Test serving static files with conditional and range requests"""
+
+import os
+import time
+import unittest
+
+from gzip import decompress
+
+from webob import Request  # pylint: disable=import-error
+from webob.headers import ResponseHeaders  # pylint: disable=import-error
+
+from .AppTest import AppTest
+
+from UnknownFileTypeServlet import (
+    FileCache, byteRanges, compressedVariants, fileCache, isCompressible,
+    matchesTag, preferredEncoding)
+
+
+class TestFileCache(unittest.TestCase):
+
+    @staticmethod
+    def fileDict(name, size, etag='"1"', variants=None):
+        fileDict = {'content': b'x' * size, 'filename': name, 'etag': etag}
+        if variants:
+            fileDict['variants'] = variants
+        return fileDict
+
+    def testGetAndAdd(self):
+        cache = FileCache()
+        self.assertIsNone(cache.get('a'))
+        fileDict = self.fileDict('a', 10)
+        cache.add('a', fileDict)
+        self.assertIn('a', cache)
+        self.assertEqual(len(cache), 1)
+        self.assertIs(cache.get('a'), fileDict)
+        self.assertIs(cache.get('a', '"1"'), fileDict)
+        stats = cache.stats()
+        self.assertEqual(stats['files'], 1)
+        self.assertEqual(stats['size'], 10)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+    def testChangedFile(self):
+        cache = FileCache()
+        cache.add('a', self.fileDict('a', 10))
+        self.assertIsNone(cache.get('a', '"2"'))
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def testSizeLimit(self):
+        cache = FileCache(maxSize=100)
+        cache.add('a', self.fileDict('a', 40))
+        cache.add('b', self.fileDict('b', 40))
+        self.assertIsNotNone(cache.get('a'))
+        cache.add('c', self.fileDict('c', 40))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 80)
+        self.assertEqual(stats['evictions'], 1)
+        cache.add('d', self.fileDict('d', 101))
+        self.assertNotIn('d', cache)
+        self.assertEqual(cache.stats()['size'], 80)
+        cache.configure(maxSize=50)
+        self.assertEqual(len(cache), 1)
+        self.assertIn('c', cache)
+
+    def testVariantsAreCounted(self):
+        cache = FileCache(maxSize=100)
+        cache.add('a', self.fileDict('a', 40, variants={'gzip': b'x' * 20}))
+        self.assertEqual(cache.stats()['size'], 60)
+        cache.add('a', self.fileDict('a', 40))
+        self.assertEqual(cache.stats()['size'], 40)
+        cache.remove('a')
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def testTimeToLive(self):
+        cache = FileCache(ttl=0.05)
+        cache.add('a', self.fileDict('a', 10))
+        self.assertIsNotNone(cache.get('a'))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def testClear(self):
+        cache = FileCache()
+        cache.add('a', self.fileDict('a', 10))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class TestCompression(unittest.TestCase):
+
+    def testIsCompressible(self):
+        for mimeType in ('text/html', 'text/css', 'application/javascript',
+                         'application/json', 'image/svg+xml'):
+            self.assertTrue(isCompressible(mimeType), mimeType)
+        for mimeType in ('image/png', 'application/zip', 'video/mp4'):
+            self.assertFalse(isCompressible(mimeType), mimeType)
+
+    def testCompressedVariants(self):
+        content = b'Hello, World! ' * 100
+        variants = compressedVariants(content)
+        self.assertIn('gzip', variants)
+        self.assertEqual(decompress(variants['gzip']), content)
+        self.assertEqual(compressedVariants(os.urandom(100)), {})
+
+    def testPreferredEncoding(self):
+        codings = ['br', 'gzip']
+        self.assertEqual(preferredEncoding('gzip, deflate, br', codings), 'br')
+        self.assertEqual(preferredEncoding('gzip', codings), 'gzip')
+        self.assertEqual(preferredEncoding('br;q=0, gzip', codings), 'gzip')
+        self.assertEqual(preferredEncoding('*', codings), 'br')
+        self.assertEqual(preferredEncoding('*;q=0', codings), None)
+        self.assertEqual(preferredEncoding('deflate', codings), None)
+        self.assertEqual(preferredEncoding('', codings), None)
+        self.assertEqual(preferredEncoding('gzip', []), None)
+
+
+class TestByteRanges(unittest.TestCase):
+
+    def testSingleRanges(self):
+        self.assertEqual(byteRanges('bytes=0-9', 100), [(0, 9)])
+        self.assertEqual(byteRanges('bytes=90-', 100), [(90, 99)])
+        self.assertEqual(byteRanges('bytes=90-200', 100), [(90, 99)])
+        self.assertEqual(byteRanges('bytes=-10', 100), [(90, 99)])
+        self.assertEqual(byteRanges('bytes=-200', 100), [(0, 99)])
+
+    def testMultipleRanges(self):
+        self.assertEqual(
+            byteRanges('bytes=0-9, 20-29,-5', 100),
+            [(0, 9), (20, 29), (95, 99)])
+        self.assertEqual(byteRanges('bytes=0-1,200-300', 100), [(0, 1)])
+        self.assertIsNone(byteRanges(
+            'bytes=' + ','.join(f'{n}-{n}' for n in range(20)), 100))
+
+    def testUnsatisfiableRanges(self):
+        self.assertEqual(byteRanges('bytes=100-', 100), [])
+        self.assertEqual(byteRanges('bytes=200-300', 100), [])
+        self.assertEqual(byteRanges('bytes=-0', 100), [])
+
+    def testInvalidRanges(self):
+        for header in ('bytes', 'bytes=', 'bytes=a-b', 'bytes=9-1',
+                       'bytes=1', 'items=0-1', 'bytes=--1'):
+            self.assertIsNone(byteRanges(header, 100), header)
+
+    def testMatchesTag(self):
+        self.assertTrue(matchesTag('"abc"', '"abc"'))
+        self.assertTrue(matchesTag('W/"abc"', '"abc"'))
+        self.assertTrue(matchesTag('"xyz", "abc"', '"abc"'))
+        self.assertTrue(matchesTag('*', '"abc"'))
+        self.assertFalse(matchesTag('"xyz"', '"abc"'))
+        self.assertFalse(matchesTag('abc', '"abc"'))
+
+
+class TestUnknownFileType(AppTest, unittest.TestCase):
+
+    settings = {'PrintConfigAtStartUp': False}
+
+    url = '/PSP/Examples/psplogo.png'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        path = os.path.join(
+            os.path.dirname(__file__), '..', '..', 'PSP', 'Examples',
+            'psplogo.png')
+        with open(path, 'rb') as f:
+            cls.content = f.read()
+
+    def testFullContent(self):
+        r = self.testApp.get(self.url)
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.headers.get('Accept-Ranges'), 'bytes')
+        etag = r.headers.get('ETag')
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertEqual(r.body, self.content)
+        r = self.testApp.head(self.url)
+        self.assertEqual(r.headers.get('ETag'), etag)
+        self.assertEqual(
+            r.headers.get('Content-Length'), str(len(self.content)))
+
+    def testIfNoneMatch(self):
+        etag = self.testApp.get(self.url).headers.get('ETag')
+        r = self.testApp.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(r.status, '304 Not Modified')
+        self.assertEqual(r.headers.get('ETag'), etag)
+        self.assertNotIn('Content-Type', r.headers)
+        self.assertEqual(len(r.body), 0)
+        r = self.testApp.get(self.url, headers={
+            'If-None-Match': f'"other", W/{etag}'})
+        self.assertEqual(r.status, '304 Not Modified')
+        r = self.testApp.get(self.url, headers={'If-None-Match': '"other"'})
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.body, self.content)
+
+    def testIfNoneMatchBeforeIfModifiedSince(self):
+        r = self.testApp.get(self.url)
+        lastMod = r.headers.get('Last-Modified')
+        r = self.testApp.get(self.url, headers={
+            'If-Modified-Since': lastMod, 'If-None-Match': '"other"'})
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.body, self.content)
+
+    def testSingleRange(self):
+        size = len(self.content)
+        r = self.testApp.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(r.status, '206 Partial Content')
+        self.assertEqual(r.headers.get('Content-Range'), f'bytes 10-19/{size}')
+        self.assertEqual(r.headers.get('Content-Length'), '10')
+        self.assertEqual(r.content_type, 'image/png')
+        self.assertEqual(r.body, self.content[10:20])
+        r = self.testApp.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(r.status, '206 Partial Content')
+        self.assertEqual(r.body, self.content[-5:])
+
+    def testMultipleRanges(self):
+        size = len(self.content)
+        r = self.testApp.get(self.url, headers={'Range': 'bytes=0-3,-4'})
+        self.assertEqual(r.status, '206 Partial Content')
+        self.assertEqual(r.content_type, 'multipart/byteranges')
+        boundary = r.headers['Content-Type'].partition('boundary=')[2]
+        self.assertTrue(boundary)
+        self.assertEqual(r.headers.get('Content-Length'), str(len(r.body)))
+        self.assertEqual(r.body, (
+            f'--{boundary}\r\nContent-Type: image/png\r\n'
+            f'Content-Range: bytes 0-3/{size}\r\n\r\n'.encode()
+            + self.content[:4] +
+            f'\r\n--{boundary}\r\nContent-Type: image/png\r\n'
+            f'Content-Range: bytes {size - 4}-{size - 1}/{size}'
+            '\r\n\r\n'.encode() + self.content[-4:] +
+            f'\r\n--{boundary}--\r\n'.encode()))
+
+    def testUnsatisfiableRange(self):
+        size = len(self.content)
+        r = self.testApp.get(
+            self.url, headers={'Range': f'bytes={size}-'}, status=416)
+        self.assertEqual(r.status, '416 Range Not Satisfiable')
+        self.assertEqual(r.headers.get('Content-Range'), f'bytes */{size}')
+        self.assertEqual(len(r.body), 0)
+
+    def testInvalidRangeIsIgnored(self):
+        r = self.testApp.get(self.url, headers={'Range': 'bytes=x-y'})
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.body, self.content)
+
+    def testIfRange(self):
+        r = self.testApp.get(self.url)
+        etag, lastMod = r.headers.get('ETag'), r.headers.get('Last-Modified')
+        for ifRange in (etag, lastMod):
+            r = self.testApp.get(self.url, headers={
+                'Range': 'bytes=0-9', 'If-Range': ifRange})
+            self.assertEqual(r.status, '206 Partial Content')
+            self.assertEqual(r.body, self.content[:10])
+        r = self.testApp.get(self.url, headers={
+            'Range': 'bytes=0-9', 'If-Range': '"other"'})
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.body, self.content)
+
+
+class TestUnknownFileTypeCached(TestUnknownFileType):
+
+    settings = {
+        'PrintConfigAtStartUp': False,
+        'UnknownFileTypes': {
+            'ReuseServlets': True, 'Technique': 'serveContent',
+            'CacheContent': True, 'MaxCacheContentSize': 128 * 1024,
+            'ReadBufferSize': 32 * 1024, 'StreamContent': True}}
+
+    def testCacheIsConfiguredOnce(self):
+        self.assertEqual(fileCache.stats()['maxSize'], 16 * 1024 * 1024)
+        configure = fileCache.configure
+        calls = []
+        fileCache.configure = lambda *args: calls.append(args)
+        try:
+            r = self.testApp.get('/Examples/ajaxsuggest.css')
+        finally:
+            fileCache.configure = configure
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(calls, [])
+
+    def testCompressedContent(self):
+        url = '/Examples/ajaxsuggest.css'
+        r = self.testApp.get(url)
+        self.assertEqual(r.status, '200 OK')
+        self.assertEqual(r.headers.get('Vary'), 'Accept-Encoding')
+        self.assertNotIn('Content-Encoding', r.headers)
+        content, etag = r.body, r.headers.get('ETag')
+        # bypass WebTest here since it decodes compressed content
+        status, headers, body = Request.blank(
+            url, headers={'Accept-Encoding': 'gzip'}).call_application(
+                self.app)
+        body = b''.join(body)
+        self.assertEqual(status, '200 OK')
+        headers = ResponseHeaders(headers)
+        self.assertEqual(headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(headers.get('Vary'), 'Accept-Encoding')
+        self.assertEqual(headers.get('Content-Type'), 'text/css')
+        self.assertEqual(headers.get('Content-Length'), str(len(body)))
+        self.assertLess(len(body), len(content))
+        self.assertEqual(decompress(body), content)
+        gzipEtag = headers.get('ETag')
+        self.assertEqual(gzipEtag, etag[:-1] + '-gzip"')
+        r = self.testApp.get(url, headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': gzipEtag})
+        self.assertEqual(r.status, '304 Not Modified')
+        r = self.testApp.get(url, headers={
+            'Accept-Encoding': 'gzip', 'Range': 'bytes=0-9'})
+        self.assertEqual(r.status, '206 Partial Content')
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertEqual(r.body, content[:10])
+
+
+class TestUnknownFileTypeNotStreamed(TestUnknownFileType):
+
+    settings = {
+        'PrintConfigAtStartUp': False,
+        'UnknownFileTypes': {
+            'ReuseServlets': True, 'Technique': 'serveContent',
+            'CacheContent': False, 'MaxCacheContentSize': 128 * 1024,
+            'ReadBufferSize': 7, 'StreamContent': False}}
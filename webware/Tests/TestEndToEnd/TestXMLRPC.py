@@ -0,0 +1,199 @@
+"""Test XML-RPC requests with the XMLRPCServlet"""
+
+import gzip
+import tracemalloc
+import unittest
+import zlib
+
+from xmlrpc.client import Fault, dumps, loads
+
+from webob import Request  # pylint: disable=import-error
+from webob.headers import ResponseHeaders  # pylint: disable=import-error
+
+from HTTPExceptions import HTTPRequestEntityTooLarge
+from XMLRPCServlet import XMLRPCServlet, _knownEncoding
+
+from .AppTest import AppTest
+
+
+class TestXMLRPC(AppTest, unittest.TestCase):
+
+    settings = {
+        'PrintConfigAtStartUp': False, 'ReportRPCExceptionsInWebware': False,
+        'RPCExceptionReturn': 'exception', 'MaxUploadSize': 100000}
+
+    streamParse = True
+
+    def setUp(self):
+        AppTest.setUp(self)
+        self.streamParseBefore = XMLRPCServlet.stream_parse
+        XMLRPCServlet.stream_parse = self.streamParse
+
+    def tearDown(self):
+        XMLRPCServlet.stream_parse = self.streamParseBefore
+        AppTest.tearDown(self)
+
+    def request(self, body, encoding=None, acceptEncoding=None,
+                withLength=True, terminated=False):
+        headers = {}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if acceptEncoding:
+            headers['Accept-Encoding'] = acceptEncoding
+        request = Request.blank(
+            '/Testing/XMLRPCTest', method='POST', body=body,
+            content_type='text/xml', headers=headers)
+        if not withLength:
+            del request.environ['CONTENT_LENGTH']
+        if terminated:
+            request.environ['wsgi.input_terminated'] = True
+        status, headers, output = request.call_application(self.app)
+        return status, ResponseHeaders(headers), b''.join(output)
+
+    def call(self, method, *params, encoding='utf-8'):
+        status, headers, output = self.request(
+            dumps(params, method, encoding=encoding,
+                  allow_none=True).encode(encoding))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Type'], 'text/xml')
+        self.assertEqual(int(headers['Content-Length']), len(output))
+        return loads(output)[0][0]
+
+    def testCall(self):
+        self.assertEqual(self.call('echo', 'Hello'), 'Hello')
+        self.assertEqual(self.call('echo', [1, 2.5, None]), [1, 2.5, None])
+
+    def testNonAsciiCall(self):
+        self.assertEqual(self.call('echo', 'Grüße'), 'Grüße')
+        self.assertEqual(
+            self.call('echo', 'Grüße', encoding='iso-8859-1'), 'Grüße')
+
+    def testFaults(self):
+        with self.assertRaises(Fault) as cm:
+            self.call('fault')
+        self.assertEqual(cm.exception.faultCode, 42)
+        self.assertEqual(cm.exception.faultString, 'custom fault')
+        with self.assertRaises(Fault) as cm:
+            self.call('fail')
+        self.assertEqual(cm.exception.faultCode, 1)
+        self.assertEqual(cm.exception.faultString, 'failed')
+        with self.assertRaises(Fault) as cm:
+            self.call('invalid')
+        self.assertEqual(cm.exception.faultString, 'invalid')
+
+    def testMulticall(self):
+        self.assertEqual(self.call('system.multicall', [
+            {'methodName': 'echo', 'params': ['foo']},
+            {'methodName': 'fail', 'params': []},
+            {'methodName': 'echo', 'params': [[1, 2]]},
+            {'methodName': 'fault', 'params': []},
+            {'methodName': 'invalid', 'params': []},
+            {'methodName': 'system.multicall', 'params': [[]]},
+            {'params': []},
+            {'methodName': 'echo', 'params': ['bar']}]), [
+            ['foo'],
+            {'faultCode': 1, 'faultString': 'failed'},
+            [[1, 2]],
+            {'faultCode': 42, 'faultString': 'custom fault'},
+            {'faultCode': 1, 'faultString': 'invalid'},
+            {'faultCode': 1,
+             'faultString': 'Recursive system.multicall is not allowed'},
+            {'faultCode': 1,
+             'faultString': 'Invalid call in system.multicall'},
+            ['bar']])
+
+    def testCompressedRequest(self):
+        body = dumps(('x' * 5000,), 'echo').encode()
+        for encoding, data in (('gzip', gzip.compress(body)),
+                               ('deflate', zlib.compress(body))):
+            status, headers, output = self.request(data, encoding)
+            self.assertEqual(status, '200 OK')
+            self.assertNotIn('Content-Encoding', headers)
+            self.assertEqual(loads(output)[0][0], 'x' * 5000)
+
+    def testCompressedResponse(self):
+        body = dumps(('x' * 5000,), 'echo').encode()
+        status, headers, output = self.request(body, acceptEncoding='gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(headers['Content-Length']), len(output))
+        self.assertLess(len(output), 1000)
+        self.assertEqual(loads(gzip.decompress(output))[0][0], 'x' * 5000)
+        body = dumps(('x' * 50,), 'echo').encode()
+        status, headers, output = self.request(body, acceptEncoding='gzip')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(loads(output)[0][0], 'x' * 50)
+
+    def testBadRequests(self):
+        body = dumps(('foo',), 'echo').encode()
+        status = self.request(body, 'compress')[0]
+        self.assertEqual(status, '415 Unsupported Media Type')
+        status = self.request(body, 'gzip')[0]
+        self.assertEqual(status, '400 Bad Request')
+        status = self.request(gzip.compress(body)[:-20], 'gzip')[0]
+        self.assertEqual(status, '400 Bad Request')
+        body = dumps(('x' * 200000,), 'echo').encode()
+        status = self.request(gzip.compress(body), 'gzip')[0]
+        self.assertEqual(status, '413 Request Entity Too Large')
+
+    def testMissingContentLength(self):
+        body = dumps(('foo',), 'echo').encode()
+        status = self.request(body, withLength=False)[0]
+        self.assertEqual(status, '411 Length Required')
+        status, _headers, output = self.request(
+            body, withLength=False, terminated=True)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(loads(output)[0][0], 'foo')
+
+    def testUnknownEncoding(self):
+        body = dumps(('foo',), 'echo', encoding='x-unknown').encode()
+        status = self.request(body)[0]
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(_knownEncoding('x-unknown'), 'utf-8')
+        self.assertEqual(_knownEncoding('latin-1'), 'latin-1')
+        self.assertIsNone(_knownEncoding(None))
+
+    def testCompressionBomb(self):
+        body = gzip.compress(b'0' * 50_000_000, 1)
+        self.assertLess(len(body), 250_000)
+        tracemalloc.start()
+        try:
+            status = self.request(body, 'gzip')[0]
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertLess(peak, 5_000_000)
+
+    def testDecompress(self):
+        data = zlib.compress(b'x' * 1000)
+        decompress = XMLRPCServlet.decompress
+        self.assertEqual(
+            decompress(zlib.decompressobj(), data, 1000), b'x' * 1000)
+        with self.assertRaises(HTTPRequestEntityTooLarge):
+            decompress(zlib.decompressobj(), data, 999)
+        with self.assertRaises(HTTPRequestEntityTooLarge):
+            decompress(zlib.decompressobj(), data, 0)
+        self.assertEqual(
+            decompress(zlib.decompressobj(), data), b'x' * 1000)
+
+
+class TestXMLRPCWithoutStreamParse(TestXMLRPC):
+
+    streamParse = False
+
+
+class TestXMLRPCExample(AppTest, unittest.TestCase):
+
+    def testExample(self):
+        body = dumps((10, 20), 'multiply')
+        r = self.testApp.post('/XMLRPCExample', body, content_type='text/xml')
+        self.assertEqual(loads(r.body)[0][0], 200)
+        body = dumps(([{'methodName': 'add', 'params': [10, 20]},
+                       {'methodName': 'divide', 'params': [10, 20]}],),
+                     'system.multicall')
+        r = self.testApp.post('/XMLRPCExample', body, content_type='text/xml')
+        result = loads(r.body)[0][0]
+        self.assertEqual(result[0], [30])
+        self.assertEqual(result[1]['faultCode'], 1)
+        self.assertIn('NotImplementedError: divide', result[1]['faultString'])
@@ -0,0 +1,188 @@
+"""Test lazy parsing of HTTP requests"""
+
+import unittest
+
+from io import BytesIO
+from time import time
+
+from HTTPExceptions import HTTPRequestEntityTooLarge
+from HTTPRequest import HTTPRequest
+
+
+def makeRequest(method='GET', query='', body=b'', contentType=None,
+                cookie=None):
+    environ = {
+        'REQUEST_METHOD': method, 'QUERY_STRING': query,
+        'SCRIPT_NAME': '', 'PATH_INFO': '/test'}
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    if contentType:
+        environ['CONTENT_TYPE'] = contentType
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    return HTTPRequest({
+        'format': 'CGI', 'time': time(), 'environ': environ,
+        'input': BytesIO(body), 'requestID': 1})
+
+
+class TestHTTPRequest(unittest.TestCase):
+
+    def makeRequest(self, *args, **kwargs):
+        """Make a request which is cleared at the end of the test."""
+        request = makeRequest(*args, **kwargs)
+        self.addCleanup(request.clearTransaction)
+        return request
+
+    def testNothingParsedInitially(self):
+        request = makeRequest(query='a=1', cookie='b=2')
+        self.assertIsNone(request._fieldStorage)
+        self.assertIsNone(request._fields)
+        self.assertIsNone(request._cookies)
+        self.assertEqual(request.uri(), '/test?a=1')
+
+    def testQueryFields(self):
+        request = makeRequest(query='a=1&b=2&b=3&c=')
+        self.assertEqual(request.field('a'), '1')
+        self.assertEqual(
+            request.fields(), {'a': '1', 'b': ['2', '3'], 'c': ''})
+        self.assertTrue(request.hasField('c'))
+        self.assertFalse(request.hasField('d'))
+        self.assertEqual(request.field('d', None), None)
+        self.assertRaises(KeyError, request.field, 'd')
+        self.assertIsNotNone(request.fieldStorage())
+
+    def testSetAndDelField(self):
+        request = makeRequest()
+        request.setField('a', '1')
+        self.assertEqual(request.field('a'), '1')
+        request.delField('a')
+        self.assertFalse(request.hasField('a'))
+
+    def testFormPost(self):
+        request = makeRequest(
+            'POST', body=b'a=1&b=x+y',
+            contentType='application/x-www-form-urlencoded')
+        self.assertEqual(request.fields(), {'a': '1', 'b': 'x y'})
+
+    def testMultipartUpload(self):
+        body = (
+            b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="a"\r\n\r\n'
+            b'1\r\n'
+            b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="f"; filename="f.txt"\r\n'
+            b'Content-Type: text/plain\r\n\r\n'
+            b'file content\r\n'
+            b'--boundary--\r\n')
+        request = makeRequest(
+            'POST', body=body,
+            contentType='multipart/form-data; boundary=boundary')
+        self.assertEqual(request.field('a'), '1')
+        upload = request.field('f')
+        self.assertEqual(upload.filename, 'f.txt')
+        self.assertEqual(upload.value, b'file content')
+
+    def testUploadLimits(self):
+        body = (
+            b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="f"; filename="f.txt"\r\n'
+            b'\r\n' + b'x' * 100 + b'\r\n'
+            b'--boundary--\r\n')
+        contentType = 'multipart/form-data; boundary=boundary'
+        request = makeRequest('POST', body=body, contentType=contentType)
+        request.setUploadLimits(len(body), 100)
+        self.assertEqual(request.field('f').value, b'x' * 100)
+        request = makeRequest('POST', body=body, contentType=contentType)
+        request.setUploadLimits(maxPartSize=99)
+        self.assertRaises(HTTPRequestEntityTooLarge, request.fields)
+        request = makeRequest('POST', body=body, contentType=contentType)
+        request.setUploadLimits(maxSize=len(body) - 1)
+        self.assertRaises(HTTPRequestEntityTooLarge, request.fields)
+
+    def testUploadHandler(self):
+        body = (
+            b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="f"; filename="f.txt"\r\n'
+            b'\r\nfile content\r\n'
+            b'--boundary--\r\n')
+        request = makeRequest(
+            'POST', body=body,
+            contentType='multipart/form-data; boundary=boundary')
+        sink = BytesIO()
+        request.setUploadHandler(lambda field: sink)
+        self.assertIs(request.field('f').file, sink)
+        self.assertEqual(sink.getvalue(), b'file content')
+
+    def testRawInputIsNotParsed(self):
+        body = b'{"method": "test", "params": []}'
+        request = self.makeRequest(
+            'POST', body=body, contentType='application/json')
+        rawInput = request.rawInput()
+        self.assertEqual(rawInput.read(), body)
+        self.assertIsNone(request._fieldStorage)
+
+    def testRawInputRewind(self):
+        body = b'{"method": "test", "params": []}'
+        request = self.makeRequest(
+            'POST', body=body, contentType='application/json')
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+        self.assertEqual(request.rawInput().read(), b'')
+        self.assertEqual(request.fields(), {})
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+
+    def testRawInputBeforeFieldAccess(self):
+        body = b'a=1&b=x+y'
+        request = self.makeRequest(
+            'POST', body=body,
+            contentType='application/x-www-form-urlencoded')
+        self.assertEqual(request.rawInput().read(), body)
+        self.assertEqual(request.fields(), {'a': '1', 'b': 'x y'})
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+
+    def testRawInputAfterFieldAccess(self):
+        body = '<?xml version="1.0"?><methodCall>Grüße</methodCall>'.encode()
+        request = self.makeRequest('POST', body=body, contentType='text/xml')
+        self.assertEqual(request.fields(), {})
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+        self.assertEqual(request.rawInput(rewind=True).read(), body)
+
+    def testRawInputIsLimitedByContentLength(self):
+        request = self.makeRequest(
+            'POST', body=b'body', contentType='application/json')
+        request._input = BytesIO(b'body and more')
+        self.assertEqual(request.rawInput().read(), b'body')
+        request = self.makeRequest('POST', contentType='application/json')
+        request._input = BytesIO(b'not announced')
+        self.assertEqual(request.rawInput().read(), b'')
+
+    def testRawInputUploadLimit(self):
+        request = self.makeRequest(
+            'POST', body=b'x' * 100, contentType='application/json')
+        request.setUploadLimits(maxSize=99)
+        self.assertRaises(HTTPRequestEntityTooLarge, request.rawInput)
+
+    def testLargeRawInputIsSpooled(self):
+        body = b'x' * 1000
+        request = self.makeRequest(
+            'POST', body=body, contentType='application/octet-stream')
+        request.rawInputMemorySize = 100
+        rawInput = request.rawInput()
+        self.assertTrue(rawInput._rolled)
+        self.assertEqual(rawInput.read(), body)
+
+    def testCookies(self):
+        request = makeRequest(cookie='a=1; b=2; a=3')
+        self.assertEqual(request.cookie('a'), '1')
+        self.assertEqual(request.cookies(), {'a': '1', 'b': '2'})
+        self.assertTrue(request.hasCookie('b'))
+        self.assertFalse(request.hasCookie('c'))
+        self.assertIsNone(request._fields)
+
+    def testValues(self):
+        request = makeRequest(query='a=1', cookie='a=2; b=3')
+        self.assertEqual(request.value('a'), '1')
+        self.assertEqual(request.value('b'), '3')
+        self.assertTrue(request.hasValue('b'))
+        self.assertFalse(request.hasValue('c'))
+        self.assertEqual(request.value('c', None), None)
@@ -0,0 +1,197 @@
+"""Test the push channels"""
+
+import unittest
+
+from contextlib import redirect_stdout
+from io import StringIO
+from threading import Thread, Timer
+from time import sleep, time
+
+from .TestSessions import redis  # mock redis installation
+
+from PushChannel import PushChannel
+from PushRedisChannel import PushRedisChannel
+
+
+class Application:
+    """Mock application with push channel settings."""
+
+    def __init__(self, **settings):
+        self._settings = settings
+
+    def setting(self, key, default=None):
+        return self._settings.get(key, default)
+
+
+class TestPushChannel(unittest.TestCase):
+
+    _channelClass = PushChannel
+
+    def setUp(self):
+        self.channel = self._channelClass(Application(PushMaxMessages=3))
+
+    def tearDown(self):
+        self.channel.close()
+
+    def testPushAndPull(self):
+        channel = self.channel
+        self.assertEqual(channel.pull('a'), [])
+        channel.push('a', 'foo')
+        channel.push('b', 'bar')
+        channel.push('a', 'baz')
+        self.assertEqual(channel.pull('a'), ['foo', 'baz'])
+        self.assertEqual(channel.pull('a'), [])
+        self.assertEqual(channel.pull('b', 1), ['bar'])
+
+    def testMaxMessages(self):
+        channel = self.channel
+        for n in range(5):
+            channel.push('a', str(n))
+        self.assertEqual(channel.pull('a'), ['2', '3', '4'])
+
+    def testMessageTimeout(self):
+        channel = self._channelClass(Application(PushMessageTimeout=0.5))
+        channel.push('a', 'foo')
+        self.assertEqual(channel.pull('a'), ['foo'])
+        channel.push('a', 'bar')
+        sleep(0.6)
+        self.assertEqual(channel.pull('a'), [])
+        channel.close()
+
+    def testDiscard(self):
+        channel = self.channel
+        channel.push('a', 'foo')
+        channel.discard('a')
+        channel.discard('b')
+        self.assertEqual(channel.pull('a'), [])
+
+    def testPullTimesOut(self):
+        start = time()
+        self.assertEqual(self.channel.pull('a', 0.2), [])
+        self.assertGreaterEqual(time() - start, 0.2)
+        self.assertFalse(self.channel._waiters)
+
+    def testPullIsWokenUp(self):
+        channel = self.channel
+        Timer(0.1, channel.push, ('b', 'bar')).start()
+        Timer(0.2, channel.push, ('a', 'foo')).start()
+        start = time()
+        self.assertEqual(channel.pull('a', 5), ['foo'])
+        self.assertLess(time() - start, 2)
+        self.assertEqual(channel.pull('b'), ['bar'])
+
+    def testConcurrentPulls(self):
+        channel = self.channel
+        results = []
+
+        def pull():
+            results.append(channel.pull('a', 5))
+
+        threads = [Thread(target=pull) for _count in range(3)]
+        for thread in threads:
+            thread.start()
+        sleep(0.1)
+        for n in range(3):
+            channel.push('a', str(n))
+            sleep(0.05)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(sorted(sum(results, [])), ['0', '1', '2'])
+
+    def testCloseWakesUpPulls(self):
+        channel = self.channel
+        Timer(0.1, channel.close).start()
+        start = time()
+        self.assertEqual(channel.pull('a', 5), [])
+        self.assertLess(time() - start, 2)
+        self.assertTrue(channel.isClosed())
+
+    def testCleanStale(self):
+        channel = self._channelClass(Application(PushMessageTimeout=0.5))
+        channel.push('a', 'foo')
+        sleep(0.3)
+        channel.push('b', 'bar')
+        sleep(0.3)
+        channel.cleanStale()
+        self.assertEqual(list(channel._queues), ['b'])
+        sleep(0.6)
+        channel.push('c', 'baz')  # cleans stale queues automatically
+        self.assertEqual(list(channel._queues), ['c'])
+        channel.close()
+
+
+class TestPushRedisChannel(TestPushChannel):
+
+    _channelClass = PushRedisChannel
+
+    def tearDown(self):
+        TestPushChannel.tearDown(self)
+        redis.data.clear()
+
+    def testCleanStale(self):
+        channel = self.channel
+        channel.push('a', 'foo')
+        channel.cleanStale()  # stale queues are expired by Redis
+        self.assertEqual(channel.pull('a'), ['foo'])
+
+    def testRedisKeys(self):
+        channel = self.channel
+        channel.push('a', 'foo')
+        self.assertEqual(list(redis.data), ['Push:WebwareSession:a'])
+        data = redis.data['Push:WebwareSession:a']
+        self.assertEqual(len(data), 1)
+        self.assertTrue(data[0].endswith(b' foo'))
+        self.assertEqual(channel.pull('a'), ['foo'])
+        self.assertEqual(redis.data, {})
+
+    def testListener(self):
+        channel = self.channel
+        self.assertFalse(redis.subscriptions)
+        self.assertEqual(channel.pull('a', 0.1), [])
+        self.assertEqual(len(redis.subscriptions), 1)
+        self.assertEqual(
+            list(redis.subscriptions[0].patterns), ['Push:WebwareSession:*'])
+        channel.close()
+        self.assertFalse(redis.subscriptions)
+
+    def testListenerIsRestarted(self):
+        channel = self.channel
+        self.assertEqual(channel.pull('a', 0.1), [])
+        listener = channel._listener
+        with redirect_stdout(StringIO()) as output:
+            listener.fail(ConnectionError('lost connection'))
+        self.assertIn('lost connection', output.getvalue())
+        self.assertFalse(listener.is_alive())
+        self.assertIsNone(channel._listener)
+        self.assertFalse(redis.subscriptions)
+        other = PushRedisChannel(Application())
+        Timer(0.1, other.push, ('a', 'foo')).start()
+        start = time()
+        self.assertEqual(channel.pull('a', 5), ['foo'])
+        self.assertLess(time() - start, 2)
+        self.assertIsNot(channel._listener, listener)
+        self.assertEqual(len(redis.subscriptions), 1)
+        other.close()
+
+    def testDeadListenerIsReplaced(self):
+        channel = self.channel
+        channel.listen()
+        listener = channel._listener
+        listener._alive = False
+        channel.listen()
+        self.assertIsNot(channel._listener, listener)
+        self.assertTrue(channel._listener.is_alive())
+        self.assertEqual(len(redis.subscriptions), 1)
+
+    def testPushFromOtherProcess(self):
+        channel = self.channel
+        other = PushRedisChannel(Application())
+        Timer(0.1, other.push, ('a', 'foo')).start()
+        start = time()
+        self.assertEqual(channel.pull('a', 5), ['foo'])
+        self.assertLess(time() - start, 2)
+        other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
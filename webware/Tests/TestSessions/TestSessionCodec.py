@@ -0,0 +1,81 @@
+import unittest
+
+from io import BytesIO
+from pickle import dumps
+
+from SessionCodec import SessionCodec, lz4
+
+from .Session import Session
+
+
+class SessionWithValues(Session):
+    """Mock session with values."""
+
+    def __init__(self, identifier=7, value=None):
+        Session.__init__(self, identifier, value)
+        self._values = {'cart': ['item'] * 1000}
+
+
+class TestSessionCodec(unittest.TestCase):
+
+    def testPickle(self):
+        codec = SessionCodec()
+        self.assertEqual(codec.name(), 'pickle')
+        session = Session(3)
+        data = codec.dumps(session)
+        self.assertEqual(data, dumps(session, -1))
+        self.assertEqual(codec.loads(data).data(), session.data())
+
+    def testDumpAndLoad(self):
+        codec = SessionCodec('zlib', 0)
+        f = BytesIO()
+        codec.dump(Session(3), f)
+        f.seek(0)
+        self.assertEqual(codec.load(f).bar(), 18)
+
+    def testZlib(self):
+        codec = SessionCodec('zlib', 1000)
+        session = Session(3, 'x' * 1000)
+        data = codec.dumps(session)
+        self.assertTrue(data.startswith(SessionCodec.zlibMarker))
+        self.assertLess(len(data), 300)
+        self.assertEqual(codec.loads(data).bar(), 'x' * 1000)
+        # small sessions are not compressed
+        smallSession = Session(3)
+        data = codec.dumps(smallSession)
+        self.assertEqual(data, dumps(smallSession, -1))
+        # sessions can be decoded independently of the setting
+        session = SessionCodec().loads(codec.dumps(session))
+        self.assertEqual(session.bar(), 'x' * 1000)
+        session = codec.loads(dumps(session, -1))
+        self.assertEqual(session.bar(), 'x' * 1000)
+
+    @unittest.skipIf(lz4 is None, 'lz4 not installed')
+    def testLz4(self):
+        codec = SessionCodec('lz4', 1000)
+        data = codec.dumps(Session(3, 'x' * 1000))
+        self.assertTrue(data.startswith(SessionCodec.lz4Marker))
+        self.assertLess(len(data), 300)
+        self.assertEqual(SessionCodec().loads(data).bar(), 'x' * 1000)
+
+    @unittest.skipIf(lz4 is not None, 'lz4 installed')
+    def testLz4NotInstalled(self):
+        self.assertRaises(ImportError, SessionCodec, 'lz4')
+
+    def testUnknownCodec(self):
+        self.assertRaises(ValueError, SessionCodec, 'foo')
+
+    def testWithValues(self):
+        codec = SessionCodec()
+        session = SessionWithValues(3)
+        data, values = codec.dumpsWithValues(session)
+        self.assertEqual(session._values['cart'], ['item'] * 1000)
+        self.assertLess(len(data), len(values))
+        restored = codec.loadsWithValues(data, values)
+        self.assertEqual(restored.bar(), 18)
+        self.assertEqual(restored._values, session._values)
+        # sessions without values
+        data, values = codec.dumpsWithValues(Session(3))
+        self.assertIsNone(values)
+        restored = codec.loadsWithValues(data, codec.dumps(None))
+        self.assertFalse(hasattr(restored, '_values'))
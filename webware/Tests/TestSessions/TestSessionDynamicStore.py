@@ -1,5 +1,10 @@
+from time import time
+
+import SessionDynamicStore as SessionDynamicStoreModule
+
 from SessionDynamicStore import SessionDynamicStore
 
+from .Session import Session
 from .TestSessionMemoryStore import TestSessionMemoryStore
 
 
@@ -18,3 +23,109 @@ class SessionDynamicStoreTest(TestSessionMemoryStore):
         self.assertEqual(len(fileStore), 2)
         self.assertTrue('foo-0' in memoryStore and 'foo-2' in memoryStore)
         self.assertTrue('foo-3' in fileStore and 'foo-4' in fileStore)
+
+    def testAccessOrder(self):
+        store = self._store
+        self.assertEqual(
+            store.memoryKeysInAccessTimeOrder(),
+            [f'foo-{n}' for n in range(6, -1, -1)])
+        store['foo-5']  # pylint: disable=pointless-statement
+        keys = store.memoryKeysInAccessTimeOrder()
+        self.assertEqual(keys[-1], 'foo-5')
+        self.assertEqual(keys[0], 'foo-6')
+
+    def testMoveLeastRecentlyAccessedToFile(self):
+        store = self._store
+        memoryStore = store._memoryStore  # pylint: disable=no-member
+        fileStore = store._fileStore  # pylint: disable=no-member
+        for n in (6, 4, 2):
+            store[f'foo-{n}']  # pylint: disable=pointless-statement
+        store.intervalSweep()
+        # all sessions are new, so only the excess sessions are moved
+        self.assertEqual(sorted(memoryStore.keys()), [
+            'foo-2', 'foo-4', 'foo-6'])
+        self.assertEqual(sorted(fileStore.keys()), [
+            'foo-0', 'foo-1', 'foo-3', 'foo-5'])
+        self.assertEqual(sorted(store._accessTimes), [
+            'foo-2', 'foo-4', 'foo-6'])
+        # sessions are moved back to memory when they are accessed
+        self.assertEqual(store['foo-3'].bar(), 18)
+        self.assertIn('foo-3', memoryStore)
+        self.assertEqual(store.memoryKeysInAccessTimeOrder()[-1], 'foo-3')
+
+    def testMoveIdleSessionsToFile(self):
+        store = self._store
+        memoryStore = store._memoryStore  # pylint: disable=no-member
+        fileStore = store._fileStore  # pylint: disable=no-member
+        for n in range(7):
+            memoryStore[f'foo-{n}']._isNew = False
+        store._maxDynamicMemorySessions = 10
+        # sessions accessed without using the store are not moved
+        memoryStore['foo-3']._lastAccessTime = time()
+        visited = []
+        popLeastRecentlyAccessed = store.popLeastRecentlyAccessed
+
+        def countingPop(count=None, before=None, oneShots=True):
+            entries = popLeastRecentlyAccessed(count, before, oneShots)
+            visited.extend(entries)
+            return entries
+
+        store.popLeastRecentlyAccessed = countingPop
+        store.intervalSweep()
+        self.assertEqual(len(visited), 6)
+        self.assertEqual(memoryStore.keys(), ['foo-0', 'foo-3'])
+        self.assertEqual(len(fileStore), 5)
+        visited.clear()
+        store.intervalSweep()
+        self.assertEqual(visited, [])
+
+    def testOneShotSessionsAreNotVisitedAgain(self):
+        store = self._store
+        memoryStore = store._memoryStore  # pylint: disable=no-member
+        store._maxDynamicMemorySessions = 1000
+        for n in range(100, 400):
+            session = Session(n)
+            session._lastAccessTime = time() - 1000
+            store[session.identifier()] = session
+        visited = []
+        popLeastRecentlyAccessed = store.popLeastRecentlyAccessed
+
+        def countingPop(count=None, before=None, oneShots=True):
+            entries = popLeastRecentlyAccessed(count, before, oneShots)
+            visited.extend(entries)
+            return entries
+
+        store.popLeastRecentlyAccessed = countingPop
+        heapPops = []
+        heappop = SessionDynamicStoreModule.heappop
+
+        def countingHeappop(heap):
+            heapPops.append(1)
+            return heappop(heap)
+
+        SessionDynamicStoreModule.heappop = countingHeappop
+        try:
+            store.intervalSweep()
+            self.assertEqual(len(visited), 306)
+            self.assertEqual(len(memoryStore), 307)
+            visited.clear()
+            heapPops.clear()
+            store.intervalSweep()
+        finally:
+            SessionDynamicStoreModule.heappop = heappop
+        self.assertEqual(visited, [])
+        self.assertEqual(heapPops, [])
+        self.assertEqual(len(memoryStore), 307)
+        # the one-shot sessions still count for the memory limit
+        store._maxDynamicMemorySessions = 7
+        store.intervalSweep()
+        self.assertEqual(len(memoryStore), 7)
+        self.assertNotIn('foo-100', memoryStore)
+
+    def testOutdatedAccessTimesAreRemoved(self):
+        store = self._store
+        for _i in range(100):
+            store['foo-3']  # pylint: disable=pointless-statement
+        self.assertLessEqual(
+            len(store._accessHeap), 2 * len(store._accessTimes) + 100)
+        self.assertEqual(store.memoryKeysInAccessTimeOrder()[-1], 'foo-3')
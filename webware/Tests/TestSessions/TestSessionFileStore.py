@@ -1,6 +1,11 @@
+import os
+
+from time import time
+
 from SessionMemoryStore import SessionMemoryStore
 from SessionFileStore import SessionFileStore
 
+from .Session import Session
 from .TestSessionMemoryStore import TestSessionMemoryStore
 
 
@@ -26,3 +31,69 @@ class SessionFileStoreTest(TestSessionMemoryStore):
         store = SessionFileStore(app, restoreFiles=False)
         self.assertEqual(len(store), 0)
         self.assertFalse('foo-0' in store or 'foo-6' in store)
+
+    def countLoads(self, store):
+        """Count how often sessions are loaded from the given store."""
+        loads = []
+        decoder = store.decoder()
+
+        def countingDecoder(f):
+            loads.append(f.name)
+            return decoder(f)
+
+        store.setEncoderDecoder(store.encoder(), countingDecoder)
+        return loads
+
+    def testCleanStaleSessionsUsesIndex(self):
+        store = self._store
+        store._loadBeforeDelete = False
+        loads = self.countLoads(store)
+        store.cleanStaleSessions()
+        self.assertEqual(len(store), 5)
+        self.assertFalse('foo-5' in store or 'foo-6' in store)
+        self.assertEqual(loads, [])
+        self.assertIsNone(Session._lastExpired)
+        self.assertEqual(sorted(store._expires), sorted(store.keys()))
+
+    def testCleanStaleSessionsLoadsOnlyStaleSessions(self):
+        store = self._store
+        loads = self.countLoads(store)
+        store.cleanStaleSessions()
+        self.assertEqual(len(store), 5)
+        self.assertEqual(len(loads), 2)
+        self.assertIn(Session._lastExpired, ('foo-5', 'foo-6'))
+
+    def testCleanStaleSessionsWithChangedFiles(self):
+        store = self._store
+        store._loadBeforeDelete = False
+        # sessions written by another store are not in the index
+        other = SessionFileStore(self._app)
+        session = Session(8)
+        other[session.identifier()] = session
+        # sessions changed by another store have invalid index entries
+        session = Session(5)
+        session._lastAccessTime = time()
+        os.utime(store.filenameForKey('foo-5'), ns=(0, 0))
+        other[session.identifier()] = session
+        loads = self.countLoads(store)
+        store.cleanStaleSessions()
+        self.assertEqual(sorted(loads), [
+            store.filenameForKey('foo-5'), store.filenameForKey('foo-8')])
+        self.assertTrue('foo-5' in store)
+        self.assertFalse('foo-6' in store or 'foo-8' in store)
+        self.assertEqual(len(store), 6)
+
+    def testIndexIsRestored(self):
+        store = self._store
+        store.storeAllSessions()
+        self.assertTrue(os.path.exists(store.indexFilename()))
+        store = SessionFileStore(self._app)
+        self.assertEqual(sorted(store._expires), sorted(store.keys()))
+        store._loadBeforeDelete = False
+        loads = self.countLoads(store)
+        store.cleanStaleSessions()
+        self.assertEqual(loads, [])
+        self.assertEqual(len(store), 5)
+        store = SessionFileStore(self._app, restoreFiles=False)
+        self.assertEqual(store._expires, {})
+        self.assertFalse(os.path.exists(store.indexFilename()))
@@ -3,6 +3,7 @@ from . import memcache  # noqa: F401 (mock memcache installation)
 
 from SessionMemcachedStore import SessionMemcachedStore
 
+from .Application import Application
 from .TestSessionMemoryStore import TestSessionMemoryStore
 
 
@@ -17,6 +18,7 @@ class SessionMemcachedStoreTest(TestSessionMemoryStore):
     def tearDown(self):
         self.setOnIteration()
         TestSessionMemoryStore.tearDown(self)
+        memcache.data.clear()  # the store itself cannot be cleared
 
     def setOnIteration(self, onIteration=None):
         self._store._onIteration = onIteration
@@ -77,3 +79,36 @@ class SessionMemcachedStoreTest(TestSessionMemoryStore):
 
     def testCleanStaleSessions(self):
         self._store.cleanStaleSessions()
+
+
+class NearCacheApplication(Application):
+    """Mock application caching sessions in the process."""
+
+    def setting(self, key, default=None):
+        if key == 'SessionNearCacheSize':
+            return 5
+        return super().setting(key, default)
+
+
+class SessionMemcachedStoreNearCacheTest(SessionMemcachedStoreTest):
+
+    _app = NearCacheApplication()
+
+    def testCachedSessionIsReused(self):
+        store = self._store
+        session = store['foo-3']
+        self.assertIs(store['foo-3'], session)
+        self.assertEqual(store.nearCache().stats()['hits'], 2)
+        other = SessionMemcachedStore(self._app)
+        otherSession = other['foo-3']
+        self.assertIsNot(otherSession, session)
+        otherSession.setBar(99)
+        other['foo-3'] = otherSession
+        session = store['foo-3']
+        self.assertEqual(session.bar(), 99)
+        self.assertIs(store['foo-3'], session)
+        del memcache.data[store.mcVersionKey('foo-3')]
+        self.assertIsNot(store['foo-3'], session)
+        del store['foo-3']
+        self.assertNotIn('foo-3', store)
+        self.assertEqual(len(store.nearCache()), 4)
@@ -1,5 +1,7 @@
 import os
 
+from threading import Thread
+
 from SessionMemoryStore import SessionMemoryStore
 
 from .Session import Session
@@ -169,3 +171,36 @@ class TestSessionMemoryStore(TestSessionStore):
         self.assertEqual(len(store), 5)
         self.assertTrue('foo-0' in store and 'foo-4' in store)
         self.assertFalse('foo-5' in store or 'foo-6' in store)
+
+    def testCheckOutAndCheckIn(self):
+        store = self._store
+        store._lockTimeout = 0.05
+        token = store.checkOut('foo-3')
+        self.assertIsNotNone(token)
+        self.assertIsNone(store.checkOut('foo-3'))
+        otherToken = store.checkOut('foo-4')
+        self.assertIsNotNone(otherToken)
+        store.checkIn('foo-3', token)
+        token = store.checkOut('foo-3')
+        self.assertIsNotNone(token)
+        store.checkIn('foo-3', token)
+        store.checkIn('foo-4', otherToken)
+        self.assertEqual(store['foo-3'].bar(), 18)
+
+    def testCheckOutWaitsForCheckIn(self):
+        store = self._store
+        token = store.checkOut('foo-3')
+        events = []
+
+        def checkOut():
+            otherToken = store.checkOut('foo-3')
+            events.append('checked out')
+            store.checkIn('foo-3', otherToken)
+
+        thread = Thread(target=checkOut)
+        thread.start()
+        thread.join(0.05)
+        events.append('checking in')
+        store.checkIn('foo-3', token)
+        thread.join()
+        self.assertEqual(events, ['checking in', 'checked out'])
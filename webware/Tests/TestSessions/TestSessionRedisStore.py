@@ -3,12 +3,30 @@ from . import redis  # noqa: F401 (mock redis installation)
 
 from SessionRedisStore import SessionRedisStore
 
+from .Application import Application
+from .Session import Session
+from .TestSessionCodec import SessionWithValues
 from .TestSessionMemoryStore import TestSessionMemoryStore
 
 
+class RedisApplication(Application):
+    """Mock application with Redis settings."""
+
+    _redisSettings = {
+        'RedisMaxConnections': 20, 'RedisSocketTimeout': 2.5,
+        'RedisSocketConnectTimeout': 1.5, 'RedisScanCount': 3,
+        'RedisLoadBeforeDelete': False}
+
+    def setting(self, key, default=None):
+        if key in self._redisSettings:
+            return self._redisSettings[key]
+        return super().setting(key, default)
+
+
 class SessionRedisStoreTest(TestSessionMemoryStore):
 
     _storeClass = SessionRedisStore
+    _redisApp = RedisApplication()
 
     def setUp(self):
         TestSessionMemoryStore.setUp(self)
@@ -18,3 +36,250 @@ class SessionRedisStoreTest(TestSessionMemoryStore):
 
     def testCleanStaleSessions(self):
         self._store.cleanStaleSessions()
+
+    def testConnectionPool(self):
+        kwargs = self._store._redis.connection_pool.connection_kwargs
+        self.assertEqual(kwargs['host'], 'localhost')
+        self.assertEqual(kwargs['port'], 6379)
+        self.assertIsNone(kwargs['max_connections'])
+        self.assertIsNone(kwargs['socket_timeout'])
+        store = SessionRedisStore(self._redisApp)
+        kwargs = store._redis.connection_pool.connection_kwargs
+        self.assertEqual(kwargs['max_connections'], 20)
+        self.assertEqual(kwargs['socket_timeout'], 2.5)
+        self.assertEqual(kwargs['socket_connect_timeout'], 1.5)
+
+    def testBatches(self):
+        store = SessionRedisStore(self._redisApp)
+        self.assertEqual(
+            list(store.batches(range(7))), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(len(store.items()), 7)
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def testDelItemWithoutLoading(self):
+        store = SessionRedisStore(self._redisApp)
+        self.assertFalse(store._loadBeforeDelete)
+        del store['foo-3']
+        self.assertFalse('foo-3' in store)
+        self.assertIsNone(Session._lastExpired)
+        self.assertRaises(KeyError, store.__delitem__, 'foo-3')
+
+
+class DeltaApplication(Application):
+    """Mock application storing session values separately in Redis."""
+
+    def setting(self, key, default=None):
+        if key == 'RedisDeltaValues':
+            return True
+        return super().setting(key, default)
+
+
+class DeltaRedisApplication(RedisApplication):
+    """Mock application with Redis settings and separate values."""
+
+    _redisSettings = dict(
+        RedisApplication._redisSettings, RedisDeltaValues=True)
+
+
+class SessionRedisStoreDeltaTest(SessionRedisStoreTest):
+
+    _app = DeltaApplication()
+    _redisApp = DeltaRedisApplication()
+
+    def testValuesAreStoredSeparately(self):
+        store = self._store
+        session = SessionWithValues(8)
+        store['foo-8'] = session
+        keys = [key for key in redis.data if key.startswith('Values:')]
+        self.assertEqual(len(keys), 8)
+        valuesKey = store.redisValuesKey(
+            'foo-8', store._valuesDigests[session])
+        self.assertIn(valuesKey, keys)
+        self.assertLess(len(redis.data['WebwareSession:foo-8']), 300)
+        self.assertGreater(len(redis.data[valuesKey]), 1000)
+        session = store['foo-8']
+        self.assertEqual(session._values['cart'], ['item'] * 1000)
+        self.assertEqual(store.keys().count('foo-8'), 1)
+        del store['foo-8']
+        self.assertNotIn(valuesKey, redis.data)
+        self.assertRaises(KeyError, store.__getitem__, 'foo-8')
+
+    def testUnchangedValuesAreNotWritten(self):
+        store = self._store
+        store['foo-8'] = SessionWithValues(8)
+        session = store['foo-8']
+        writes = []
+        setex = store._redis.setex
+
+        def countingSetex(name, time, value):
+            writes.append(name)
+            return setex(name, time, value)
+
+        store._redis.setex = countingSetex
+        session.setBar(19)
+        store['foo-8'] = session
+        self.assertEqual(writes, ['WebwareSession:foo-8'])
+        self.assertEqual(store['foo-8'].bar(), 19)
+        writes.clear()
+        session._values['cart'].append('other item')
+        store['foo-8'] = session
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(
+            len([key for key in redis.data
+                 if key.startswith('Values:WebwareSession:foo-8:')]), 1)
+        self.assertEqual(store['foo-8']._values['cart'][-1], 'other item')
+        # values which have been removed are written again
+        writes.clear()
+        session = store['foo-8']
+        for key in list(redis.data):
+            if key.startswith('Values:'):
+                del redis.data[key]
+        store['foo-8'] = session
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(store['foo-8']._values['cart'][-1], 'other item')
+
+    def testClearRemovesValues(self):
+        self._store.clear()
+        self.assertFalse(
+            [key for key in redis.data if key.startswith('Values:')])
+
+
+class NearCacheApplication(Application):
+    """Mock application caching sessions in the process."""
+
+    _nearCacheSettings = {'SessionNearCacheSize': 5}
+
+    def setting(self, key, default=None):
+        if key in self._nearCacheSettings:
+            return self._nearCacheSettings[key]
+        return super().setting(key, default)
+
+
+class NearCacheRedisApplication(RedisApplication):
+    """Mock application with Redis settings caching sessions."""
+
+    _redisSettings = dict(
+        RedisApplication._redisSettings, SessionNearCacheSize=5)
+
+
+class SessionRedisStoreNearCacheTest(SessionRedisStoreTest):
+
+    _app = NearCacheApplication()
+    _redisApp = NearCacheRedisApplication()
+
+    def countDecodes(self, store):
+        decodes = []
+        decode = store.decode
+
+        def countingDecode(data):
+            decodes.append(data)
+            return decode(data)
+
+        store.decode = countingDecode
+        return decodes
+
+    def testCachedSessionIsReused(self):
+        store = self._store
+        decodes = self.countDecodes(store)
+        session = store['foo-6']
+        self.assertIs(store['foo-6'], session)
+        self.assertFalse(decodes)
+        self.assertEqual(len(store.nearCache()), 5)
+        self.assertRaises(KeyError, store.__getitem__, 'foo-7')
+        decodes.clear()
+        session = store['foo-0']
+        self.assertEqual(len(decodes), 1)
+        self.assertIs(store['foo-0'], session)
+        self.assertEqual(len(decodes), 1)
+        stats = store.nearCache().stats()
+        self.assertEqual(stats['sessions'], 5)
+        self.assertEqual(stats['evictions'], 3)
+
+    def testChangedSessionIsReadAgain(self):
+        store = self._store
+        session = store['foo-3']
+        other = self._storeClass(self._app)
+        otherSession = other['foo-3']
+        self.assertIsNot(otherSession, session)
+        otherSession.setBar(99)
+        other['foo-3'] = otherSession
+        decodes = self.countDecodes(store)
+        session = store['foo-3']
+        self.assertEqual(session.bar(), 99)
+        self.assertEqual(len(decodes), 1)
+        self.assertIs(store['foo-3'], session)
+        self.assertEqual(len(decodes), 1)
+
+    def testSessionWithoutStampIsNotCached(self):
+        store = self._store
+        session = store['foo-3']
+        del redis.data[store.redisVersionKey('foo-3')]
+        decodes = self.countDecodes(store)
+        self.assertIsNot(store['foo-3'], session)
+        store['foo-3']
+        self.assertEqual(len(decodes), 2)
+        self.assertFalse(store.nearCache().get('foo-3', None))
+
+    def testDeletedSessionIsNotCached(self):
+        store = self._store
+        store['foo-3']
+        del store['foo-3']
+        self.assertNotIn(store.redisVersionKey('foo-3'), redis.data)
+        self.assertRaises(KeyError, store.__getitem__, 'foo-3')
+        store.clear()
+        self.assertEqual(len(store.nearCache()), 0)
+        self.assertFalse(redis.data)
+
+
+class DeltaNearCacheApplication(NearCacheApplication):
+    """Mock application caching sessions and storing values separately."""
+
+    _nearCacheSettings = dict(
+        NearCacheApplication._nearCacheSettings, RedisDeltaValues=True)
+
+
+class DeltaNearCacheRedisApplication(NearCacheRedisApplication):
+    """Mock application with Redis settings, caching and separate values."""
+
+    _redisSettings = dict(
+        NearCacheRedisApplication._redisSettings, RedisDeltaValues=True)
+
+
+class SessionRedisStoreDeltaNearCacheTest(SessionRedisStoreNearCacheTest):
+
+    _app = DeltaNearCacheApplication()
+    _redisApp = DeltaNearCacheRedisApplication()
+
+    def countDecodes(self, store):
+        decodes = []
+        decode = store.decodeWithValues
+
+        def countingDecode(result):
+            decodes.append(result)
+            return decode(result)
+
+        store.decodeWithValues = countingDecode
+        return decodes
+
+    def testEmptyNamespace(self):
+        app = EmptyNamespaceApplication()
+        store = self._storeClass(app)
+        redis.data.clear()
+        self.addCleanup(redis.data.clear)
+        store['foo-8'] = SessionWithValues(8)
+        store['foo-9'] = SessionWithValues(9)
+        token = store.checkOut('foo-8')
+        redis.data['Push:foo-8'] = [b'0 message']
+        for prefix in store.reservedPrefixes:
+            self.assertTrue(any(key.startswith(prefix) for key in redis.data))
+        self.assertEqual(sorted(store.keys()), ['foo-8', 'foo-9'])
+        self.assertEqual(len(store), 2)
+        store.checkIn('foo-8', token)
+
+
+class EmptyNamespaceApplication(DeltaNearCacheApplication):
+    """Mock application using no namespace for the session keys."""
+
+    _nearCacheSettings = dict(
+        DeltaNearCacheApplication._nearCacheSettings, RedisNamespace='')
@@ -0,0 +1,70 @@
+from threading import Thread
+
+from SessionSqliteStore import SessionSqliteStore
+
+from .Session import Session
+from .TestSessionMemoryStore import TestSessionMemoryStore
+
+
+class SessionSqliteStoreTest(TestSessionMemoryStore):
+
+    _storeClass = SessionSqliteStore
+    _storeIsOrdered = False
+
+    def testSqliteRestoreFiles(self):
+        app = self._app
+        store = self._store
+        self.assertEqual(len(store), 7)
+        session = store['foo-3']
+        store = SessionSqliteStore(
+            app, restoreFiles=False, filename='Session.sqlite2')
+        self.assertEqual(len(store), 0)
+        store['foo-3'] = session
+        store.storeAllSessions()
+        store = SessionSqliteStore(app, filename='Session.sqlite2')
+        self.assertEqual(len(store), 1)
+        self.assertTrue('foo-3' in store)
+        self.assertFalse('foo-0' in store or 'foo-6' in store)
+        store.storeAllSessions()
+        store = SessionSqliteStore(app)
+        self.assertEqual(len(store), 7)
+        store.storeAllSessions()
+
+    def testWalMode(self):
+        conn = self._store.connection()
+        self.assertEqual(
+            conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def testCleanStaleSessionsWithoutLoading(self):
+        store = self._store
+        store._loadBeforeDelete = False
+        store.cleanStaleSessions()
+        self.assertEqual(len(store), 5)
+        self.assertIsNone(Session._lastExpired)
+        self.assertFalse('foo-5' in store or 'foo-6' in store)
+        del store['foo-3']
+        self.assertIsNone(Session._lastExpired)
+        self.assertRaises(KeyError, store.__delitem__, 'foo-3')
+
+    def testSessionWithoutTimeout(self):
+        store = self._store
+        session = Session(9)
+        session._timeout = None
+        store[session.identifier()] = session
+        store.cleanStaleSessions()
+        self.assertTrue('foo-9' in store)
+
+    def testConnectionPerThread(self):
+        store = self._store
+        connections = []
+
+        def getSession():
+            connections.append(store.connection())
+            self.assertEqual(store['foo-3'].bar(), 18)
+
+        thread = Thread(target=getSession)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(connections), 1)
+        self.assertIsNot(connections[0], store.connection())
+        self.assertEqual(len(store._connections), 2)
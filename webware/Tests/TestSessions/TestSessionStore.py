@@ -44,3 +44,32 @@ class TestSessionStore(unittest.TestCase):
         self._store.setEncoderDecoder(encoder, decoder)
         self.assertEqual(self._store.encoder(), encoder)
         self.assertEqual(self._store.decoder(), decoder)
+
+    def testEncodeAndDecode(self):
+        store = self._store
+        session = Session(3)
+        data = store.encode(session)
+        self.assertTrue(isinstance(data, bytes))
+        self.assertEqual(store.decode(data).data(), session.data())
+        store.setEncoderDecoder(
+            lambda obj, f: f.write(repr(obj.data()).encode('ascii')),
+            lambda f: eval(f.read().decode('ascii')))
+        data = store.encode(session)
+        self.assertEqual(data, repr(session.data()).encode('ascii'))
+        self.assertEqual(store.decode(data), session.data())
+
+    def testCodecSetting(self):
+
+        class CodecApplication(Application):
+
+            def setting(self, key, default=None):
+                return {
+                    'SessionCodec': 'zlib', 'SessionCompressMinSize': 100
+                }.get(key) or super().setting(key, default)
+
+        store = self._storeClass(CodecApplication())
+        self.assertEqual(store.codec().name(), 'zlib')
+        session = Session(3, 'x' * 1000)
+        data = store.encode(session)
+        self.assertTrue(data.startswith(store.codec().zlibMarker))
+        self.assertEqual(store.decode(data).bar(), 'x' * 1000)
@@ -2,19 +2,22 @@
 
 import sys
 from copy import copy
+from fnmatch import fnmatchcase
 
 sys.modules['redis'] = sys.modules[__name__]
 
 data = {}  # our mock redis
+subscriptions = []  # our subscribed mock pubsub objects
 
 
 class ConnectionPool:
 
-    def __init__(self, redis):
-        self._redis = redis
+    def __init__(self, **kwargs):
+        self.connection_kwargs = kwargs
+        self._connected = True
 
     def disconnect(self):
-        self._redis._connected = False
+        self._connected = False
 
 
 # pylint: disable=unused-argument, invalid-name
@@ -22,37 +25,190 @@ class ConnectionPool:
 class StrictRedis:
     """Mock Redis client."""
 
-    def __init__(self, host='localhost', port=6379, db=0, password=None):
-        self.connection_pool = ConnectionPool(self)
-        self._connected = True
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 connection_pool=None):
+        if connection_pool is None:
+            connection_pool = ConnectionPool(
+                host=host, port=port, db=db, password=password)
+        self.connection_pool = connection_pool
+
+    @property
+    def _connected(self):
+        return self.connection_pool._connected
 
     def setex(self, name, time, value):
         if self._connected:
             if value is not None:
                 data[name] = value
 
+    def set(self, name, value, nx=False, px=None):
+        if self._connected:
+            if nx and name in data:
+                return None
+            data[name] = value
+            return True
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # only the scripts used by the session store are supported
+        if self._connected:
+            name, arg = keys_and_args
+            if 'string.sub' in script:
+                # get or delete a session with separately stored values
+                value = data.get(name)
+                if value is None:
+                    return None if 'return {' in script else 0
+                valuesName = arg + value[:32].decode()
+                if 'return {' in script:
+                    values = data.get(valuesName)
+                    return [value] if values is None else [value, values]
+                data.pop(valuesName, None)
+                del data[name]
+                return 1
+            # delete a lock if it is owned by the given token
+            if data.get(name) == arg:
+                del data[name]
+                return 1
+            return 0
+
+    def expire(self, name, time):
+        if self._connected:
+            return name in data
+
     def get(self, name):
         if self._connected:
             return copy(data.get(name))
 
+    def mget(self, names):
+        if self._connected:
+            return [copy(data.get(name)) for name in names]
+
     def delete(self, *names):
         if self._connected:
+            deleted = 0
             for name in names:
-                del data[name]
+                if isinstance(name, bytes):
+                    name = name.decode()
+                if name in data:
+                    del data[name]
+                    deleted += 1
+            return deleted
 
     def exists(self, name):
         if self._connected:
             return name in data
 
     def keys(self, pattern='*'):
+        raise AssertionError('KEYS should not be used')
+
+    def scan_iter(self, match=None, count=None):
         if self._connected:
-            if not pattern.endswith('*'):
+            if not match.endswith('*'):
                 raise ValueError('bad pattern')
-            pattern = pattern[:-1]
-            if not pattern:
-                return list(data)
-            return [k for k in data if k.startswith(pattern)]
+            match = match[:-1]
+            # return keys as bytes like the real client
+            for k in list(data):
+                if k.startswith(match):
+                    yield k.encode()
+
+    def rpush(self, name, *values):
+        if self._connected:
+            items = data.setdefault(name, [])
+            items.extend(values)
+            return len(items)
+
+    def ltrim(self, name, start, end):
+        if self._connected:
+            if name in data:
+                data[name] = data[name][start:None if end == -1 else end + 1]
+            return True
+
+    def lrange(self, name, start, end):
+        if self._connected:
+            end = None if end == -1 else end + 1
+            return copy(data.get(name, [])[start:end])
+
+    def publish(self, channel, message):
+        if self._connected:
+            return sum(pubSub.receive(channel, message)
+                       for pubSub in list(subscriptions))
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return PubSub()
 
     def flushdb(self):
         if self._connected:
             data.clear()
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+
+class Pipeline:
+    """Mock Redis pipeline."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+
+        def command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class PubSub:
+    """Mock Redis pubsub object calling handlers in the publishing thread."""
+
+    def __init__(self):
+        self.patterns = {}
+
+    def psubscribe(self, **patterns):
+        self.patterns.update(patterns)
+        if self not in subscriptions:
+            subscriptions.append(self)
+
+    def receive(self, channel, message):
+        for pattern, handler in self.patterns.items():
+            if fnmatchcase(channel, pattern):
+                handler({'type': 'pmessage', 'pattern': pattern.encode(),
+                         'channel': channel.encode(), 'data': message})
+                return 1
+        return 0
+
+    def run_in_thread(self, sleep_time=0, daemon=False,
+                      exception_handler=None):
+        return PubSubWorkerThread(self, exception_handler)
+
+    def close(self):
+        if self in subscriptions:
+            subscriptions.remove(self)
+
+
+class PubSubWorkerThread:
+    """Mock Redis pubsub worker thread."""
+
+    def __init__(self, pubSub, exceptionHandler=None):
+        self._pubSub = pubSub
+        self._exceptionHandler = exceptionHandler
+        self._alive = True
+
+    def is_alive(self):
+        return self._alive
+
+    def stop(self):
+        self._alive = False
+        self._pubSub.close()
+
+    def fail(self, exc):
+        """Simulate an error in the worker thread."""
+        if self._exceptionHandler is None:
+            self._alive = False
+        else:
+            self._exceptionHandler(exc, self._pubSub, self)
@@ -0,0 +1,217 @@
+"""Test the WSGI response stream"""
+
+import unittest
+import zlib
+
+from io import BytesIO
+from tempfile import TemporaryFile
+
+from ResponseCompression import GzipCompressor
+from WSGIStreamOut import WSGIStreamOut, InvalidCommandSequence, FileIterator
+
+
+class TestWSGIStreamOut(unittest.TestCase):
+
+    def setUp(self):
+        self.started = []
+        self.written = []
+
+    def startResponse(self, status, headers):
+        self.started.append((status, headers))
+        return self.written.append
+
+    def streamOut(self, **kwargs):
+        return WSGIStreamOut(self.startResponse, **kwargs)
+
+    def deliver(self, streamOut):
+        streamOut.startResponse('200 OK', [])
+        streamOut.commit()
+        streamOut.close()
+        return self.written if streamOut._useWrite else streamOut.iterable()
+
+    def testWriteStrings(self):
+        s = self.streamOut()
+        s.write('Hello')
+        s.write(', ')
+        s.write(b'World')
+        s.write(42)
+        self.assertEqual(s.size(), 14)
+        self.assertEqual(s.buffer(), b'Hello, World42')
+        self.assertEqual(self.deliver(s), [b'Hello, World42'])
+        self.assertEqual(self.started, [('200 OK', [])])
+
+    def testPrependAndPop(self):
+        s = self.streamOut()
+        s.write('World')
+        s.prepend('Hello, ')
+        self.assertEqual(s.buffer(), b'Hello, World')
+        s.pop(3)
+        self.assertEqual(s.buffer(), b'lo, World')
+        s.pop(6)
+        self.assertEqual(s.buffer(), b'rld')
+        self.assertEqual(s.size(), 3)
+        s.pop(5)
+        self.assertEqual(s.buffer(), b'')
+        self.assertEqual(s.size(), 0)
+
+    def testClear(self):
+        s = self.streamOut()
+        s.write('Hello')
+        s.clear()
+        self.assertEqual(s.size(), 0)
+        self.assertEqual(self.deliver(s), [])
+        self.assertRaises(InvalidCommandSequence, s.clear)
+
+    def testSmallChunksAreCombined(self):
+        s = self.streamOut(bufferSize=1024)
+        chunk = b'x' * 100
+        for _count in range(25):
+            s.write(chunk)
+        written = self.deliver(s)
+        self.assertEqual([len(w) for w in written], [1100, 1100, 300])
+        self.assertEqual(b''.join(written), chunk * 25)
+
+    def testLargeChunksAreNotCopied(self):
+        for size in (1024, 100 * 1024, 50 * 1024 * 1024):
+            for useWrite in (True, False):
+                self.written = []
+                s = self.streamOut(bufferSize=1024, useWrite=useWrite)
+                s.write(b'<')
+                chunk = b'x' * size
+                s.write(chunk)
+                s.write(b'>')
+                written = self.deliver(s)
+                self.assertEqual(len(written), 3)
+                self.assertEqual(written[0], b'<')
+                self.assertIs(written[1], chunk)
+                self.assertEqual(written[2], b'>')
+
+    def testAutoCommit(self):
+        s = self.streamOut(bufferSize=8)
+        s.write('Hello')
+        self.assertFalse(s.needCommit())
+        s.setAutoCommit()
+        s.write('World')
+        self.assertTrue(s.needCommit())
+        s.startResponse('200 OK', [])
+        s.commit()
+        self.assertEqual(self.written, [b'HelloWorld'])
+        self.assertEqual(s.size(), 0)
+        s.write('!')
+        self.assertEqual(s.buffer(), b'!')
+        s.close()
+        self.assertEqual(self.written, [b'HelloWorld', b'!'])
+        self.assertTrue(s.closed())
+        self.assertRaises(ConnectionAbortedError, s.write, '?')
+
+    def testSendFileWithoutFileWrapper(self):
+        for useWrite in (True, False):
+            self.written = []
+            s = self.streamOut(useWrite=useWrite)
+            s.write('Header')
+            with TemporaryFile() as f:
+                f.write(b'0123456789' * 10)
+                f.seek(5)
+                s.sendFile(f, 16)
+                self.assertRaises(InvalidCommandSequence, s.sendFile, f)
+                s.startResponse('200 OK', [])
+                s.commit()
+                s.close()
+                iterable = s.iterable()
+                content = b''.join(iterable)
+                iterable.close()
+                self.assertTrue(f.closed)
+            if useWrite:
+                self.assertEqual(self.written, [b'Header'])
+            else:
+                content = content.removeprefix(b'Header')
+            self.assertEqual(content, (b'0123456789' * 10)[5:])
+
+    def testSendFileWithFileWrapper(self):
+        wrapped = []
+
+        def fileWrapper(f, blockSize):
+            wrapped.append((f, blockSize))
+            return f
+
+        s = self.streamOut(fileWrapper=fileWrapper)
+        f = BytesIO(b'Content')
+        s.sendFile(f, 1024)
+        self.assertEqual(self.deliver(s), [])
+        self.assertIs(s.iterable(), f)
+        self.assertEqual(wrapped, [(f, 1024)])
+
+    def testWriteAfterSendFile(self):
+        s = self.streamOut()
+        s.write('<')
+        f = BytesIO(b'Content')
+        s.sendFile(f)
+        s.write('>')
+        self.assertTrue(f.closed)
+        self.assertEqual(b''.join(self.deliver(s)), b'<Content>')
+        self.assertEqual(s.iterable(), [])
+
+    def testClearAfterSendFile(self):
+        s = self.streamOut()
+        f = BytesIO(b'Content')
+        s.sendFile(f)
+        s.clear()
+        self.assertTrue(f.closed)
+        self.assertEqual(self.deliver(s), [])
+        self.assertEqual(s.iterable(), [])
+
+    def testCompressBuffer(self):
+        s = self.streamOut()
+        s.setCompressor(GzipCompressor())
+        s.write('Hello, World! ' * 100)
+        s.compress(finish=True)
+        self.assertIsNone(s.compressor())
+        self.assertLess(s.size(), 100)
+        written = self.deliver(s)
+        self.assertEqual(
+            zlib.decompress(b''.join(written), 31), b'Hello, World! ' * 100)
+
+    def testCompressStream(self):
+        s = self.streamOut(bufferSize=1024)
+        s.setCompressor(GzipCompressor())
+        s.startResponse('200 OK', [])
+        s.commit()
+        self.assertRaises(InvalidCommandSequence, s.setCompressor, None)
+        decompressor = zlib.decompressobj(31)
+        for n in range(3):
+            s.write(f'Part {n}\n' * 10)
+            s.flush()
+            # every flush must deliver output that can be decompressed
+            data = decompressor.decompress(b''.join(self.written))
+            self.written.clear()
+            self.assertEqual(data, f'Part {n}\n'.encode() * 10)
+        s.close()
+        self.assertFalse(decompressor.eof)
+        decompressor.decompress(b''.join(self.written))
+        self.assertTrue(decompressor.eof)
+
+    def testCompressFile(self):
+        s = self.streamOut()
+        s.setCompressor(GzipCompressor())
+        s.sendFile(BytesIO(b'0123456789' * 100))
+        self.assertFalse(s.hasFile())
+        written = self.deliver(s)
+        self.assertEqual(
+            zlib.decompress(b''.join(written), 31), b'0123456789' * 100)
+
+    def testFileIterator(self):
+        with TemporaryFile() as f:
+            f.write(b'0123456789' * 10)
+            f.seek(10)
+            self.assertEqual(
+                list(FileIterator(f, 32, 50)),
+                [b'0123456789' * 3 + b'01', b'23456789' + b'0123456789'])
+            f.seek(95)
+            self.assertEqual(list(FileIterator(f, 4)), [b'5678', b'9'])
+        with TemporaryFile() as f:  # cannot be memory mapped
+            self.assertEqual(list(FileIterator(f)), [])
+        f = BytesIO(b'0123456789')
+        self.assertEqual(list(FileIterator(f, 4, 6)), [b'0123', b'45'])
+        f.seek(0)
+        self.assertEqual(
+            list(FileIterator(f, 4)), [b'0123', b'4567', b'89'])
@@ -30,6 +30,7 @@ class Transaction:
         self._request = request
         self._response = None
         self._session = None
+        self._sessionLease = None
         self._servlet = None
         self._error = None
         self._nested = 0
@@ -84,6 +85,26 @@ class Transaction:
         """Set the session for the transaction."""
         self._session = session
 
+    def checkOutSession(self, sessionId):
+        """Check out the session with the given id from the session store.
+
+        This prevents concurrent transactions from using the same session.
+        The session is checked in again when the transaction goes to sleep.
+        """
+        if self._sessionLease:
+            return  # already checked out
+        token = self._application.sessions().checkOut(sessionId)
+        if token is None:
+            print(f'WARNING: Session {sessionId} could not be checked out')
+        else:
+            self._sessionLease = sessionId, token
+
+    def checkInSession(self):
+        """Check in the session if it has been checked out."""
+        if lease := self._sessionLease:
+            self._sessionLease = None
+            self._application.sessions().checkIn(*lease)
+
     def servlet(self):
         """Return the current servlet that is processing.
 
@@ -151,8 +172,11 @@ class Transaction:
         self._nested -= 1
         self._servlet.sleep(self)
         if not self._nested and self._session:
-            self._session.sleep(self)
-            self._application.sessions().storeSession(self._session)
+            try:
+                self._session.sleep(self)
+                self._application.sessions().storeSession(self._session)
+            finally:
+                self.checkInSession()
 
     # endregion Transaction stages
 
@@ -15,7 +15,8 @@ import os
 import re
 import sys
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from threading import Lock
 from urllib.parse import unquote
 from warnings import warn
 
@@ -78,6 +79,13 @@ class ContextParser(URLParser):
 
     There is generally only one ContextParser, which can be found as
     ``application.rootURLParser()``.
+
+    If the ``URLResolutionCacheSize`` setting is not zero, the ContextParser
+    remembers how request paths have been resolved to server side paths and
+    servlet factories, so that the file system does not need to be searched
+    again for every request. Cached resolutions are validated using the
+    modification times of the directories involved. Paths that have been
+    parsed using one of the hooks in an ``__init__`` module are not cached.
     """
 
     # region Init
@@ -98,6 +106,12 @@ class ContextParser(URLParser):
         # self._context will be a dictionary of context names and context
         # directories.  It is set by `addContext`.
         self._contexts = {}
+        # self._resolutionCache maps request paths to resolutions,
+        # in least recently used order.  It is bounded in size.
+        self._resolutionCache = OrderedDict()
+        self._resolutionCacheLock = Lock()
+        self._resolutionCacheSize = app.setting('URLResolutionCacheSize', 0)
+        self._resolutionCacheHits = self._resolutionCacheMisses = 0
         # add all contexts except the default, which we save until the end
         contexts = app.setting('Contexts')
         defaultContext = ''
@@ -226,6 +240,7 @@ class ContextParser(URLParser):
 
         print(f'Loading context: {name} at {path}')
         self._contexts[name] = path
+        self.clearResolutionCache()
 
     def absContextPath(self, path):
         """Get absolute context path.
@@ -239,6 +254,62 @@ class ContextParser(URLParser):
 
     # endregion Context handling
 
+    # region Resolution cache
+
+    def cachedResolution(self, requestPath):
+        """Get the cached resolution for the given request path.
+
+        Returns None if the path has not been cached or if one of the
+        directories that were searched when resolving it has been changed.
+        """
+        with self._resolutionCacheLock:
+            resolution = self._resolutionCache.get(requestPath)
+            if resolution is not None:
+                self._resolutionCache.move_to_end(requestPath)
+        if resolution is not None:
+            try:
+                for path, mtime in resolution[-1]:
+                    if os.stat(path).st_mtime_ns != mtime:
+                        break
+                else:
+                    self._resolutionCacheHits += 1
+                    return resolution
+            except OSError:
+                pass
+            with self._resolutionCacheLock:
+                self._resolutionCache.pop(requestPath, None)
+        self._resolutionCacheMisses += 1
+        return None
+
+    def cacheResolution(self, requestPath, resolution):
+        """Cache the resolution for the given request path.
+
+        The resolution is a tuple of the context name, the context path,
+        the server side path, the extra URL path, the servlet factory and
+        the directories with their modification times as a last element.
+        """
+        with self._resolutionCacheLock:
+            cache = self._resolutionCache
+            cache[requestPath] = resolution
+            cache.move_to_end(requestPath)
+            while len(cache) > self._resolutionCacheSize:
+                cache.popitem(last=False)
+
+    def clearResolutionCache(self):
+        """Clear the cache of resolved request paths."""
+        with self._resolutionCacheLock:
+            self._resolutionCache.clear()
+
+    def resolutionCacheStats(self):
+        """Get statistics for the cache of resolved request paths."""
+        return {
+            'size': len(self._resolutionCache),
+            'maxSize': self._resolutionCacheSize,
+            'hits': self._resolutionCacheHits,
+            'misses': self._resolutionCacheMisses}
+
+    # endregion Resolution cache
+
     # region Parsing
 
     def parse(self, trans, requestPath):
@@ -260,6 +331,19 @@ class ContextParser(URLParser):
             if q:
                 p += "?" + q
             raise HTTPMovedPermanently(location=p)
+        useCache = self._resolutionCacheSize > 0
+        if useCache:
+            resolution = self.cachedResolution(requestPath)
+            if resolution is not None:
+                (req._contextName, req._serverSideContextPath,
+                 req._serverSidePath, req._extraURLPath,
+                 factory, _dirs) = resolution
+                return factory.servletForTransaction(trans)
+            # the FileParsers record the directories they search here:
+            trans._fileParserDirs = []
+        else:
+            trans._fileParserDirs = None
+        cacheKey = requestPath
         # Determine the context name:
         context = [p for p in requestPath.split('/') if p]
         if requestPath.endswith('/'):
@@ -281,7 +365,14 @@ class ContextParser(URLParser):
         req._serverSideContextPath = context
         req._contextName = contextName
         fp = FileParser(context)
-        return fp.parse(trans, requestPath)
+        servlet = fp.parse(trans, requestPath)
+        if useCache and trans._fileParserDirs:
+            path = req._serverSidePath
+            self.cacheResolution(cacheKey, (
+                contextName, context, path, req._extraURLPath,
+                ServletFactoryManager.factoryForFile(path),
+                tuple(trans._fileParserDirs)))
+        return servlet
 
 
 class _FileParser(URLParser):
@@ -320,6 +411,7 @@ class _FileParser(URLParser):
         URLParser.__init__(self)
         self._path = path
         self._initModule = None
+        self._hasHooks = None
 
     # endregion Init
 
@@ -354,6 +446,8 @@ class _FileParser(URLParser):
         if result is not None:
             return result
 
+        self.recordDirectory(trans)
+
         if not requestPath or requestPath == '/':
             return self.parseIndex(trans, requestPath)
 
@@ -393,6 +487,20 @@ class _FileParser(URLParser):
 
         return ServletFactoryManager.servletForFile(trans, name)
 
+    def recordDirectory(self, trans):
+        """Record the directory of this FileParser in the transaction.
+
+        The ContextParser uses the directories and their modification times
+        to validate cached resolutions of request paths.
+        """
+        dirs = getattr(trans, '_fileParserDirs', None)
+        if dirs is None:
+            return
+        try:
+            dirs.append((self._path, os.stat(self._path).st_mtime_ns))
+        except OSError:
+            trans._fileParserDirs = None
+
     def filenamesForBaseName(self, baseName):
         """Find all files for a given base name.
 
@@ -622,6 +730,13 @@ class _FileParser(URLParser):
         if self._initModule is None:
             self._initModule = self.initModule()
         mod = self._initModule
+        if self._hasHooks is None:
+            self._hasHooks = any(hasattr(mod, name) for name in (
+                'urlTransactionHook', 'urlRedirect', 'SubParser',
+                'urlParser', 'urlParserHook', 'urlJoins'))
+        if self._hasHooks:
+            # paths parsed using hooks cannot be cached
+            trans._fileParserDirs = None
 
         seen = trans._fileParserInitSeen[self._path]
 
@@ -791,6 +906,10 @@ class ServletFactoryManagerClass:
                     f" {self._factoryExtensions[ext].__name__}")
             self._factoryExtensions[ext] = factory
 
+    def factories(self):
+        """Get the list of all installed servlet factories."""
+        return self._factories
+
     def factoryForFile(self, path):
         """Get a factory for a filename."""
         ext = os.path.splitext(path)[1]
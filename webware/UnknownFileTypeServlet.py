@@ -2,12 +2,18 @@
 
 import os
 
+from collections import OrderedDict
 from mimetypes import guess_type
+from threading import Lock
+from time import time
+from uuid import uuid4
 
 import HTTPExceptions
 
 from HTTPServlet import HTTPServlet
 from MiscUtils.Configurable import Configurable
+from ResponseCompression import (
+    compressedVariants, isCompressible, preferredEncoding)
 from ServletFactory import ServletFactory
 
 debug = False
@@ -30,6 +36,12 @@ class UnknownFileTypeServletFactory(ServletFactory):
     def uniqueness(self):
         return 'file'
 
+    def __init__(self, application):
+        ServletFactory.__init__(self, application)
+        # the cache is configured here once, since the servlets
+        # for unknown file types may be created for every request
+        UnknownFileTypeServlet(application).configureFileCache()
+
     def extensions(self):
         return ['.*']
 
@@ -37,16 +49,177 @@ class UnknownFileTypeServletFactory(ServletFactory):
         return UnknownFileTypeServlet(transaction.application())
 
     def flushCache(self):
-        pass
+        fileCache.clear()
+
+
+class FileCache:
+    """Cache for the content of static files.
+
+    This is a thread-safe LRU cache, keyed by the server side path of
+    the files. It is bounded by the total size of the cached content,
+    including precomputed compressed variants of the content. Optionally,
+    the entries expire after a given time to live (in seconds).
+    """
+
+    def __init__(self, maxSize=None, ttl=None):
+        self._maxSize = maxSize
+        self._ttl = ttl
+        # _entries maps paths to tuples of the file dictionary,
+        # the number of bytes it occupies and the time it was added
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._size = 0
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filename):
+        return filename in self._entries
+
+    def configure(self, maxSize=None, ttl=None):
+        """Set the total size limit in bytes and the time to live."""
+        with self._lock:
+            self._maxSize = maxSize
+            self._ttl = ttl
+            self._shrink()
+
+    def get(self, filename, etag=None):
+        """Get the cached file dictionary for the given path.
+
+        Returns None if the file is not cached, if the entry has expired,
+        or if the entity tag of the cached file differs from the given one.
+        """
+        with self._lock:
+            if (entry := self._entries.get(filename)) is not None:
+                fileDict, size, added = entry
+                if ((etag is None or etag == fileDict['etag']) and (
+                        not self._ttl or time() - added < self._ttl)):
+                    self._entries.move_to_end(filename)
+                    self._hits += 1
+                    return fileDict
+                del self._entries[filename]
+                self._size -= size
+            self._misses += 1
+        return None
+
+    def add(self, filename, fileDict):
+        """Add the file dictionary for the given path to the cache.
+
+        Least recently used entries are evicted if the total size of the
+        cache would exceed its limit. Files which are larger than the
+        limit themselves are not cached at all.
+        """
+        size = len(fileDict['content']) + sum(
+            map(len, fileDict.get('variants', {}).values()))
+        with self._lock:
+            if (entry := self._entries.pop(filename, None)) is not None:
+                self._size -= entry[1]
+            if self._maxSize is not None and size > self._maxSize:
+                return
+            self._entries[filename] = (fileDict, size, time())
+            self._size += size
+            self._shrink()
+
+    def remove(self, filename):
+        """Remove the given path from the cache."""
+        with self._lock:
+            if (entry := self._entries.pop(filename, None)) is not None:
+                self._size -= entry[1]
+
+    def clear(self):
+        """Clear the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Get statistics for the cache."""
+        with self._lock:
+            return {
+                'files': len(self._entries), 'size': self._size,
+                'maxSize': self._maxSize, 'ttl': self._ttl,
+                'hits': self._hits, 'misses': self._misses,
+                'evictions': self._evictions}
+
+    def _shrink(self):
+        """Evict least recently used entries until the limit is kept."""
+        maxSize = self._maxSize
+        if maxSize is None:
+            return
+        entries = self._entries
+        while self._size > maxSize and entries:
+            self._size -= entries.popitem(last=False)[1][1]
+            self._evictions += 1
 
 
 # A cache of the files served up by UnknownFileTypeServlet cached by
 # absolute, server side path. Each content is another dictionary with keys:
-# content, mimeType, mimeEncoding.
+# content, mimeType, mimeEncoding, mtime, size, filename, etag and variants,
+# where variants maps content codings to precomputed compressed content.
 # Previously, this content was stored directly in the attributes of the
 # UnknownFileTypeServlets, but with that approach subclasses cannot
 # dynamically serve content from different locations.
-fileCache = {}
+fileCache = FileCache()
+
+# The minimum size of files for which compressed variants are cached:
+minCompressSize = 256
+
+# The maximum number of ranges that will be served in one response:
+maxRanges = 16
+
+
+def matchesTag(header, etag):
+    """Check whether an If-None-Match header matches the entity tag.
+
+    This uses the weak comparison as required for If-None-Match.
+    """
+    if header.strip() == '*':
+        return True
+    etag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == etag
+               for tag in header.split(','))
+
+
+def byteRanges(header, size):
+    """Parse the value of a Range header for a file of the given size.
+
+    Returns a list of (start, end) tuples with inclusive end positions,
+    an empty list if none of the ranges can be satisfied, or None if
+    the header is invalid or shall be ignored and the full file be sent.
+    """
+    unit, _sep, rangeSpecs = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for rangeSpec in rangeSpecs.split(','):
+        start, sep, end = rangeSpec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if start:
+                start = int(start)
+                if end:
+                    end = int(end)
+                    if start > end:
+                        return None
+                    end = min(end, size - 1)
+                else:
+                    end = size - 1
+            else:
+                suffix = int(end)
+                if suffix < 0:
+                    return None
+                start, end = max(size - suffix, 0), size - 1
+                if not suffix:
+                    continue
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+    if len(ranges) > maxRanges:
+        return None
+    return ranges
 
 
 class UnknownFileTypeServlet(HTTPServlet, Configurable):
@@ -102,6 +275,12 @@ class UnknownFileTypeServlet(HTTPServlet, Configurable):
         Configurable.__init__(self)
         self._application = application
 
+    def configureFileCache(self):
+        """Configure the file cache with the settings of this servlet."""
+        fileCache.configure(
+            self.setting('CacheContentTotalSize'),
+            self.setting('CacheContentTTL'))
+
     def defaultConfig(self):
         """Get the default config.
 
@@ -112,9 +291,10 @@ class UnknownFileTypeServlet(HTTPServlet, Configurable):
     def userConfig(self):
         """Get the user config.
 
-        Taken from Application's 'UnknownFileTypes' user setting.
+        Taken from Application's 'UnknownFileTypes' setting, which
+        may also have been overridden when creating the application.
         """
-        return self._application.userConfig().get('UnknownFileTypes', {})
+        return self._application.setting('UnknownFileTypes', {})
 
     def configFilename(self):
         return self._application.configFilename()
@@ -176,7 +356,16 @@ class UnknownFileTypeServlet(HTTPServlet, Configurable):
         except OSError:
             return None
 
+    @staticmethod
+    def entityTag(stat):
+        """Get a strong entity tag for a file with the given stat result.
+
+        The tag is derived from the modification time, size and inode.
+        """
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{stat.st_ino:x}"'
+
     def serveContent(self, trans):
+        request = trans.request()
         response = trans.response()
 
         maxCacheContentSize = self.setting('MaxCacheContentSize')
@@ -194,58 +383,168 @@ class UnknownFileTypeServlet(HTTPServlet, Configurable):
         try:
             stat = os.fstat(f.fileno())
             fileSize, mtime = stat[6], stat[8]
+            etag = self.entityTag(stat)
             if debug:
                 print('>> UnknownFileType.serveContent()')
                 print(f'>> {filename=}')
                 print(f'>> {fileSize=}')
-            if ((fileDict := fileCache.get(filename)) is not None
-                    and mtime != fileDict['mtime']):
-                # Cache is out of date; clear it.
-                if debug:
-                    print('>> changed, clearing cache')
-                del fileCache[filename]
-                fileDict = None
-            if fileDict is None:
+            # the cache returns nothing if the file has been changed
+            if (fileDict := fileCache.get(filename, etag)) is None:
                 if debug:
                     print('>> not found in cache')
                 mimeType, mimeEncoding = guess_type(filename, False)
                 if mimeType is None:
                     mimeType, mimeEncoding = 'application/octet-stream', None
+                if (self.setting('ReuseServlets')
+                        and self.shouldCacheContent()
+                        and fileSize < maxCacheContentSize):
+                    if debug:
+                        print('>> caching')
+                    fileDict = {
+                        'content': f.read(),
+                        'mimeType': mimeType, 'mimeEncoding': mimeEncoding,
+                        'mtime': mtime, 'size': fileSize,
+                        'filename': filename, 'etag': etag
+                    }
+                    if (self.setting('CacheCompressedContent')
+                            and not mimeEncoding
+                            and fileSize >= minCompressSize
+                            and isCompressible(mimeType)):
+                        fileDict['variants'] = compressedVariants(
+                            fileDict['content'])
+                    fileCache.add(filename, fileDict)
             else:
                 mimeType = fileDict['mimeType']
                 mimeEncoding = fileDict['mimeEncoding']
-            response.setHeader('Content-Type', mimeType)
-            response.setHeader('Content-Length', str(fileSize))
+            env = request.environ()
+            coding = None
+            if fileDict is not None and (
+                    variants := fileDict.get('variants')):
+                response.setHeader('Vary', 'Accept-Encoding')
+                if not env.get('HTTP_RANGE'):
+                    coding = preferredEncoding(
+                        env.get('HTTP_ACCEPT_ENCODING'), variants)
+                    if coding:
+                        # compressed variants need their own entity tags
+                        etag = f'{etag[:-1]}-{coding}"'
+            response.setHeader('ETag', etag)
+            response.setHeader('Accept-Ranges', 'bytes')
+            if (ifNoneMatch := env.get('HTTP_IF_NONE_MATCH')) and matchesTag(
+                    ifNoneMatch, etag):
+                response.delHeader('Content-Type')
+                response.setStatus(304, 'Not Modified')
+                return
+            if coding:
+                if debug:
+                    print(f'>> sending {coding} content from cache')
+                content = variants[coding]
+                response.setHeader('Content-Type', mimeType)
+                response.setHeader('Content-Length', str(len(content)))
+                response.setHeader('Content-Encoding', coding)
+                if request.method() != 'HEAD':
+                    response.write(content)
+                return
+            ranges = None
+            if rangeHeader := env.get('HTTP_RANGE'):
+                ifRange = env.get('HTTP_IF_RANGE')
+                if not ifRange or ifRange in (
+                        etag, response.header('Last-Modified', None)):
+                    ranges = byteRanges(rangeHeader, fileSize)
+                    if ranges is not None and not ranges:
+                        response.setStatus(416, 'Range Not Satisfiable')
+                        response.setHeader(
+                            'Content-Range', f'bytes */{fileSize}')
+                        response.setHeader('Content-Length', '0')
+                        response.delHeader('Content-Type')
+                        return
+            if ranges:
+                response.setStatus(206, 'Partial Content')
+            if ranges and len(ranges) > 1:
+                boundary = uuid4().hex
+                parts = []
+                for n, (start, end) in enumerate(ranges):
+                    header = (
+                        f'--{boundary}\r\nContent-Type: {mimeType}\r\n'
+                        f'Content-Range: bytes {start}-{end}/{fileSize}'
+                        '\r\n\r\n')
+                    if n:
+                        header = '\r\n' + header
+                    parts.append((header.encode('ascii'), start, end))
+                trailer = f'\r\n--{boundary}--\r\n'.encode('ascii')
+                contentLength = len(trailer) + sum(
+                    len(header) + end - start + 1
+                    for header, start, end in parts)
+                response.setHeader(
+                    'Content-Type',
+                    f'multipart/byteranges; boundary={boundary}')
+            else:
+                response.setHeader('Content-Type', mimeType)
+                if ranges:
+                    start, end = ranges[0]
+                    contentLength = end - start + 1
+                    response.setHeader(
+                        'Content-Range', f'bytes {start}-{end}/{fileSize}')
+                else:
+                    contentLength = fileSize
+            response.setHeader('Content-Length', str(contentLength))
             if mimeEncoding:
                 response.setHeader('Content-Encoding', mimeEncoding)
-            if trans.request().method() == 'HEAD':
+            if request.method() == 'HEAD':
                 return
-            if (fileDict is None and self.setting('ReuseServlets')
-                    and self.shouldCacheContent()
-                    and fileSize < maxCacheContentSize):
+            if ranges and len(ranges) > 1:
                 if debug:
-                    print('>> caching')
-                fileDict = {
-                    'content': f.read(),
-                    'mimeType': mimeType, 'mimeEncoding': mimeEncoding,
-                    'mtime': mtime, 'size': fileSize, 'filename': filename
-                }
-                fileCache[filename] = fileDict
-            if fileDict is not None:
+                    print('>> sending multiple ranges')
+                for header, start, end in parts:
+                    response.write(header)
+                    self.writeRange(
+                        response, fileDict, f, start, end - start + 1)
+                response.write(trailer)
+            elif fileDict is not None:
                 if debug:
                     print('>> sending content from cache')
-                response.write(fileDict['content'])
+                if ranges:
+                    start, end = ranges[0]
+                    response.write(fileDict['content'][start:end + 1])
+                else:
+                    response.write(fileDict['content'])
+            elif self.setting('StreamContent'):
+                if debug:
+                    print('>> streaming the file')
+                # the file will be sent and closed by the response stream
+                if ranges:
+                    start, end = ranges[0]
+                    f.seek(start)
+                    response.streamOut().sendFile(
+                        f, readBufferSize, end - start + 1)
+                else:
+                    response.streamOut().sendFile(f, readBufferSize)
+                f = None
             else:  # too big or not supposed to cache
                 if debug:
                     print('>> sending directly')
-                numBytesSent = 0
-                while numBytesSent < fileSize:
-                    if not (data := f.read(
-                            min(fileSize-numBytesSent, readBufferSize))):
-                        break  # unlikely, but safety first
-                    response.write(data)
-                    numBytesSent += len(data)
+                if ranges:
+                    start, end = ranges[0]
+                    self.writeRange(
+                        response, None, f, start, end - start + 1)
+                else:
+                    self.writeRange(response, None, f, 0, fileSize)
         finally:
-            f.close()
+            if f:
+                f.close()
+
+    def writeRange(self, response, fileDict, f, start, length):
+        """Write the given range of the file to the response."""
+        if fileDict is not None:
+            response.write(fileDict['content'][start:start + length])
+            return
+        readBufferSize = self.setting('ReadBufferSize')
+        f.seek(start)
+        numBytesSent = 0
+        while numBytesSent < length:
+            if not (data := f.read(
+                    min(length - numBytesSent, readBufferSize))):
+                break  # unlikely, but safety first
+            response.write(data)
+            numBytesSent += len(data)
 
     # endregion Init et al
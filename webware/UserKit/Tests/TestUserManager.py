@@ -166,6 +166,155 @@ class UserManagerToFileTest(UserManagerToSomewhereTest, unittest.TestCase):
         if os.path.exists(path):
             shutil.rmtree(path, ignore_errors=True)
 
+    def testIndex(self):
+        mgr = self._mgr
+        foo = mgr.createUser('foo', 'bar')
+        baz = mgr.createUser('baz', 'qux')
+        indexPath = mgr.indexPath()
+        self.assertTrue(os.path.exists(indexPath))
+        index = mgr.index()
+        self.assertEqual(index['names'], {'foo': 1, 'baz': 2})
+        self.assertEqual(index['externalIds'], {
+            foo.externalId(): 1, baz.externalId(): 2})
+        # lookups do not load the other users
+        mgr.clearCache()
+        mgr._index = None
+        user = mgr.userForName('baz')
+        self.assertEqual(user.serialNum(), 2)
+        self.assertEqual(list(mgr._cachedUsersBySerialNum), [2])
+        mgr.clearCache()
+        user = mgr.userForExternalId(foo.externalId())
+        self.assertEqual(user.name(), 'foo')
+        self.assertEqual(list(mgr._cachedUsersBySerialNum), [1])
+        # the index is not stored in the user files
+        self.assertIsNone(user.manager()._index)
+
+    def testRebuildIndex(self):
+        mgr = self._mgr
+        mgr.createUser('foo', 'bar')
+        mgr.createUser('baz', 'qux')
+        indexPath = mgr.indexPath()
+        # a missing index is rebuilt
+        os.remove(indexPath)
+        mgr.clearCache()
+        mgr._index = None
+        self.assertEqual(mgr.userForName('foo').serialNum(), 1)
+        self.assertTrue(os.path.exists(indexPath))
+        # a damaged index is rebuilt
+        with open(indexPath, 'wb') as f:
+            f.write(b'garbage')
+        mgr.clearCache()
+        mgr._index = None
+        self.assertEqual(mgr.userForName('baz').serialNum(), 2)
+        # a stale index entry is detected
+        mgr._index['names']['foo'] = 2
+        self.assertEqual(mgr.userForName('foo').serialNum(), 1)
+        self.assertEqual(mgr.index()['names']['foo'], 1)
+        # an entry for a removed user is detected
+        os.remove(os.path.join(mgr.userDir(), '2.user'))
+        mgr.clearCache()
+        self.assertIsNone(mgr.userForName('baz', None))
+        self.assertNotIn('baz', mgr.index()['names'])
+        self.assertEqual(mgr.rebuildIndex(), 1)
+        self.assertEqual(
+            [name for name in os.listdir(mgr.userDir())
+             if not name.endswith('.user')], [mgr.indexFilename])
+
+    def testSharedUserDir(self):
+        mgr = self._mgr
+        other = mgr.__class__()
+        other.setUserDir(mgr.userDir())
+        other.initNextSerialNum()
+        self.assertIsNone(mgr.userForName('alice', None))
+        self.assertIsNone(other.userForName('bob', None))
+        alice = mgr.createUser('alice', 'secret')
+        bob = other.createUser('bob', 'secret')
+        self.assertNotEqual(alice.serialNum(), bob.serialNum())
+        # the managers see the users added by each other
+        self.assertEqual(mgr.userForName('bob').serialNum(), bob.serialNum())
+        self.assertEqual(
+            other.userForName('alice').serialNum(), alice.serialNum())
+        fresh = mgr.__class__()
+        fresh.setUserDir(mgr.userDir())
+        self.assertEqual(
+            fresh.userForName('alice').serialNum(), alice.serialNum())
+        self.assertEqual(
+            fresh.userForExternalId(bob.externalId()).name(), 'bob')
+        self.assertEqual(set(fresh.index()['names']), {'alice', 'bob'})
+
+    def testUserMissingInIndex(self):
+        mgr = self._mgr
+        mgr.createUser('foo', 'bar')
+        indexPath = mgr.indexPath()
+        with open(indexPath, 'rb') as f:
+            index = f.read()
+        mgr.createUser('baz', 'qux')
+        # simulate an index that has been overwritten by another process
+        with open(indexPath, 'wb') as f:
+            f.write(index)
+        mgr.clearCache()
+        self.assertNotIn('baz', mgr.index()['names'])
+        self.assertEqual(mgr.userForName('baz').serialNum(), 2)
+        self.assertEqual(mgr.index()['names'], {'foo': 1, 'baz': 2})
+        self.assertEqual(mgr.addMissingUsers(), 0)
+        self.assertIsNone(mgr.userForName('qux', None))
+
+    def backdateUserDir(self, seconds=60):
+        """Set the modification time of the user directory to the past."""
+        mtime = os.stat(self._mgr.userDir()).st_mtime - seconds
+        os.utime(self._mgr.userDir(), (mtime, mtime))
+
+    def countScans(self, mgr):
+        scans = []
+        scanSerialNums = mgr.scanSerialNums
+
+        def countingScanSerialNums():
+            scans.append(1)
+            return scanSerialNums()
+
+        mgr.scanSerialNums = countingScanSerialNums
+        return scans
+
+    def testFailedLookupDoesNotScan(self):
+        mgr = self._mgr
+        mgr.createUser('foo', 'bar')
+        self.backdateUserDir()
+        scans = self.countScans(mgr)
+        self.assertIsNone(mgr.userForName('baz', None))
+        self.assertEqual(len(scans), 1)
+        for _count in range(5):
+            self.assertIsNone(mgr.userForName('baz', None))
+            self.assertIsNone(mgr.userForExternalId('baz', None))
+        self.assertEqual(len(scans), 1)
+        other = mgr.__class__()
+        other.setUserDir(mgr.userDir())
+        other.initNextSerialNum()
+        other.createUser('baz', 'qux')
+        self.backdateUserDir(30)
+        self.assertEqual(mgr.userForName('baz').serialNum(), 2)
+        self.assertIsNone(mgr.userForName('qux', None))
+        self.assertEqual(len(scans), 2)
+
+    def testUnreadableUserFileIsRemembered(self):
+        mgr = self._mgr
+        mgr.createUser('foo', 'bar')
+        with open(os.path.join(mgr.userDir(), '9.user'), 'wb') as f:
+            f.write(b'garbage')
+        decodes = []
+        decoder = mgr.decoder()
+
+        def countingDecoder(f):
+            decodes.append(f.name)
+            return decoder(f)
+
+        mgr.setEncoderDecoder(mgr.encoder(), countingDecoder)
+        for _count in range(3):
+            self.assertIsNone(mgr.userForName('baz', None))
+        self.assertEqual(len(decodes), 1)
+        self.assertEqual(mgr._unreadableSerialNums, {9})
+        self.assertEqual(mgr.rebuildIndex(), 1)
+        self.assertEqual(len(decodes), 2)
+
 
 class RoleUserManagerToFileTest(UserManagerToFileTest, unittest.TestCase):
     """Tests for the RoleUserManagerToFile class."""
@@ -174,3 +323,42 @@ class RoleUserManagerToFileTest(UserManagerToFileTest, unittest.TestCase):
         from UserKit.RoleUserManagerToFile import RoleUserManagerToFile
         self._mgr = RoleUserManagerToFile()
         self.setUpUserDir(self._mgr)
+
+
+class UserManagerToSqliteTest(UserManagerToSomewhereTest, unittest.TestCase):
+    """Tests for the UserManagerToSqlite class."""
+
+    def setUp(self):
+        from UserKit.UserManagerToSqlite import UserManagerToSqlite
+        self._path = 'Users.sqlite'
+        self.tearDown()
+        self._mgr = UserManagerToSqlite(database=self._path)
+
+    def tearDown(self):
+        mgr = getattr(self, '_mgr', None)
+        if mgr:
+            mgr.shutDown()
+        for suffix in ('', '-wal', '-shm'):
+            path = self._path + suffix
+            if os.path.exists(path):
+                os.remove(path)
+
+    def testPersistence(self):
+        from UserKit.UserManagerToSqlite import UserManagerToSqlite
+        mgr = self._mgr
+        user = mgr.createUser('foo', 'bar')
+        mgr.createUser('baz', 'qux')
+        user.login('bar')
+        user.save()
+        externalId = user.externalId()
+        mgr.shutDown()
+        mgr = self._mgr = UserManagerToSqlite(database=self._path)
+        user = mgr.userForExternalId(externalId)
+        self.assertEqual(user.name(), 'foo')
+        self.assertIs(user.manager(), mgr)
+        self.assertTrue(user.isActive())
+        self.assertIs(mgr.userForName('foo'), user)
+        self.assertEqual(list(mgr._cachedUsersBySerialNum), [1])
+        self.assertEqual([u.name() for u in mgr.users()], ['foo', 'baz'])
+        self.assertEqual(mgr.activeUsers(), [user])
+        self.assertRaises(KeyError, mgr.createUser, 'baz', 'bar')
@@ -3,7 +3,10 @@
 import os
 
 from glob import glob
-from pickle import load, dump
+from pickle import load, dump, HIGHEST_PROTOCOL
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import time
 
 from MiscUtils import NoDefault
 from MiscUtils.MixIn import MixIn
@@ -20,18 +23,50 @@ class UserManagerToFile(UserManager):
     It will contain one file per user with the user's serial number
     as the main filename and an extension of '.user'.
 
+    The directory also contains an index file 'users.index' mapping the
+    names and external ids of the users to their serial numbers, so that
+    users can be looked up by name or external id without loading all users.
+    The index is maintained when users are added or saved and is rebuilt
+    from the user files if it is missing or damaged. It is read again when
+    the file has been changed by another manager or process. If a lookup
+    fails and the user directory has been changed since it was scanned last,
+    user files missing in the index are added. You can also rebuild it by
+    calling rebuildIndex() or by running this module from the command line
+    with the user directory as argument.
+
     The default user directory is the current working directory,
     but relying on the current directory is often a bad practice.
     """
 
     # region Init
 
+    indexFilename = 'users.index'
+
     def __init__(self, userClass=None):
         UserManager.__init__(self, userClass=None)
+        self._index = self._indexStamp = self._userDirStamp = None
+        self._unreadableSerialNums = set()
+        self._indexLock = Lock()
         self.setEncoderDecoder(dump, load)
         self.setUserDir(os.getcwd())
         self.initNextSerialNum()
 
+    def __getstate__(self):
+        # the manager is pickled along with each user,
+        # so make sure the index is not stored in the user files
+        state = self.__dict__.copy()
+        state['_index'] = state['_indexStamp'] = None
+        state['_userDirStamp'] = None
+        state['_unreadableSerialNums'] = set()
+        del state['_indexLock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index = self._indexStamp = self._userDirStamp = None
+        self._unreadableSerialNums = set()
+        self._indexLock = Lock()
+
     def initNextSerialNum(self):
         if os.path.exists(self._userDir):
             serialNums = self.scanSerialNums()
@@ -55,6 +90,8 @@ class UserManagerToFile(UserManager):
         You should strongly consider invoking initNextSerialNum() afterwards.
         """
         self._userDir = userDir
+        self._index = self._indexStamp = self._userDirStamp = None
+        self._unreadableSerialNums = set()
 
     def loadUser(self, serialNum, default=NoDefault):
         """Load the user with the given serial number from disk.
@@ -85,6 +122,204 @@ class UserManagerToFile(UserManager):
 
     # endregion File storage specifics
 
+    # region Index
+
+    def indexPath(self):
+        """Return the path of the index file in the user directory."""
+        return os.path.join(self.userDir(), self.indexFilename)
+
+    def index(self):
+        """Return the index of the user names and external ids.
+
+        The index is a dictionary with the keys 'names' and 'externalIds',
+        each mapping to a dictionary with serial numbers as values.
+        It is read from the index file when it is needed for the first time
+        and whenever the index file has been changed in the meantime.
+        If the index file does not exist or cannot be read, it is rebuilt.
+        """
+        with self._indexLock:
+            return self._currentIndex()
+
+    def rebuildIndex(self):
+        """Rebuild the index file from the user files.
+
+        Returns the number of users in the index.
+        """
+        with self._indexLock:
+            index = self._scanIndex()
+            self._writeIndex(index)
+            self._index = index
+        return len(index['names'])
+
+    def updateIndex(self, user):
+        """Add the given user to the index.
+
+        The index file is only written if the index has changed.
+        """
+        serialNum = user.serialNum()
+        name, externalId = user.name(), user.externalId()
+        with self._indexLock:
+            # merge with the changes made by other managers or processes
+            index = self._currentIndex()
+            names, externalIds = index['names'], index['externalIds']
+            if (names.get(name) != serialNum
+                    or externalIds.get(externalId) != serialNum):
+                names[name] = serialNum
+                externalIds[externalId] = serialNum
+                self._writeIndex(index)
+
+    def addMissingUsers(self):
+        """Add the users with files that are missing in the index.
+
+        User files which cannot be read are skipped and remembered,
+        so that they will not be read again until the index is rebuilt.
+        Returns the number of users that have been added to the index.
+        """
+        with self._indexLock:
+            index = self._currentIndex()
+            self._setUserDirStamp()
+            indexed = set(index['names'].values())
+            indexed.update(self._unreadableSerialNums)
+            missing = [serialNum for serialNum in self.scanSerialNums()
+                       if serialNum not in indexed]
+            if not missing:
+                return 0
+            numUsers = len(index['names'])
+            self._addToIndex(index, missing)
+            numAdded = len(index['names']) - numUsers
+            if numAdded:
+                self._writeIndex(index)
+        return numAdded
+
+    def _currentIndex(self):
+        """Get the index, reading it again if the file has been changed.
+
+        The caller must hold the index lock.
+        """
+        stamp = self._indexFileStamp()
+        if self._index is None or stamp != self._indexStamp:
+            index = self._readIndex()
+            if index is None:
+                index = self._scanIndex()
+                self._writeIndex(index)
+            else:
+                self._indexStamp = stamp
+            self._index = index
+        return self._index
+
+    def _userDirChanged(self):
+        """Check whether the user directory may have changed since the scan.
+
+        Adding or removing user files changes the modification time of the
+        directory, which can be checked without listing the directory.
+        """
+        stamp = self._userDirStamp
+        return stamp is None or stamp != self._getUserDirStamp()
+
+    def _getUserDirStamp(self):
+        """Get the modification time of the user directory."""
+        try:
+            return os.stat(self.userDir()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _setUserDirStamp(self):
+        """Remember the modification time before scanning the user directory.
+
+        The time is not remembered if it is very recent, since then files
+        may still be added with the same modification time of the directory.
+        """
+        stamp = self._getUserDirStamp()
+        if stamp is not None and time() - stamp / 1e9 < 2:
+            stamp = None
+        self._userDirStamp = stamp
+
+    def _indexFileStamp(self):
+        """Get a stamp identifying the current version of the index file."""
+        try:
+            stat = os.stat(self.indexPath())
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _readIndex(self):
+        """Read the index file, returning None if this is not possible."""
+        try:
+            with open(self.indexPath(), 'rb') as f:
+                index = load(f)
+        except Exception:
+            return None
+        if not (isinstance(index, dict)
+                and isinstance(index.get('names'), dict)
+                and isinstance(index.get('externalIds'), dict)):
+            return None
+        return index
+
+    def _writeIndex(self, index):
+        """Write the index file atomically."""
+        userDir = self.userDir()
+        if not os.path.isdir(userDir):
+            return
+        with NamedTemporaryFile(
+                'wb', dir=userDir, prefix='.users.', suffix='.tmp',
+                delete=False) as f:
+            dump(index, f, HIGHEST_PROTOCOL)
+        try:
+            os.replace(f.name, self.indexPath())
+        except OSError:
+            os.remove(f.name)
+            raise
+        self._indexStamp = self._indexFileStamp()
+
+    def _scanIndex(self):
+        """Create the index by reading all user files."""
+        self._setUserDirStamp()
+        self._unreadableSerialNums.clear()
+        index = {'names': {}, 'externalIds': {}}
+        self._addToIndex(index, self.scanSerialNums())
+        return index
+
+    def _addToIndex(self, index, serialNums):
+        """Add the users with the given serial numbers to the index."""
+        names, externalIds = index['names'], index['externalIds']
+        decoder = self.decoder()
+        userDir = self.userDir()
+        for serialNum in serialNums:
+            user = self._cachedUsersBySerialNum.get(serialNum)
+            if user is None:
+                filename = os.path.join(userDir, f'{serialNum}.user')
+                try:
+                    with open(filename, 'rb') as f:
+                        user = decoder(f)
+                except Exception:
+                    self._unreadableSerialNums.add(serialNum)
+                    continue
+            names[user.name()] = serialNum
+            externalIds[user.externalId()] = serialNum
+
+    def _userForIndex(self, key, value, attr):
+        """Get the user for the given index entry or None if not found.
+
+        If the index entry turns out to be stale, the index is rebuilt.
+        If there is no index entry, users missing in the index are added,
+        but only if the user directory has been changed since the last scan.
+        """
+        serialNum = self.index()[key].get(value)
+        if serialNum is None:
+            if not (self._userDirChanged() and self.addMissingUsers()):
+                return None
+        else:
+            user = self.userForSerialNum(serialNum, None)
+            if user is not None and getattr(user, attr)() == value:
+                return user
+            self.rebuildIndex()
+        serialNum = self.index()[key].get(value)
+        if serialNum is not None:
+            return self.userForSerialNum(serialNum, None)
+        return None
+
+    # endregion Index
+
     # region UserManager customizations
 
     def setUserClass(self, userClass):
@@ -98,7 +333,10 @@ class UserManagerToFile(UserManager):
 
     def nextSerialNum(self):
         result = self._nextSerialNum
-        self._nextSerialNum += 1
+        # skip serial numbers used by other managers or processes
+        while os.path.exists(os.path.join(self.userDir(), f'{result}.user')):
+            result += 1
+        self._nextSerialNum = result + 1
         return result
 
     def addUser(self, user):
@@ -116,23 +354,17 @@ class UserManagerToFile(UserManager):
         return self.loadUser(serialNum, default)
 
     def userForExternalId(self, externalId, default=NoDefault):
-        for user in self._cachedUsers:
-            if user.externalId() == externalId:
-                return user
-        for user in self.users():
-            if user.externalId() == externalId:
-                return user
+        user = self._userForIndex('externalIds', externalId, 'externalId')
+        if user is not None:
+            return user
         if default is NoDefault:
             raise KeyError(externalId)
         return default
 
     def userForName(self, name, default=NoDefault):
-        for user in self._cachedUsers:
-            if user.name() == name:
-                return user
-        for user in self.users():
-            if user.name() == name:
-                return user
+        user = self._userForIndex('names', name, 'name')
+        if user is not None:
+            return user
         if default is NoDefault:
             raise KeyError(name)
         return default
@@ -172,8 +404,10 @@ class UserMixIn:
 
     def save(self):
         # pylint: disable=no-member
+        manager = self.manager()
         with open(self.filename(), 'wb') as f:
-            self.manager().encoder()(self, f)
+            manager.encoder()(self, f)
+        manager.updateIndex(self)
 
 
 class _UserList:
@@ -206,3 +440,19 @@ class _UserList:
 
     def __len__(self):
         return self._count
+
+
+def main(args=None):
+    """Rebuild the index of the user directory given on the command line."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Rebuild the index of a UserKit user directory")
+    parser.add_argument('userDir', help="The directory with the user files")
+    args = parser.parse_args(args)
+    mgr = UserManagerToFile()
+    mgr.setUserDir(args.userDir)
+    print(f'Indexed {mgr.rebuildIndex()} users.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""The UserManagerToSqlite class."""
+
+import os
+import sqlite3
+import threading
+
+from copy import copy
+from pickle import loads, dumps, HIGHEST_PROTOCOL
+
+from MiscUtils import NoDefault
+from MiscUtils.MixIn import MixIn
+
+from .User import User
+from .UserManager import UserManager
+
+
+def dumpsWithHighestProtocol(obj):
+    """Same as pickle.dumps, but by default with the highest protocol."""
+    return dumps(obj, HIGHEST_PROTOCOL)
+
+
+class UserManagerToSqlite(UserManager):
+    """User manager storing user data in an SQLite database.
+
+    When using this user manager, make sure you invoke setDatabase()
+    and that the database file and its directory are writeable by your
+    application. The users are stored in a table with the serial number,
+    name and external id of each user in indexed columns, so that users
+    can be looked up without loading any other users.
+
+    The default database is the file 'Users.sqlite' in the current
+    working directory, but relying on the current directory is often
+    a bad practice.
+    """
+
+    # region Init
+
+    def __init__(self, userClass=None, database=None):
+        UserManager.__init__(self, userClass=userClass)
+        self.setEncoderDecoder(dumpsWithHighestProtocol, loads)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.setDatabase(database or os.path.join(
+            os.getcwd(), 'Users.sqlite'))
+
+    def shutDown(self):
+        self.closeConnections()
+        UserManager.shutDown(self)
+
+    # endregion Init
+
+    # region Database specifics
+
+    def database(self):
+        return self._database
+
+    def setDatabase(self, database):
+        """Set the path of the database file where users are stored.
+
+        The database and the table for the users are created if necessary.
+        """
+        self.closeConnections()
+        self._database = database
+        with self.connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'serialNum INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL,'
+                ' externalId TEXT UNIQUE NOT NULL, data BLOB NOT NULL)')
+
+    def connection(self):
+        """Get the database connection for the current thread."""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self._database, check_same_thread=False)
+            with self._lock:
+                self._connections.append(conn)
+                self._local.connection = conn
+        return conn
+
+    def closeConnections(self):
+        """Close all connections to the database."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def encodeUser(self, user):
+        """Encode the given user for storage in the database.
+
+        The manager of the user is not stored with the user.
+        """
+        user = copy(user)
+        user._manager = None
+        return self.encoder()(user)
+
+    def decodeUser(self, data):
+        """Decode the given user data and attach the user to the manager."""
+        user = self.decoder()(data)
+        user._manager = self
+        return user
+
+    def saveUser(self, user):
+        """Save the given user in the database."""
+        with self.connection() as conn:
+            conn.execute(
+                'UPDATE users SET data=? WHERE serialNum=?',
+                (self.encodeUser(user), user.serialNum()))
+
+    def loadUser(self, serialNum, default=NoDefault):
+        """Load the user with the given serial number from the database.
+
+        If there is no such user, a KeyError will be raised unless
+        a default value was passed, in which case that value is returned.
+        """
+        return self._loadUser('serialNum', serialNum, default)
+
+    def _loadUser(self, column, value, default=NoDefault):
+        """Load the user with the given value in the given column."""
+        row = self.connection().execute(
+            f'SELECT serialNum, data FROM users WHERE {column}=?',
+            (value,)).fetchone()
+        if row is None:
+            if default is NoDefault:
+                raise KeyError(value)
+            return default
+        return self._cachedUser(*row)
+
+    def _cachedUser(self, serialNum, data):
+        """Get the cached user or decode and cache the user data."""
+        user = self._cachedUsersBySerialNum.get(serialNum)
+        if user is None:
+            user = self.decodeUser(data)
+            self._cachedUsers.append(user)
+            self._cachedUsersBySerialNum[serialNum] = user
+        return user
+
+    # endregion Database specifics
+
+    # region UserManager customizations
+
+    def setUserClass(self, userClass):
+        """Overridden to mix in UserMixIn to the class that is passed in."""
+        MixIn(userClass, UserMixIn)
+        UserManager.setUserClass(self, userClass)
+
+    # endregion UserManager customizations
+
+    # region UserManager concrete methods
+
+    def addUser(self, user):
+        if not isinstance(user, User):
+            raise TypeError(f'{user} is not a User object')
+        try:
+            with self.connection() as conn:
+                serialNum = conn.execute(
+                    'INSERT INTO users (name, externalId, data)'
+                    ' VALUES (?, ?, ?)',
+                    (user.name(), user.externalId(), b'')).lastrowid
+                user.setSerialNum(serialNum)
+                conn.execute(
+                    'UPDATE users SET data=? WHERE serialNum=?',
+                    (self.encodeUser(user), serialNum))
+        except sqlite3.IntegrityError as e:
+            raise KeyError(
+                f'There is already a user named {user.name()!r}.') from e
+        UserManager.addUser(self, user)
+
+    def userForSerialNum(self, serialNum, default=NoDefault):
+        user = self._cachedUsersBySerialNum.get(serialNum)
+        if user is not None:
+            return user
+        return self.loadUser(serialNum, default)
+
+    def userForExternalId(self, externalId, default=NoDefault):
+        return self._loadUser('externalId', externalId, default)
+
+    def userForName(self, name, default=NoDefault):
+        return self._loadUser('name', name, default)
+
+    def users(self):
+        cachedUser = self._cachedUser
+        return [cachedUser(*row) for row in self.connection().execute(
+            'SELECT serialNum, data FROM users ORDER BY serialNum')]
+
+    def activeUsers(self):
+        return [user for user in self.users() if user.isActive()]
+
+    def inactiveUsers(self):
+        return [user for user in self.users() if not user.isActive()]
+
+    # endregion UserManager concrete methods
+
+    # region Encoder/decoder
+
+    def encoder(self):
+        return self._encoder
+
+    def decoder(self):
+        return self._decoder
+
+    def setEncoderDecoder(self, encoder, decoder):
+        """Set the functions for encoding and decoding user data.
+
+        These must work like pickle.dumps() and pickle.loads().
+        """
+        self._encoder = encoder
+        self._decoder = decoder
+
+    # endregion Encoder/decoder
+
+
+class UserMixIn:
+
+    def save(self):
+        # pylint: disable=no-member
+        self.manager().saveUser(self)
@@ -1,10 +1,65 @@
 """This module defines a class for writing responses using WSGI."""
 
+from mmap import mmap, ACCESS_READ
+
 
 class InvalidCommandSequence(ConnectionError):
     """Invalid command sequence error"""
 
 
+class FileIterator:
+    """Iterable delivering the content of a file in blocks.
+
+    The file is read from its current position, using a memory map if
+    possible. If a length is given, only that many bytes will be delivered.
+    This is used if the WSGI server does not provide a wsgi.file_wrapper.
+    """
+
+    def __init__(self, file, blockSize=8192, length=None):
+        self._file = file
+        self._blockSize = blockSize
+        self._length = length
+
+    def __iter__(self):
+        f = self._file
+        blockSize = self._blockSize
+        start = f.tell()
+        try:
+            m = mmap(f.fileno(), 0, access=ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # not a real file or an empty file
+            length = self._length
+            while length is None or length > 0:
+                size = blockSize if length is None else min(
+                    blockSize, length)
+                if not (data := f.read(size)):
+                    break
+                if length is not None:
+                    length -= len(data)
+                yield data
+        else:
+            with m:
+                end = len(m)
+                if self._length is not None:
+                    end = min(end, start + self._length)
+                for pos in range(start, end, blockSize):
+                    yield m[pos:min(pos + blockSize, end)]
+
+    def close(self):
+        """Close the underlying file."""
+        self._file.close()
+
+
+def iterChunksAndFile(chunks, fileIterable):
+    """Iterate over the given chunks and then over the file iterable."""
+    try:
+        yield from chunks
+        yield from fileIterable
+    finally:
+        if close := getattr(fileIterable, 'close', None):
+            close()
+
+
 class WSGIStreamOut:
     """This is a response stream to the client using WSGI.
 
@@ -21,9 +76,20 @@ class WSGIStreamOut:
         The size of the data buffer. This is only used when autocommit
         is True. If not using autocommit, the whole response is
         buffered and sent in one shot when the servlet is done.
+        Chunks of output smaller than this size will be combined into
+        larger chunks when sending the data, larger chunks will be passed
+        on to the WSGI server unaltered, without copying them.
     `_useWrite`:
         Whether the write callable that is returned by start_response()
         shall be used to deliver the response.
+    `_fileWrapper`:
+        The wsgi.file_wrapper provided by the WSGI server, if any.
+        It is used for files that shall be sent with `sendFile()`.
+    `_compressor`:
+        A streaming compressor for the content coding of the response,
+        if the response shall be compressed. Every flush of the stream
+        flushes the compressor as well, so that streamed output can be
+        decompressed by the client immediately.
     `flush()`:
         Send the accumulated response data now. Will ask the `Response`
         to commit if it hasn't already done so.
@@ -31,7 +97,7 @@ class WSGIStreamOut:
 
     def __init__(self, startResponse,
                  autoCommit=False, bufferSize=8192,
-                 useWrite=True, encoding='utf-8'):
+                 useWrite=True, encoding='utf-8', fileWrapper=None):
         self._startResponse = startResponse
         self._autoCommit = autoCommit
         self._bufferSize = bufferSize
@@ -39,12 +105,14 @@ class WSGIStreamOut:
         self._encoding = encoding
         self._committed = False
         self._needCommit = False
-        self._buffer = b''
         self._chunks = []
         self._chunkLen = 0
         self._closed = False
         self._write = None
         self._iterable = []
+        self._fileWrapper = fileWrapper
+        self._file = None
+        self._compressor = None
 
     def startResponse(self, status, headers):
         """Start the response with the given status and headers."""
@@ -80,38 +148,89 @@ class WSGIStreamOut:
         """Set the buffer size."""
         self._bufferSize = int(bufferSize)
 
-    def flush(self):
-        """Flush stream."""
+    def compressor(self):
+        """Get the compressor used for the response, if any."""
+        return self._compressor
+
+    def setCompressor(self, compressor):
+        """Set a compressor that shall be used for the response.
+
+        The compressor must provide the methods compress(), flush() and
+        finish(). Invalid if we are already committed.
+        """
+        if self._committed or self._closed:
+            raise InvalidCommandSequence
+        if compressor and self._file:
+            self.readFile()
+        self._compressor = compressor
+
+    def compress(self, finish=False):
+        """Compress the accumulated data with the compressor.
+
+        If finish is true, the compressed stream is finished, and no further
+        data will be compressed. Otherwise, the compressor is flushed.
+        """
+        if not (compressor := self._compressor):
+            return
+        compress = compressor.compress
+        chunks = [compress(chunk) for chunk in self._chunks]
+        if finish:
+            chunks.append(compressor.finish())
+            self._compressor = None
+        else:
+            chunks.append(compressor.flush())
+        self._chunks = chunks = [chunk for chunk in chunks if chunk]
+        self._chunkLen = sum(map(len, chunks))
+
+    def flush(self, finish=False):
+        """Flush stream.
+
+        If the response is compressed, the compressor will be flushed
+        as well, or the compressed stream will be finished if finish is true.
+        """
         if self._closed:
             raise ConnectionAbortedError
         if not self._committed:
             if self._autoCommit:
                 self._needCommit = True
             return
+        if self._compressor:
+            self.compress(finish)
         if self._useWrite:
             if not self._write:
                 raise InvalidCommandSequence
             write = self._write
         else:
             write = self._iterable.append
-        try:
-            self._buffer += b''.join(self._chunks)
-        finally:
-            self._chunks = []
-            self._chunkLen = 0
-        sent = 0
-        buffer = self._buffer
-        resLen = len(buffer)
+        chunks = self._chunks
+        self._chunks = []
+        self._chunkLen = 0
         bufferSize = self._bufferSize
-        while sent < resLen:
-            try:
-                write(buffer[sent:sent + bufferSize])
-            except Exception as e:
-                print("StreamOut Error:", e)
-                self._closed = True
-                raise ConnectionAbortedError from e
-            sent += bufferSize
-        self.pop(sent)
+        pending = []
+        pendingLen = 0
+        try:
+            for chunk in chunks:
+                chunkLen = len(chunk)
+                if chunkLen >= bufferSize:
+                    if pending:
+                        write(pending[0] if len(pending) == 1
+                              else b''.join(pending))
+                        pending = []
+                        pendingLen = 0
+                    write(chunk)
+                elif chunkLen:
+                    pending.append(chunk)
+                    pendingLen += chunkLen
+                    if pendingLen >= bufferSize:
+                        write(b''.join(pending))
+                        pending = []
+                        pendingLen = 0
+            if pending:
+                write(pending[0] if len(pending) == 1 else b''.join(pending))
+        except Exception as e:
+            print("StreamOut Error:", e)
+            self._closed = True
+            raise ConnectionAbortedError from e
 
     def buffer(self):
         """Return accumulated data which has not yet been flushed.
@@ -119,10 +238,9 @@ class WSGIStreamOut:
         We want to be able to get at this data without having to call
         flush() first, so that we can (for example) integrate automatic
         HTML validation.
+
+        Note that the accumulated chunks need to be joined for this.
         """
-        if self._buffer:  # if flush has been called, return what was flushed
-            return self._buffer
-        # otherwise return the buffered chunks
         return b''.join(self._chunks)
 
     def clear(self):
@@ -132,13 +250,15 @@ class WSGIStreamOut:
         """
         if self._committed:
             raise InvalidCommandSequence
-        self._buffer = b''
         self._chunks = []
         self._chunkLen = 0
+        if self._file:
+            self._file[0].close()
+            self._file = None
 
     def close(self):
         """Close this buffer. No more data may be sent."""
-        self.flush()
+        self.flush(finish=True)
         self._closed = True
         self._committed = True
         self._autoCommit = True
@@ -150,7 +270,7 @@ class WSGIStreamOut:
 
     def size(self):
         """Return the current size of the data held here."""
-        return self._chunkLen + len(self._buffer)
+        return self._chunkLen
 
     def prepend(self, output):
         """Add the output to the front of the response buffer.
@@ -166,15 +286,21 @@ class WSGIStreamOut:
             if not isinstance(output, str):
                 output = str(output)
             output = output.encode(self._encoding)
-        if self._buffer:
-            self._buffer = output + self._buffer
-        else:
-            self._chunks.insert(0, output)
-            self._chunkLen += len(output)
+        self._chunks.insert(0, output)
+        self._chunkLen += len(output)
 
     def pop(self, count):
         """Remove count bytes from the front of the buffer."""
-        self._buffer = self._buffer[count:]
+        chunks = self._chunks
+        while count > 0 and chunks:
+            chunkLen = len(chunks[0])
+            if chunkLen > count:
+                chunks[0] = chunks[0][count:]
+                self._chunkLen -= count
+                break
+            del chunks[0]
+            self._chunkLen -= chunkLen
+            count -= chunkLen
 
     def committed(self):
         """Check whether the outptu is already committed"""
@@ -199,8 +325,57 @@ class WSGIStreamOut:
         self.flush()
 
     def iterable(self):
-        """Return the WSGI iterable."""
-        return self._iterable
+        """Return the WSGI iterable.
+
+        If a file has been sent with `sendFile()`, the iterable will deliver
+        the content of that file after the other accumulated data, using the
+        wsgi.file_wrapper of the WSGI server if available.
+        """
+        if not self._file:
+            return self._iterable
+        f, blockSize, length = self._file
+        self._file = None
+        if length is None and self._fileWrapper:
+            fileIterable = self._fileWrapper(f, blockSize)
+        else:
+            fileIterable = FileIterator(f, blockSize, length)
+        if self._iterable:
+            return iterChunksAndFile(self._iterable, fileIterable)
+        return fileIterable
+
+    def sendFile(self, file, blockSize=8192, length=None):
+        """Send the content of the given binary file after the other output.
+
+        The file is read from its current position. If a length is given,
+        only that many bytes will be sent. The file will be handed over
+        to the WSGI server when the stream has been closed, so that the
+        server can send it efficiently, and it will be closed afterwards.
+        If more output is written after this, the file will be read now.
+        The file will also be read now if the response is compressed.
+        """
+        if self._closed or self._file:
+            raise InvalidCommandSequence
+        self._file = (file, blockSize, length)
+        if self._compressor:
+            self.readFile()
+
+    def hasFile(self):
+        """Check whether a file shall be sent after the other output."""
+        return self._file is not None
+
+    def readFile(self):
+        """Read the file that has been sent with `sendFile()` into the buffer.
+
+        This is used when more output is written after the file.
+        """
+        f, blockSize, length = self._file
+        self._file = None
+        try:
+            for chunk in FileIterator(f, blockSize, length):
+                self._chunks.append(chunk)
+                self._chunkLen += len(chunk)
+        finally:
+            f.close()
 
     def write(self, output):
         """Write output to the buffer.
@@ -210,6 +385,8 @@ class WSGIStreamOut:
         """
         if self._closed:
             raise ConnectionAbortedError
+        if self._file:
+            self.readFile()
         if not isinstance(output, bytes):
             if not isinstance(output, str):
                 output = str(output)
@@ -5,6 +5,7 @@ cgi.FieldStorage class with a slight modification so that fields passed in the
 body of a POST request override any fields passed in the query string.
 """
 
+import codecs
 import locale
 import os
 import re
@@ -20,6 +21,11 @@ from urllib.parse import parse_qsl
 maxlen = 0  # unlimited input
 
 
+class LimitExceeded(ValueError):
+    """The size limit for the request body or one of its parts was exceeded.
+    """
+
+
 class FieldStorage:
     """Store a sequence of fields, reading multipart/form-data.
 
@@ -72,7 +78,9 @@ class FieldStorage:
     def __init__(self, fp=None, headers=None, outerboundary=b'',
                  environ=None, keep_blank_values=False, strict_parsing=False,
                  limit=None, encoding='utf-8', errors='replace',
-                 max_num_fields=None, separator='&'):
+                 max_num_fields=None, separator='&',
+                 max_part_size=None, max_total_size=None,
+                 upload_handler=None):
         """Constructor.  Read multipart/* until last part.
         Arguments, all optional:
         fp: file pointer; default: sys.stdin.buffer
@@ -108,12 +116,29 @@ class FieldStorage:
 
         max_num_fields: int. If set, then __init__ throws a ValueError if
         there are more than n fields read by parse_qsl().
+
+        max_part_size: int. If set, then __init__ throws a LimitExceeded
+        error if one of the parts of a multipart form has more bytes.
+
+        max_total_size: int. If set, then __init__ throws a LimitExceeded
+        error if the body of the request has more bytes.
+
+        upload_handler: a callable that is called with the FieldStorage
+        of every uploaded file in a multipart form before its content is
+        read. It can return an object with a write() method, to which the
+        content is then passed in chunks instead of being stored in a
+        temporary file. This object is available as the file attribute of
+        the FieldStorage afterwards. If the handler returns None, the file
+        is stored as usual.
         """
         method = 'GET'
         self.keep_blank_values = keep_blank_values
         self.strict_parsing = strict_parsing
         self.max_num_fields = max_num_fields
         self.separator = separator
+        self.max_part_size = max_part_size
+        self.max_total_size = max_total_size
+        self.upload_handler = upload_handler
         if environ is None:
             environ = os.environ
         if 'REQUEST_METHOD' in environ:
@@ -200,6 +225,8 @@ class FieldStorage:
                 pass
             if maxlen and clen > maxlen:
                 raise ValueError('Maximum content length exceeded')
+            if max_total_size is not None and clen > max_total_size:
+                raise LimitExceeded('Maximum size of request body exceeded')
         self.length = clen
         if self.limit is None and clen >= 0:
             self.limit = clen
@@ -236,7 +263,7 @@ class FieldStorage:
     def __getattr__(self, name):
         if name != 'value':
             raise AttributeError(name)
-        if self.file:
+        if self.file and hasattr(self.file, 'seek'):
             self.file.seek(0)
             value = self.file.read()
             self.file.seek(0)
@@ -307,10 +334,15 @@ class FieldStorage:
 
     def read_urlencoded(self):
         """Internal: read data in query string format."""
-        qs = self.fp.read(self.length)
+        length = self.length
+        if length < 0 and self.max_total_size is not None:
+            length = self.max_total_size + 1
+        qs = self.fp.read(length)
         if not isinstance(qs, bytes):
             type_name = type(qs).__name__
             raise ValueError(f'{self.fp} should return bytes, got {type_name}')
+        if self.max_total_size is not None and len(qs) > self.max_total_size:
+            raise LimitExceeded('Maximum size of request body exceeded')
         qs = qs.decode(self.encoding, self.errors)
         kwargs = {
             'keep_blank_values': self.keep_blank_values,
@@ -348,6 +380,13 @@ class FieldStorage:
             self.list.extend(MiniFieldStorage(key, value)
                              for key, value in query)
 
+        if not isinstance(self.fp, MultipartStream):
+            # read the body in large chunks from now on
+            length = -1
+            if self.limit is not None and self.limit >= 0:
+                length = max(self.limit - self.bytes_read, 0)
+            self.fp = MultipartStream(self.fp, length, self.max_total_size)
+
         klass = self.FieldStorageClass or self.__class__
         first_line = self.fp.readline()
         if not isinstance(first_line, bytes):
@@ -386,7 +425,9 @@ class FieldStorage:
                 limit -= self.bytes_read
             part = klass(self.fp, headers, ib, environ, keep_blank_values,
                          strict_parsing, limit, self.encoding, self.errors,
-                         max_num_fields, self.separator)
+                         max_num_fields, self.separator,
+                         max_part_size=self.max_part_size,
+                         upload_handler=self.upload_handler)
 
             if max_num_fields is not None:
                 max_num_fields -= 1
@@ -408,7 +449,10 @@ class FieldStorage:
             self.skip_lines()
         else:
             self.read_lines()
-        self.file.seek(0)
+        try:
+            self.file.seek(0)
+        except AttributeError:  # file passed to the upload handler
+            pass
         # contrary to the standard library, we also parse the query string
         if self.qs_on_post:
             kwargs = {
@@ -451,19 +495,22 @@ class FieldStorage:
         self.file = self.__file = BytesIO(
             ) if self._binary_file else StringIO()
         if self.outerboundary:
-            self.read_lines_to_outerboundary()
+            if isinstance(self.fp, MultipartStream):
+                self.read_to_outerboundary()
+            else:
+                self.read_lines_to_outerboundary()
         else:
             self.read_lines_to_eof()
 
     def __write(self, line):
-        """line is always bytes, not string"""
+        """line is bytes, or a string that has already been decoded"""
         if self.__file is not None:
             if self.__file.tell() + len(line) > 1000:
                 self.file = self.make_file()
                 data = self.__file.getvalue()
                 self.file.write(data)
                 self.__file = None
-        if self._binary_file:
+        if self._binary_file or isinstance(line, str):
             self.file.write(line)
         else:
             self.file.write(line.decode(self.encoding, self.errors))
@@ -476,8 +523,51 @@ class FieldStorage:
             if not line:
                 self.done = -1
                 break
+            if (self.max_total_size is not None
+                    and self.bytes_read > self.max_total_size):
+                raise LimitExceeded('Maximum size of request body exceeded')
             self.__write(line)
 
+    def read_to_outerboundary(self):
+        """Internal: read chunks of data until outerboundary.
+
+        This is used instead of read_lines_to_outerboundary() when the data
+        comes from a MultipartStream, which searches the boundary in large
+        chunks of data instead of reading and checking line by line.
+        """
+        fp = self.fp
+        sink = None
+        if self.upload_handler and self.filename is not None:
+            sink = self.upload_handler(self)
+        decode = None
+        if sink is None:
+            write = self.__write
+            if not self._binary_file:
+                decode = codecs.getincrementaldecoder(self.encoding)(
+                    self.errors).decode
+
+                def write(data, write=write):
+                    write(decode(data))
+        else:
+            self.file = sink
+            self.__file = None
+            write = sink.write
+        max_size = self.max_part_size
+        size = 0
+
+        def write_chunk(data):
+            nonlocal size
+            size += len(data)
+            if max_size is not None and size > max_size:
+                raise LimitExceeded('Maximum size of form part exceeded')
+            write(data)
+
+        consumed = fp.consumed
+        self.done = fp.read_part(self.outerboundary, write_chunk)
+        self.bytes_read += fp.consumed - consumed
+        if decode:
+            self.__write(decode(b'', True))
+
     def read_lines_to_outerboundary(self):
         """Internal: read lines until outerboundary.
 
@@ -574,6 +664,144 @@ class FieldStorage:
             'w+', encoding=self.encoding, newline='\n')
 
 
+class MultipartStream:
+    """Buffered input stream for the body of a multipart request.
+
+    The data is read from the underlying file in large chunks, but never
+    beyond the given length, if the length is known. The read() and
+    readline() methods can be used like those of a file, while read_part()
+    quickly copies the data of a part up to the next boundary.
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, fp, length=-1, max_size=None):
+        self.fp = fp
+        self.remaining = length
+        self.max_size = max_size
+        self.buffer = bytearray()
+        self.total = 0  # bytes read from the underlying file
+
+    @property
+    def consumed(self):
+        """The number of bytes that have been consumed from the stream."""
+        return self.total - len(self.buffer)
+
+    def fill(self):
+        """Read the next chunk into the buffer. Return False at EOF."""
+        remaining = self.remaining
+        if not remaining:
+            return False
+        size = self.chunk_size
+        if 0 < remaining < size:
+            size = remaining
+        data = self.fp.read(size)
+        if not isinstance(data, bytes):
+            type_name = type(data).__name__
+            raise ValueError(f'{self.fp} should return bytes, got {type_name}')
+        if not data:
+            self.remaining = 0
+            return False
+        if remaining > 0:
+            self.remaining -= len(data)
+        self.total += len(data)
+        if self.max_size is not None and self.total > self.max_size:
+            raise LimitExceeded('Maximum size of request body exceeded')
+        self.buffer += data
+        return True
+
+    def read(self, size=-1):
+        """Read up to size bytes, or everything if size is negative."""
+        buffer = self.buffer
+        while size < 0 or len(buffer) < size:
+            if not self.fill():
+                break
+        if size < 0 or size > len(buffer):
+            size = len(buffer)
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        """Read one line, but not more than size bytes if size is given."""
+        buffer = self.buffer
+        start = 0
+        while (pos := buffer.find(b'\n', start)) < 0:
+            if 0 <= size <= len(buffer):
+                break
+            start = len(buffer)
+            if not self.fill():
+                break
+        end = len(buffer) if pos < 0 else pos + 1
+        if 0 <= size < end:
+            end = size
+        line = bytes(buffer[:end])
+        del buffer[:end]
+        return line
+
+    def read_part(self, boundary, write):
+        """Pass the data up to the next boundary line to the write function.
+
+        The line break before the boundary is not part of the data, and the
+        boundary line itself is consumed. Return 0 if a boundary followed by
+        another part was found, 1 for the final boundary, and -1 at EOF.
+        """
+        delimiter = b'--' + boundary
+        separator = b'\n' + delimiter
+        keep = len(separator) + 1  # we may need to strip a carriage return
+        buffer = self.buffer
+        while len(buffer) < len(delimiter) and self.fill():
+            pass
+        # the part may be empty, so the boundary can come immediately
+        if buffer.startswith(delimiter):
+            found = self._boundary_line(len(delimiter))
+            if found:
+                del buffer[:found[0]]
+                return found[1]
+        start = 0
+        while True:
+            pos = buffer.find(separator, start)
+            if pos < 0:
+                if len(buffer) > keep:
+                    write(bytes(buffer[:-keep]))
+                    del buffer[:-keep]
+                start = max(len(buffer) - keep, 0)
+                if not self.fill():
+                    if buffer:
+                        write(bytes(buffer))
+                        buffer.clear()
+                    return -1
+                continue
+            found = self._boundary_line(pos + len(separator))
+            if found:
+                end = pos - 1 if pos and buffer[pos - 1] == 13 else pos
+                if end:
+                    write(bytes(buffer[:end]))
+                del buffer[:found[0]]
+                return found[1]
+            start = pos + 1
+
+    def _boundary_line(self, pos):
+        """Check whether the delimiter ending at pos ends a boundary line.
+
+        The buffer may be filled up, but is not shifted. If this is a
+        boundary line, return the position after the line and the done flag.
+        """
+        buffer = self.buffer
+        while (eol := buffer.find(b'\n', pos)) < 0:
+            if len(buffer) - pos > 1024 or not self.fill():
+                break
+        rest = buffer[pos:] if eol < 0 else buffer[pos:eol]
+        rest = rest.rstrip()
+        if rest == b'--':
+            done = 1
+        elif rest:
+            return None
+        else:
+            done = 0
+        return (len(buffer) if eol < 0 else eol + 1), done
+
+
 class MiniFieldStorage:
     """Like FieldStorage, for use when no file uploads are possible."""
     filename = None
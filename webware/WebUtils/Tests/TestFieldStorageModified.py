@@ -3,8 +3,10 @@
 import unittest
 
 from io import BytesIO
+from unittest.mock import patch
 
-from WebUtils.FieldStorage import FieldStorage, isBinaryType
+from WebUtils.FieldStorage import (
+    FieldStorage, LimitExceeded, MultipartStream, isBinaryType)
 
 
 class TestFieldStorage(unittest.TestCase):
@@ -365,6 +367,121 @@ class TestFieldStorage(unittest.TestCase):
         self.assertEqual(fs.bytes_read, length)
         self.assertEqual(fs.file.read(), payload)
 
+    @staticmethod
+    def multipartRequest(body, boundary='boundary', length=True, **kwargs):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={boundary}'}
+        if length:
+            environ['CONTENT_LENGTH'] = str(len(body))
+        return FieldStorage(fp=BytesIO(body), environ=environ, **kwargs)
+
+    @staticmethod
+    def multipartBody(*parts, boundary=b'boundary', eol=b'\r\n'):
+        lines = []
+        for name, filename, content in parts:
+            disposition = f'form-data; name="{name}"'
+            if filename:
+                disposition += f'; filename="{filename}"'
+            lines.extend((b'--' + boundary,
+                          b'Content-Disposition: ' + disposition.encode()))
+            if filename:
+                lines.append(b'Content-Type: application/octet-stream')
+            lines.extend((b'', content))
+        lines.extend((b'--' + boundary + b'--', b''))
+        return eol.join(lines)
+
+    def testMultipartWithBinaryData(self):
+        data = bytes(range(256)).replace(b'\n', b'') * 1000
+        for chunkSize in (7, 64, 1000, 1 << 16):
+            with patch.object(MultipartStream, 'chunk_size', chunkSize):
+                for length in (True, False):
+                    fs = self.multipartRequest(self.multipartBody(
+                        ('a', None, b'1'), ('f', 'data.bin', data),
+                        ('b', None, b'2')), length=length)
+                    self.assertEqual(fs.getfirst('a'), '1')
+                    self.assertEqual(fs['f'].value, data)
+                    self.assertEqual(fs['f'].filename, 'data.bin')
+                    self.assertEqual(fs.getfirst('b'), '2')
+
+    def testMultipartWithLineBreaksAndDashes(self):
+        data = b'\r\n--\r\n--bound\r\n--boundaryX\n\r\r\n--boundary--x\r\n'
+        for chunkSize in (3, 11, 1 << 16):
+            with patch.object(MultipartStream, 'chunk_size', chunkSize):
+                for eol in (b'\r\n', b'\n'):
+                    fs = self.multipartRequest(self.multipartBody(
+                        ('f', 'data.bin', data), ('e', None, b''),
+                        ('g', 'empty.bin', b''), eol=eol))
+                    self.assertEqual(fs['f'].value, data)
+                    self.assertEqual(fs.getfirst('e'), '')
+                    self.assertEqual(fs['g'].value, b'')
+
+    def testMultipartWithTextData(self):
+        text = 'K\u00e4se \u20ac ' * 100
+        with patch.object(MultipartStream, 'chunk_size', 5):
+            fs = self.multipartRequest(self.multipartBody(
+                ('t', None, text.encode())))
+        self.assertEqual(fs.getfirst('t'), text)
+
+    def testMultipartDoesNotReadBeyondContentLength(self):
+        body = self.multipartBody(('a', None, b'1'))
+        fp = BytesIO(body + b'next request')
+        fs = FieldStorage(fp=fp, environ={
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'multipart/form-data; boundary=boundary',
+            'CONTENT_LENGTH': str(len(body))})
+        self.assertEqual(fs.getfirst('a'), '1')
+        self.assertEqual(fp.read(), b'next request')
+
+    def testMultipartWithPartSizeLimit(self):
+        body = self.multipartBody(('f', 'data.bin', b'x' * 100))
+        fs = self.multipartRequest(body, max_part_size=100)
+        self.assertEqual(fs['f'].value, b'x' * 100)
+        self.assertRaises(
+            LimitExceeded, self.multipartRequest, body, max_part_size=99)
+
+    def testMultipartWithTotalSizeLimit(self):
+        body = self.multipartBody(('f', 'data.bin', b'x' * 100))
+        fs = self.multipartRequest(body, max_total_size=len(body))
+        self.assertEqual(fs['f'].value, b'x' * 100)
+        for length in (True, False):
+            self.assertRaises(
+                LimitExceeded, self.multipartRequest, body,
+                length=length, max_total_size=len(body) - 1)
+
+    def testPostRequestWithTotalSizeLimit(self):
+        for length in (True, False):
+            environ = {'REQUEST_METHOD': 'POST'}
+            if length:
+                environ['CONTENT_LENGTH'] = '7'
+            fs = FieldStorage(fp=BytesIO(b'a=1&b=2'), environ=environ,
+                              max_total_size=7)
+            self.assertEqual(fs.getfirst('b'), '2')
+            self.assertRaises(
+                LimitExceeded, FieldStorage, fp=BytesIO(b'a=1&b=2'),
+                environ=environ, max_total_size=6)
+
+    def testMultipartWithUploadHandler(self):
+        chunks = []
+
+        class Sink:
+            write = chunks.append
+
+        def handler(part):
+            self.assertEqual(part.name, 'f')
+            self.assertEqual(part.filename, 'data.bin')
+            return Sink()
+
+        data = b'x' * 100000
+        fs = self.multipartRequest(self.multipartBody(
+            ('a', None, b'1'), ('f', 'data.bin', data)),
+            upload_handler=handler)
+        self.assertEqual(fs.getfirst('a'), '1')
+        self.assertIsInstance(fs['f'].file, Sink)
+        self.assertIsNone(fs['f'].value)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), data)
+
     def testIsBinaryType(self):
         self.assertIs(isBinaryType('application/json'), False)
         self.assertIs(isBinaryType('application/xml'), False)
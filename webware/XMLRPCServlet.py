@@ -5,10 +5,18 @@ Written by Geoffrey Talvola
 See Examples/XMLRPCExample.py for sample usage.
 """
 
+import codecs
 import sys
 import traceback
 import xmlrpc.client
+import zlib
 
+from gzip import compress as gzipCompress
+
+from HTTPExceptions import (
+    HTTPBadRequest, HTTPException, HTTPLengthRequired,
+    HTTPRequestEntityTooLarge, HTTPUnsupportedMediaType)
+from ResponseCompression import preferredEncoding
 from RPCServlet import RPCServlet
 
 
@@ -17,6 +25,17 @@ class XMLRPCServlet(RPCServlet):
 
     See Examples/XMLRPCExample.py for sample usage.
 
+    Several calls can be made in one request using system.multicall.
+    Every call is executed separately, so that a call raising an exception
+    results in a fault for that call only, while the other calls succeed.
+
+    Requests may be compressed with gzip or deflate, and responses are
+    compressed with gzip if they are large and the client accepts this,
+    as done by the standard xmlrpc.client module. Unless stream_parse is
+    set to False, requests are read and decompressed in chunks which are
+    fed to the parser directly, so that the whole request body does not
+    need to be kept in memory.
+
     For more Pythonic convenience at the cost of language independence,
     see PickleRPCServlet.
     """
@@ -25,6 +44,16 @@ class XMLRPCServlet(RPCServlet):
     # as part of a response.
     allow_none = True
 
+    # Responses with at least this many bytes are compressed with gzip
+    # if the client accepts this. Set to None to never compress responses.
+    encode_threshold = 1400
+
+    # Set to False if the request shall be read completely before parsing.
+    stream_parse = True
+
+    # The size of the chunks read from the request when parsing it.
+    readBufferSize = 32 * 1024
+
     def respondToPost(self, transaction):
         """Respond to a Post request.
 
@@ -34,17 +63,20 @@ class XMLRPCServlet(RPCServlet):
         """
         try:
             # get arguments
-            data = transaction.request().rawInput(rewind=1).read()
-            encoding = _getXmlDeclAttr(data, "encoding")
-            params, method = xmlrpc.client.loads(data)
+            params, method, encoding = self.loadRequest(transaction)
+            # answer with the encoding of the request if Python knows it
+            encoding = _knownEncoding(encoding)
 
             # generate response
+            excInfo = None
             try:
                 # This first test helps us to support PythonWin, which uses
                 # repeated calls to __methods__.__getitem__ to determine the
                 # allowed methods of an object.
                 if method == '__methods__.__getitem__':
                     response = self.exposedMethods()[params[0]]
+                elif method == 'system.multicall':
+                    response, excInfo = self.multicall(*params)
                 else:
                     response = self.call(method, *params)
                 if not isinstance(response, tuple):
@@ -52,20 +84,24 @@ class XMLRPCServlet(RPCServlet):
             except xmlrpc.client.Fault as fault:
                 response = xmlrpc.client.dumps(
                     fault, encoding=encoding, allow_none=self.allow_none)
-                self.sendOK('text/xml', response, transaction)
+                self.sendResponse(transaction, response, encoding)
                 self.handleException(transaction)
             except Exception as e:
                 fault = self.resultForException(e, transaction)
                 response = xmlrpc.client.dumps(
                     xmlrpc.client.Fault(1, fault),
                     encoding=encoding, allow_none=self.allow_none)
-                self.sendOK('text/xml', response, transaction)
+                self.sendResponse(transaction, response, encoding)
                 self.handleException(transaction)
             else:
                 response = xmlrpc.client.dumps(
                     response, methodresponse=1,
                     encoding=encoding, allow_none=self.allow_none)
-                self.sendOK('text/xml', response, transaction)
+                self.sendResponse(transaction, response, encoding)
+                if excInfo:
+                    self.handleException(transaction, excInfo)
+        except HTTPException:
+            raise  # let the application send the proper response
         except Exception:
             # internal error, report as HTTP server error
             print('XMLRPCServlet internal error')
@@ -74,11 +110,193 @@ class XMLRPCServlet(RPCServlet):
             transaction.response().setStatus(500, 'Server Error')
             self.handleException(transaction)
 
+    def multicall(self, calls):
+        """Execute several calls (system.multicall).
+
+        Every call must be a struct with the methodName and the params.
+        Returns a tuple of the list of results, in which the result of a
+        successful call is wrapped in a list and the result of a failed call
+        is a struct with the faultCode and faultString, and the info of the
+        first exception raised by a call, which will be reported after the
+        response has been sent, or None if no exception has been raised.
+        """
+        results = []
+        excInfo = None
+        for call in calls:
+            try:
+                try:
+                    methodName = call['methodName']
+                    params = call.get('params', ())
+                except (AttributeError, KeyError, TypeError):
+                    raise xmlrpc.client.Fault(
+                        1, 'Invalid call in system.multicall') from None
+                if methodName == 'system.multicall':
+                    raise xmlrpc.client.Fault(
+                        1, 'Recursive system.multicall is not allowed')
+                result = self.call(methodName, *params)
+            except xmlrpc.client.Fault as fault:
+                results.append({
+                    'faultCode': fault.faultCode,
+                    'faultString': fault.faultString})
+            except Exception as e:
+                if excInfo is None:
+                    excInfo = sys.exc_info()
+                results.append({
+                    'faultCode': 1, 'faultString': self.resultForException(
+                        e, self.transaction())})
+            else:
+                results.append([result])
+        return results, excInfo
+
+    def loadRequest(self, transaction):
+        """Read, decompress and parse the request.
+
+        Returns the params, the method name and the encoding of the request.
+        Requests without a Content-Length are rejected, unless the server
+        has marked the end of the input stream.
+        """
+        request = transaction.request()
+        env = request.environ()
+        length = env.get('CONTENT_LENGTH')
+        if length:
+            try:
+                remaining = int(length)
+            except ValueError as e:
+                raise HTTPBadRequest('Invalid Content-Length') from e
+        elif env.get('wsgi.input_terminated'):
+            remaining = None  # read until the end marked by the server
+        else:
+            raise HTTPLengthRequired
+        data = request.rawInput(rewind=1)
+        decompressor = self.decompressor(request)
+        maxSize = transaction.application().setting('MaxUploadSize')
+        size = 0
+        if self.stream_parse:
+            parser, unmarshaller = xmlrpc.client.getparser()
+            bufferSize = self.readBufferSize
+            encoding = None
+            head = b''
+            while True:
+                if remaining is None:
+                    chunk = data.read(bufferSize)
+                elif remaining > 0:
+                    chunk = data.read(min(remaining, bufferSize))
+                    remaining -= len(chunk)
+                else:
+                    chunk = b''
+                if not chunk:
+                    break
+                if decompressor:
+                    chunk = self.decompress(decompressor, chunk, (
+                        maxSize - size) if maxSize else None)
+                size += len(chunk)
+                if maxSize and size > maxSize:
+                    raise HTTPRequestEntityTooLarge
+                if head is not None:
+                    # the encoding can only be determined at the start
+                    head += chunk
+                    if b'?>' in head or len(head) >= bufferSize:
+                        encoding = _getRequestEncoding(head)
+                        head = None
+                parser.feed(chunk)
+            if head:
+                encoding = _getRequestEncoding(head)
+            if decompressor and not decompressor.eof:
+                raise HTTPBadRequest
+            parser.close()
+            params, method = unmarshaller.close(), unmarshaller.getmethodname()
+        else:
+            data = data.read()
+            if decompressor:
+                data = self.decompress(decompressor, data, maxSize)
+                if not decompressor.eof:
+                    raise HTTPBadRequest
+            if maxSize and len(data) > maxSize:
+                raise HTTPRequestEntityTooLarge
+            encoding = _getRequestEncoding(data)
+            params, method = xmlrpc.client.loads(data)
+        return params, method, encoding
+
+    @staticmethod
+    def decompressor(request):
+        """Get a decompressor for the content encoding of the request."""
+        encoding = request.environ().get('HTTP_CONTENT_ENCODING')
+        if not encoding or encoding == 'identity':
+            return None
+        if encoding in ('gzip', 'x-gzip'):
+            return zlib.decompressobj(31)
+        if encoding == 'deflate':
+            return zlib.decompressobj(15)
+        raise HTTPUnsupportedMediaType(
+            f'Cannot handle Content-Encoding of {encoding}')
+
+    @staticmethod
+    def decompress(decompressor, data, maxSize=None):
+        """Decompress the data with the given decompressor.
+
+        If maxSize is given, the request is rejected as soon as the
+        decompressed data would exceed this size, without inflating more.
+        """
+        try:
+            if maxSize is None:
+                return decompressor.decompress(data)
+            # the rest of the data stays in unconsumed_tail if the limit
+            # is reached, which means that the request is too large
+            data = decompressor.decompress(data, maxSize + 1)
+        except zlib.error as e:
+            raise HTTPBadRequest('Cannot decompress request') from e
+        if len(data) > maxSize:
+            raise HTTPRequestEntityTooLarge
+        return data
+
+    def sendResponse(self, transaction, response, encoding=None):
+        """Send the XML-RPC response, compressing it if possible."""
+        response = response.encode(
+            _knownEncoding(encoding) or 'utf-8', 'xmlcharrefreplace')
+        threshold = self.encode_threshold
+        contentEncoding = None
+        if threshold is not None and len(response) >= threshold:
+            if preferredEncoding(transaction.request().environ().get(
+                    'HTTP_ACCEPT_ENCODING'), ('gzip',)):
+                contentEncoding = 'gzip'
+                response = gzipCompress(
+                    response, transaction.application().setting(
+                        'ResponseCompressionLevel', 6), mtime=0)
+        self.sendOK('text/xml', response, transaction, contentEncoding)
+
 
 # Helper functions:
 
+def _getRequestEncoding(xml):
+    """Get the encoding declared by the request, which must be known."""
+    encoding = _getXmlDeclAttr(xml, 'encoding')
+    if encoding and _knownEncoding(encoding) != encoding:
+        raise HTTPBadRequest(f'Unknown encoding {encoding}')
+    return encoding
+
+
+def _knownEncoding(encoding):
+    """Return the encoding if it is known to Python, otherwise UTF-8."""
+    if encoding:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = 'utf-8'
+    return encoding
+
+
 def _getXmlDeclAttr(xml, attName):
-    """Get attribute value from xml declaration (<?xml ... ?>)."""
+    """Get attribute value from xml declaration (<?xml ... ?>).
+
+    The xml can be passed as bytes or as a string.
+    """
+    if isinstance(xml, bytes):
+        end = xml.find(b'?>')
+        if end < 0:
+            return None
+        xml = xml[:end + 2].decode('latin-1')
+    if not xml.startswith('<?xml') or '?>' not in xml:
+        return None
     s = xml[6:xml.find("?>")]  # 'version = "1.0" encoding = "Cp1251"'
     p = s.find(attName)
     if p < 0: